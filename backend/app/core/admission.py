@@ -0,0 +1,343 @@
+# ================================================================
+# File: app/core/admission.py
+# Description: Priority lanes + token-bucket quotas in front of inference
+#
+# Every inference request is assigned a lane (urgent, interactive, batch)
+# from its X-Priority header and the caller's role, charged against
+# per-caller (authenticated user, else client address) and per-role
+# token buckets, and then waits for one of a fixed
+# number of execution slots. Free slots go to waiting lanes by weighted
+# fair (stride) scheduling, and batch work may never hold every slot, so
+# a saturating bulk upload cannot push interactive latency up unbounded.
+# ================================================================
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterable, Optional
+
+from fastapi import Depends, Header, HTTPException, Request
+
+from app.core.config import settings
+from app.dependencies.auth import get_current_user
+
+LANES = ("urgent", "interactive", "batch")
+WAIT_SAMPLES = 1024  # recent queue waits kept per lane for percentiles
+MAX_TRACKED_CALLERS = 10_000  # idle (refilled) caller buckets are dropped beyond this
+
+
+# ================================================================
+# 🪣 Token Buckets
+# ================================================================
+@dataclass
+class Quota:
+    rate: float   # tokens per second
+    burst: float  # bucket size
+
+
+def parse_quota(value: str) -> Optional[Quota]:
+    """'rate/burst' (e.g. '5/20'); empty or '0' disables the quota."""
+    value = value.strip()
+    if not value or value == "0":
+        return None
+    rate, _, burst = value.partition("/")
+    return Quota(float(rate), float(burst or rate))
+
+
+def parse_mapping(value: str) -> Dict[str, str]:
+    """'a:x,b:y' -> {'a': 'x', 'b': 'y'}"""
+    out = {}
+    for item in value.split(","):
+        if item.strip():
+            key, _, val = item.partition(":")
+            out[key.strip()] = val.strip()
+    return out
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, quota: Quota):
+        self.rate = quota.rate
+        self.burst = quota.burst
+        self.tokens = quota.burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float, n: float = 1.0) -> float:
+        """Seconds until n tokens are available (0 if they are now)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= n else (n - self.tokens) / self.rate
+
+    def take(self, n: float = 1.0) -> None:
+        self.tokens -= n
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+def caller_key(user: Dict[str, Any], request: Request) -> str:
+    """Quota identity: the authenticated user, or the client address for anonymous callers."""
+    if user.get("id") is not None:
+        return f"user:{user['id']}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+# ================================================================
+# 🚦 Controller
+# ================================================================
+class LaneStats:
+    def __init__(self):
+        self.admitted = 0
+        self.throttled = 0   # rejected by a quota (429)
+        self.shed = 0        # rejected because the lane queue was full or timed out (503)
+        self.peak_queue = 0
+        self.waits_ms: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+
+    def describe(self) -> Dict[str, Any]:
+        waits = sorted(self.waits_ms)
+
+        def pct(q: float) -> Optional[float]:
+            return round(waits[min(len(waits) - 1, int(q * len(waits)))], 2) if waits else None
+
+        return {
+            "admitted": self.admitted,
+            "throttled": self.throttled,
+            "shed": self.shed,
+            "peak_queue": self.peak_queue,
+            "wait_ms_p50": pct(0.50),
+            "wait_ms_p99": pct(0.99),
+        }
+
+
+class AdmissionController:
+    """
+    Lane selection, quotas and slot scheduling for inference requests.
+
+    All state is touched from the event loop only (the ``admit`` dependency
+    is async), so no locking is needed.
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        weights: Dict[str, float],
+        lane_limits: Dict[str, int],
+        queue_limit: int,
+        max_wait_s: float,
+        user_quota: Optional[Quota],
+        role_quotas: Dict[str, Quota],
+        urgent_roles: Iterable[str],
+        default_lane: str = "interactive",
+    ):
+        self.concurrency = concurrency
+        self.weights = {lane: max(float(weights.get(lane, 1.0)), 1e-6) for lane in LANES}
+        self.lane_limits = {lane: min(lane_limits.get(lane, concurrency), concurrency) for lane in LANES}
+        self.queue_limit = queue_limit
+        self.max_wait_s = max_wait_s
+        self.user_quota = user_quota
+        self.role_quotas = role_quotas
+        self.urgent_roles = set(urgent_roles)
+        self.default_lane = default_lane
+
+        self.inflight = {lane: 0 for lane in LANES}
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {lane: deque() for lane in LANES}
+        self._pass = {lane: 0.0 for lane in LANES}  # stride-scheduling virtual time per lane
+        self._vtime = 0.0
+        self._user_buckets: Dict[Any, TokenBucket] = {}
+        self._role_buckets: Dict[str, TokenBucket] = {}
+        self.stats = {lane: LaneStats() for lane in LANES}
+
+    @classmethod
+    def from_settings(cls) -> "AdmissionController":
+        concurrency = max(1, settings.ADMISSION_CONCURRENCY)
+        batch_limit = settings.ADMISSION_BATCH_MAX_INFLIGHT or max(1, concurrency - 1)
+        return cls(
+            concurrency=concurrency,
+            weights={k: float(v) for k, v in parse_mapping(settings.ADMISSION_LANE_WEIGHTS).items()},
+            lane_limits={"batch": batch_limit},
+            queue_limit=settings.ADMISSION_QUEUE_LIMIT,
+            max_wait_s=settings.ADMISSION_MAX_WAIT_S,
+            user_quota=parse_quota(settings.ADMISSION_USER_QUOTA),
+            role_quotas={
+                role: q for role, v in parse_mapping(settings.ADMISSION_ROLE_QUOTAS).items()
+                if (q := parse_quota(v)) is not None
+            },
+            urgent_roles=[r.strip() for r in settings.ADMISSION_URGENT_ROLES.split(",") if r.strip()],
+        )
+
+    # ---- lanes & quotas ----
+    def lane_for(self, user: Dict[str, Any], requested: Optional[str]) -> str:
+        lane = (requested or self.default_lane).strip().lower()
+        if lane not in LANES:
+            raise HTTPException(status_code=400, detail=f"X-Priority must be one of {list(LANES)}")
+        if lane == "urgent" and user.get("role") not in self.urgent_roles:
+            lane = "interactive"  # urgent is reserved; downgrade rather than fail
+        return lane
+
+    def check_quota(self, user: Dict[str, Any], lane: str, key: str) -> None:
+        """Charge one request to the caller's (``caller_key``) and role's buckets; urgent requests are exempt."""
+        if lane == "urgent":
+            return
+        now = time.monotonic()
+        buckets = []
+        if self.user_quota is not None:
+            if key not in self._user_buckets:
+                if len(self._user_buckets) >= MAX_TRACKED_CALLERS:
+                    self._user_buckets = {k: b for k, b in self._user_buckets.items() if not b.full(now)}
+                self._user_buckets[key] = TokenBucket(self.user_quota)
+            buckets.append(self._user_buckets[key])
+        role = user.get("role")
+        if role in self.role_quotas:
+            if role not in self._role_buckets:
+                self._role_buckets[role] = TokenBucket(self.role_quotas[role])
+            buckets.append(self._role_buckets[role])
+
+        wait = max((b.wait_time(now) for b in buckets), default=0.0)
+        if wait > 0:
+            self.stats[lane].throttled += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Inference quota exceeded; retry later",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+        for bucket in buckets:  # only charge when every bucket admits
+            bucket.take()
+
+    # ---- slots ----
+    def _can_run(self, lane: str) -> bool:
+        return sum(self.inflight.values()) < self.concurrency and self.inflight[lane] < self.lane_limits[lane]
+
+    def _start(self, lane: str) -> None:
+        self.inflight[lane] += 1
+        self._vtime = self._pass[lane]
+        self._pass[lane] += 1.0 / self.weights[lane]
+
+    def _dispatch(self) -> None:
+        while True:
+            ready = [lane for lane in LANES if self._waiters[lane] and self._can_run(lane)]
+            if not ready:
+                return
+            lane = min(ready, key=lambda l: (self._pass[l], LANES.index(l)))
+            fut = self._waiters[lane].popleft()
+            if fut.done():  # timed out or client went away
+                continue
+            self._start(lane)
+            fut.set_result(None)
+
+    async def acquire(self, lane: str) -> float:
+        """Wait for an execution slot in `lane`; returns the queue wait in ms."""
+        stats = self.stats[lane]
+        if self._can_run(lane) and not any(self._waiters.values()):
+            self._pass[lane] = max(self._pass[lane], self._vtime)
+            self._start(lane)
+            stats.admitted += 1
+            stats.waits_ms.append(0.0)
+            return 0.0
+
+        queue = self._waiters[lane]
+        if len(queue) >= self.queue_limit:
+            stats.shed += 1
+            raise HTTPException(status_code=503, detail=f"The {lane} queue is full; retry shortly")
+        if not queue:  # lane becomes active: no credit for the time it was idle
+            self._pass[lane] = max(self._pass[lane], self._vtime)
+        fut = asyncio.get_running_loop().create_future()
+        queue.append(fut)
+        stats.peak_queue = max(stats.peak_queue, len(queue))
+        start = time.perf_counter()
+        self._dispatch()  # a slot other lanes can't use (e.g. batch at its limit) may be free
+        try:
+            await asyncio.wait_for(fut, self.max_wait_s)
+        except asyncio.TimeoutError:
+            stats.shed += 1
+            raise HTTPException(status_code=503, detail=f"Timed out waiting in the {lane} queue")
+        except BaseException:
+            if fut.done() and not fut.cancelled():  # slot granted as the request was cancelled
+                self.release(lane)
+            raise
+        waited = (time.perf_counter() - start) * 1000
+        stats.admitted += 1
+        stats.waits_ms.append(waited)
+        return waited
+
+    def release(self, lane: str) -> None:
+        self.inflight[lane] -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, lane: str) -> AsyncIterator[float]:
+        """Hold an execution slot in `lane` for the block; yields the queue wait in ms."""
+        waited = await self.acquire(lane)
+        try:
+            yield waited
+        finally:
+            self.release(lane)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "weights": self.weights,
+            "lane_limits": self.lane_limits,
+            "inflight": dict(self.inflight),
+            "queued": {lane: len(q) for lane, q in self._waiters.items()},
+            "lanes": {lane: s.describe() for lane, s in self.stats.items()},
+            "tracked_users": len(self._user_buckets),
+        }
+
+
+admission = AdmissionController.from_settings()
+
+
+async def admission_lane(
+    request: Request,
+    user=Depends(get_current_user),
+    x_priority: Optional[str] = Header(None, description="urgent | interactive | batch"),
+) -> Optional[str]:
+    """The caller's lane after the quota check (None with admission disabled); holds no slot."""
+    if not settings.ADMISSION_ENABLED:
+        return None
+    lane = admission.lane_for(user, x_priority)
+    admission.check_quota(user, lane, caller_key(user, request))
+    return lane
+
+
+async def admit(request: Request, lane: Optional[str] = Depends(admission_lane)):
+    """
+    FastAPI dependency for inference routes: quota check, then hold an
+    execution slot in the caller's lane until the request is handled.
+    Routes with an upload use ``admit_after`` instead.
+    """
+    if lane is None:
+        yield None
+        return
+    async with admission.slot(lane) as waited:
+        request.state.admission_wait_ms = waited
+        request.state.lane = lane
+        yield lane
+
+
+def admit_after(upload: Callable) -> Callable:
+    """
+    ``admit`` for routes whose body is read by the `upload` dependency: the
+    quota is checked before the body, but the execution slot is taken only
+    once `upload` has parsed it, so slow uploaders cannot hold slots. The
+    route declares the same `upload` dependency and gets the cached result.
+    """
+
+    async def admit_upload(request: Request, lane: Optional[str] = Depends(admission_lane), _body=Depends(upload)):
+        if lane is None:
+            yield None
+            return
+        async with admission.slot(lane) as waited:
+            request.state.admission_wait_ms = waited
+            request.state.lane = lane
+            yield lane
+
+    return admit_upload
@@ -10,11 +10,96 @@ class Settings(BaseSettings):
     JWT_SECRET: str = "change-me"
     JWT_ALG: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+    # Comma-separated emails of existing accounts promoted to admin (/api/admin/*) at startup
+    ADMIN_EMAILS: str = ""
 
     DATABASE_URL: str = "sqlite:///./local.db"
 
     CORS_ORIGINS: List[AnyHttpUrl] = []
 
+    # Comma-separated router groups to mount (see app.main.ROUTERS), or "all".
+    # e.g. "dashboard,auth" for a process that never loads ML frameworks.
+    ENABLED_ROUTERS: str = "all"
+
+    # Upload limits (app/core/uploads.py)
+    MAX_UPLOAD_BYTES: int = 20 * 1024 * 1024
+    MAX_IMAGE_PIXELS: int = 40_000_000
+    UPLOAD_MEMORY_BUDGET_BYTES: int = 256 * 1024 * 1024  # all in-flight uploads together
+
+    # DICOM studies are spooled to disk, not memory
+    MAX_STUDY_UPLOAD_BYTES: int = 1024 * 1024 * 1024
+    MAX_STUDY_UNPACKED_BYTES: int = 4 * 1024 * 1024 * 1024
+    MAX_STUDY_SLICES: int = 2000
+
+    # Keras models run through pre-traced tf.functions (app/ml/compiled.py)
+    COMPILED_INFERENCE: bool = True
+    INFERENCE_BATCH_BUCKETS: str = "1,2,4,8,16,32"
+    XLA_JIT_COMPILE: bool = False
+
+    # Inference admission control (app/core/admission.py)
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_CONCURRENCY: int = 4             # requests running inference at once
+    ADMISSION_LANE_WEIGHTS: str = "urgent:16,interactive:4,batch:1"
+    ADMISSION_BATCH_MAX_INFLIGHT: int = 0      # 0 = concurrency - 1
+    ADMISSION_QUEUE_LIMIT: int = 64            # waiting requests per lane
+    ADMISSION_MAX_WAIT_S: float = 30.0
+    ADMISSION_USER_QUOTA: str = "5/20"         # requests/s / burst per user (anonymous: per client IP); "0" disables
+    ADMISSION_ROLE_QUOTAS: str = ""            # e.g. "researcher:10/50,clinician:50/100"
+    ADMISSION_URGENT_ROLES: str = "admin"      # roles ordinary (self-registered) callers cannot get
+
+    # Per-host tuning profile from `python -m app.tools.autotune` (app/core/tuning.py);
+    # empty = tuning/<hostname>-<cores>cpu.json
+    APPLY_TUNING_PROFILE: bool = True
+    TUNING_PROFILE: str = ""
+
+    # Background canary probes behind /api/status/health (app/core/health.py)
+    HEALTH_PROBE_ENABLED: bool = True
+    HEALTH_PROBE_INTERVAL_S: float = 30.0
+    HEALTH_PROBE_FAILURES: int = 2             # consecutive failures before a component is down
+
+    # Near-duplicate uploads of the same patient can reuse the earlier prediction (reuse=true; app/ml/dedup.py)
+    DEDUP_ENABLED: bool = True
+    DEDUP_MAX_DISTANCE: int = 6                # pHash Hamming radius, 0-11
+    DEDUP_DHASH_MAX_DISTANCE: int = 10         # second check on the dHash
+    DEDUP_SYNC_INTERVAL_S: float = 5.0         # pick up other processes' fingerprints
+
+    # Confidence-gated first-stage models (app/ml/cascade.py); tune with app.tools.eval_cascade
+    CASCADE_ENABLED: bool = True
+    CASCADE_STAGE1_PATHS: str = ""             # "skin_cancer:path/stage1.h5,brain_tumor:..."
+    CASCADE_THRESHOLDS: str = ""               # "skin_cancer:0.93"; calibrated top-1 needed to answer
+    CASCADE_TEMPERATURES: str = ""             # "skin_cancer:1.6"; default 1.0
+    CASCADE_DEFAULT_THRESHOLD: float = 0.95
+
+    # Tiled skin-cancer inference (?tiled=true, app/ml/common/tiling.py)
+    TILE_OVERLAP: float = 0.25
+    TILE_MAX_TILES: int = 16                   # caps the read resolution of the lesion region
+    TILE_BATCH_SIZE: int = 0                   # tiles per model call; 0 = all in one call
+    TILE_EARLY_EXIT: float = 0.97              # stop between batches at this tile confidence; 0 = off
+    TILE_AGGREGATE: str = "mean"               # mean (lesion-weighted) | max
+    TILE_ROI: bool = True                      # crop to the detected lesion before tiling
+
+    # Content-addressed store of uploaded images (app/db/blobstore.py)
+    BLOB_STORE_ENABLED: bool = True
+    BLOB_DIR: str = "blobs"
+    BLOB_GC_GRACE_HOURS: float = 24.0          # unreferenced blobs younger than this survive GC
+
+    # Monthly diagnosis partitions (app/db/partitions.py); seal/archive with app.tools.partitions
+    DIAGNOSIS_PARTITIONS: bool = False
+    DIAGNOSIS_PARTITION_DIR: str = "partitions"
+    DIAGNOSIS_ARCHIVE_AFTER_MONTHS: int = 3    # older sealed months become read-only Parquet files
+
+    # Admin-armed request profiler (app/core/profiling.py); free while disarmed
+    PROFILING_ENABLED: bool = True
+    PROFILING_MAX_REQUESTS: int = 200
+
+    # Per-route memory accounting and worker recycling (app/core/memory.py)
+    MEMORY_TRACK_PATHS: str = "/api/predict,/api/diseases"   # path prefixes; empty disables
+    MEMORY_TRACEMALLOC: bool = False           # per-request traced peaks + snapshot diffs (slower)
+    MEMORY_TRACEMALLOC_FRAMES: int = 1         # >1 groups snapshot diffs by traceback
+    MEMORY_SNAPSHOT_INTERVAL_S: float = 300.0
+    MEMORY_BASELINE_REQUESTS: int = 20         # RSS baseline is taken after this many tracked requests
+    MEMORY_RECYCLE_GROWTH_MB: int = 0          # SIGTERM the worker past this growth; 0 = never
+
     @field_validator("CORS_ORIGINS", mode="before")
     def split_origins(cls, v):
         if isinstance(v, str) and "," in v:
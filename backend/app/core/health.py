@@ -0,0 +1,179 @@
+# ================================================================
+# File: app/core/health.py
+# Description: Background canary prober behind /api/status/health
+#
+# Every HEALTH_PROBE_INTERVAL_S a daemon thread runs one synthetic sample
+# through each serving model and loaded disease pipeline, a `SELECT 1`
+# against the database, and a no-op callback on the event loop (how long
+# the API takes to get to new work). Results go into rolling windows and
+# are published as one immutable snapshot, so the health endpoint returns
+# a dict reference instead of doing (or faking) any work per request.
+# ================================================================
+
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+from app.core.config import settings
+
+PROBE_WINDOW = 60  # samples per probe kept for percentiles
+
+
+class Probe:
+    """Rolling latency and failure state of one probed component."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies_ms: Deque[float] = deque(maxlen=PROBE_WINDOW)
+        self.consecutive_failures = 0
+        self.total_runs = 0
+        self.total_failures = 0
+        self.last_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        self.last_ok_at: Optional[float] = None
+
+    def run(self, fn: Callable[[], Any]) -> None:
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            self.consecutive_failures += 1
+            self.total_failures += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+        else:
+            self.last_ms = round((time.perf_counter() - start) * 1000, 2)
+            self.latencies_ms.append(self.last_ms)
+            self.consecutive_failures = 0
+            self.last_error = None
+            self.last_ok_at = time.time()
+        self.total_runs += 1
+        self.checked_at = time.time()
+
+    @property
+    def ok(self) -> bool:
+        return self.total_runs > 0 and self.consecutive_failures < settings.HEALTH_PROBE_FAILURES
+
+    def describe(self) -> Dict[str, Any]:
+        waits = sorted(self.latencies_ms)
+
+        def pct(q: float) -> Optional[float]:
+            return waits[min(len(waits) - 1, int(q * len(waits)))] if waits else None
+
+        return {
+            "ok": self.ok,
+            "latency_ms": self.last_ms,
+            "p50_ms": pct(0.50),
+            "p99_ms": pct(0.99),
+            "consecutive_failures": self.consecutive_failures,
+            "failures": self.total_failures,
+            "runs": self.total_runs,
+            "last_error": self.last_error,
+            "checked_at": self.checked_at,
+            "last_ok_at": self.last_ok_at,
+        }
+
+
+class HealthProber:
+    def __init__(self):
+        self.interval_s = settings.HEALTH_PROBE_INTERVAL_S
+        self.api = Probe("api")
+        self.db = Probe("db")
+        self.models: Dict[str, Probe] = {}
+        self.pipelines: Dict[str, Probe] = {}
+        self.snapshot: Optional[Dict[str, Any]] = None  # replaced whole after each round
+        self._app: Any = None
+        self._loop: Any = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---- lifecycle ----
+    def start(self, app: Any, loop: Any = None) -> None:
+        if self._thread is not None:
+            return
+        self._app, self._loop = app, loop
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="health-prober", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.probe_once()
+            except Exception:  # never let a probing bug kill the thread
+                traceback.print_exc()
+            self._stop.wait(self.interval_s)
+
+    # ---- probes ----
+    def _ping_loop(self) -> None:
+        """Time until the event loop runs a callback scheduled from this thread."""
+        done = threading.Event()
+        self._loop.call_soon_threadsafe(done.set)
+        if not done.wait(max(1.0, self.interval_s)):
+            raise TimeoutError("event loop did not respond")
+
+    @staticmethod
+    def _ping_db() -> None:
+        from sqlalchemy import text
+        from app.db.session import engine
+
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1")).scalar()
+
+    @staticmethod
+    def _run_pipeline(pipeline: Any) -> None:
+        from PIL import Image
+        from app.ml.common.preproc import DecodedImage
+
+        if pipeline.input_kind != "image":
+            raise RuntimeError(f"No synthetic input for {pipeline.input_kind} pipelines")
+        size = getattr(pipeline, "input_size", (64, 64))
+        pipeline.infer({"image": DecodedImage(Image.new("RGB", tuple(size), (128, 128, 128)))})
+
+    def probe_once(self) -> Dict[str, Any]:
+        if self._loop is not None:
+            self.api.run(self._ping_loop)
+        self.db.run(self._ping_db)
+
+        models = getattr(getattr(self._app, "state", None), "models", None)
+        names = list(models.keys()) if models is not None else []
+        for name in names:
+            self.models.setdefault(name, Probe(name)).run(lambda: models.probe(name))
+        for name in set(self.models) - set(names):  # unloaded since the last round
+            del self.models[name]
+
+        from app.ml import registry  # only pipelines someone already loaded; never load here
+
+        loaded = registry.loaded_pipelines()
+        for key, pipeline in loaded.items():
+            self.pipelines.setdefault(key, Probe(key)).run(lambda: self._run_pipeline(pipeline))
+
+        self.snapshot = {
+            "checked_at": time.time(),
+            "interval_s": self.interval_s,
+            "api": self.api.describe(),
+            "db": self.db.describe(),
+            "models": {name: p.describe() for name, p in self.models.items()},
+            "pipelines": {key: p.describe() for key, p in self.pipelines.items()},
+        }
+        return self.snapshot
+
+    # ---- reads (request path) ----
+    def current(self) -> Optional[Dict[str, Any]]:
+        """Latest snapshot, flagged stale when the prober has stopped keeping up."""
+        snap = self.snapshot
+        if snap is None:
+            return None
+        stale = time.time() - snap["checked_at"] > 3 * self.interval_s
+        return {**snap, "stale": stale} if stale else snap
+
+
+prober = HealthProber()
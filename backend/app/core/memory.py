@@ -0,0 +1,266 @@
+# ================================================================
+# File: app/core/memory.py
+# Description: Per-route memory accounting, tracemalloc snapshot diffs
+#              and an optional worker-recycle policy
+#
+# Requests under MEMORY_TRACK_PATHS record their RSS delta and, when
+# tracemalloc is on, the peak of traced allocations while they ran. A
+# background thread diffs tracemalloc snapshots every
+# MEMORY_SNAPSHOT_INTERVAL_S, grouped by allocation site, so steady
+# growth points at the code that allocates it. Once RSS has grown more
+# than MEMORY_RECYCLE_GROWTH_MB over the post-warm-up baseline, the worker
+# sends itself SIGTERM: uvicorn/gunicorn drain in-flight requests and the
+# process manager starts a fresh worker.
+# ================================================================
+
+import os
+import signal
+import threading
+import time
+import tracemalloc
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from app.core.config import settings
+
+MB = 1024 * 1024
+SAMPLES = 1024            # recent requests kept per route for percentiles
+TOP_SITES = 25
+UNMATCHED = "(unmatched)"  # one bucket for 404s: raw paths would grow the route table without bound
+IGNORED_FILES = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>", "<unknown>")
+
+try:
+    import psutil
+    _process = psutil.Process()
+except ImportError:  # Linux falls back to /proc; elsewhere RSS is unavailable
+    psutil = None
+    _process = None
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size of this process."""
+    if _process is not None:
+        return _process.memory_info().rss
+    try:
+        with open("/proc/self/statm", "rb") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _pct(values: List[float], q: float) -> Optional[float]:
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+class RouteMemory:
+    def __init__(self):
+        self.requests = 0
+        self.rss_delta: Deque[int] = deque(maxlen=SAMPLES)
+        self.peak_traced: Deque[int] = deque(maxlen=SAMPLES)
+        self.overlapped = 0   # requests whose tracemalloc peak may include concurrent requests
+        self.rss_growth_total = 0
+
+    def describe(self) -> Dict[str, Any]:
+        deltas = sorted(self.rss_delta)
+        peaks = sorted(self.peak_traced)
+
+        def mb(v: Optional[float]) -> Optional[float]:
+            return round(v / MB, 3) if v is not None else None
+
+        return {
+            "requests": self.requests,
+            "rss_delta_mb_p50": mb(_pct(deltas, 0.50)),
+            "rss_delta_mb_p99": mb(_pct(deltas, 0.99)),
+            "rss_delta_mb_max": mb(deltas[-1] if deltas else None),
+            "rss_growth_mb_total": mb(self.rss_growth_total),
+            "peak_traced_mb_p50": mb(_pct(peaks, 0.50)),
+            "peak_traced_mb_p99": mb(_pct(peaks, 0.99)),
+            "peak_traced_mb_max": mb(peaks[-1] if peaks else None),
+            "overlapped": self.overlapped,
+        }
+
+
+def _site_diff(new: tracemalloc.Snapshot, old: tracemalloc.Snapshot, limit: int) -> List[Dict[str, Any]]:
+    """Largest growth first, grouped by allocation site (file:line, or traceback with >1 frame)."""
+    key = "traceback" if settings.MEMORY_TRACEMALLOC_FRAMES > 1 else "lineno"
+    filters = [tracemalloc.Filter(False, f) for f in IGNORED_FILES]
+    stats = new.filter_traces(filters).compare_to(old.filter_traces(filters), key)
+    out = []
+    for stat in stats[:limit]:
+        if stat.size_diff <= 0:
+            break
+        out.append({
+            "site": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+            "size_diff_kb": round(stat.size_diff / 1024, 1),
+            "size_kb": round(stat.size / 1024, 1),
+            "count_diff": stat.count_diff,
+        })
+    return out
+
+
+class MemoryMonitor:
+    def __init__(self):
+        self.paths = tuple(p.strip() for p in settings.MEMORY_TRACK_PATHS.split(",") if p.strip())
+        self.routes: Dict[str, RouteMemory] = {}
+        self.baseline_rss: Optional[int] = None
+        self.baseline_at: Optional[float] = None
+        self.tracked = 0
+        self.recycle_reason: Optional[str] = None
+        self.last_diff: List[Dict[str, Any]] = []
+        self.since_baseline: List[Dict[str, Any]] = []
+        self.last_snapshot_at: Optional[float] = None
+        self._inflight = 0
+        self._lock = threading.Lock()
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._baseline_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---- lifecycle ----
+    def start(self) -> None:
+        if settings.MEMORY_TRACEMALLOC and not tracemalloc.is_tracing():
+            tracemalloc.start(settings.MEMORY_TRACEMALLOC_FRAMES)
+        if tracemalloc.is_tracing() and self._thread is None:
+            self._thread = threading.Thread(target=self._snapshot_loop, name="memory-snapshots", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _snapshot_loop(self) -> None:
+        while not self._stop.wait(settings.MEMORY_SNAPSHOT_INTERVAL_S):
+            try:
+                self.take_snapshot()
+            except Exception as e:
+                print(f"⚠️ tracemalloc snapshot failed: {e}")
+
+    def take_snapshot(self) -> List[Dict[str, Any]]:
+        """Diff against the previous snapshot (and the baseline one, once there is a baseline)."""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running (MEMORY_TRACEMALLOC=false)")
+        snapshot = tracemalloc.take_snapshot()
+        with self._lock:
+            previous, self._snapshot = self._snapshot, snapshot
+            if self.baseline_rss is not None and self._baseline_snapshot is None:
+                self._baseline_snapshot = snapshot
+            baseline = self._baseline_snapshot
+        if previous is not None:
+            self.last_diff = _site_diff(snapshot, previous, TOP_SITES)
+        if baseline is not None and baseline is not snapshot:
+            self.since_baseline = _site_diff(snapshot, baseline, TOP_SITES)
+        self.last_snapshot_at = time.time()
+        return self.last_diff
+
+    # ---- requests ----
+    def tracks(self, path: str) -> bool:
+        return path.startswith(self.paths)
+
+    def begin(self) -> Dict[str, Any]:
+        with self._lock:
+            self._inflight += 1
+            alone = self._inflight == 1
+        tracing = tracemalloc.is_tracing()
+        if tracing and alone:
+            tracemalloc.reset_peak()
+        return {
+            "rss": rss_bytes(),
+            "traced": tracemalloc.get_traced_memory()[0] if tracing else None,
+            "alone": alone,
+        }
+
+    def end(self, route: str, start: Dict[str, Any]) -> None:
+        rss = rss_bytes()
+        traced_peak = None
+        if start["traced"] is not None and tracemalloc.is_tracing():
+            traced_peak = max(0, tracemalloc.get_traced_memory()[1] - start["traced"])
+        with self._lock:
+            self._inflight -= 1
+            stats = self.routes.setdefault(route, RouteMemory())
+            stats.requests += 1
+            if rss is not None and start["rss"] is not None:
+                stats.rss_delta.append(rss - start["rss"])
+                stats.rss_growth_total += rss - start["rss"]
+            if traced_peak is not None:
+                stats.peak_traced.append(traced_peak)
+                stats.overlapped += int(not start["alone"] or self._inflight > 0)
+            self.tracked += 1
+            if self.baseline_rss is None and self.tracked >= settings.MEMORY_BASELINE_REQUESTS and rss is not None:
+                # after warm-up: caches, graph traces and allocator pools exist by now
+                self.baseline_rss, self.baseline_at = rss, time.time()
+        if self.baseline_rss is not None and rss is not None:
+            self._check_recycle(rss)
+
+    # ---- recycle policy ----
+    def growth(self, rss: Optional[int] = None) -> Optional[int]:
+        rss = rss if rss is not None else rss_bytes()
+        if self.baseline_rss is None or rss is None:
+            return None
+        return rss - self.baseline_rss
+
+    def _check_recycle(self, rss: int) -> None:
+        limit = settings.MEMORY_RECYCLE_GROWTH_MB
+        if not limit or self.recycle_reason is not None:
+            return
+        growth = rss - self.baseline_rss
+        if growth > limit * MB:
+            self.recycle_reason = (
+                f"RSS grew {growth / MB:.0f} MB over the {self.baseline_rss / MB:.0f} MB baseline (limit {limit} MB)"
+            )
+            print(f"♻️ Recycling worker {os.getpid()}: {self.recycle_reason}")
+            # graceful: the server stops accepting, drains in-flight requests and exits;
+            # the process manager (uvicorn --workers / gunicorn) starts a replacement
+            os.kill(os.getpid(), signal.SIGTERM)
+
+    def describe(self) -> Dict[str, Any]:
+        rss = rss_bytes()
+        growth = self.growth(rss)
+        traced, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (None, None)
+
+        def mb(v: Optional[int]) -> Optional[float]:
+            return round(v / MB, 2) if v is not None else None
+
+        with self._lock:
+            routes = {route: s.describe() for route, s in self.routes.items()}
+        return {
+            "pid": os.getpid(),
+            "rss_mb": mb(rss),
+            "baseline_rss_mb": mb(self.baseline_rss),
+            "baseline_at": self.baseline_at,
+            "growth_mb": mb(growth),
+            "tracked_requests": self.tracked,
+            "tracemalloc": {
+                "enabled": tracemalloc.is_tracing(),
+                "frames": tracemalloc.get_traceback_limit() if tracemalloc.is_tracing() else None,
+                "traced_mb": mb(traced),
+                "peak_mb": mb(peak),
+                "last_snapshot_at": self.last_snapshot_at,
+                "growth_since_last_snapshot": self.last_diff,
+                "growth_since_baseline": self.since_baseline,
+            },
+            "routes": routes,
+            "recycle": {
+                "growth_limit_mb": settings.MEMORY_RECYCLE_GROWTH_MB or None,
+                "pending": self.recycle_reason is not None,
+                "reason": self.recycle_reason,
+            },
+        }
+
+
+monitor = MemoryMonitor()
+
+
+class MemoryMiddleware:
+    """Raw ASGI middleware: requests outside MEMORY_TRACK_PATHS pass straight through."""
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not monitor.tracks(scope["path"]):
+            return await self.app(scope, receive, send)
+        start = monitor.begin()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = scope.get("route")  # set by the router: group by template, not by raw path
+            monitor.end(getattr(route, "path", UNMATCHED), start)
@@ -0,0 +1,415 @@
+# ================================================================
+# File: app/core/profiling.py
+# Description: On-demand request profiler armed from the admin API
+#
+# An admin arms a session for the next N requests whose path matches a
+# pattern. While disarmed, the ASGI middleware is one attribute check
+# and the threadpool hook one context-variable read, so this ships
+# enabled. While armed, matching requests are profiled on the event loop
+# thread and in every threadpool call they make (sync endpoints,
+# run_in_threadpool), either
+#   - deterministically with cProfile (merged pstats), or
+#   - statistically, by sampling those threads' stacks every few ms.
+# Results export as pstats and as speedscope JSON (https://speedscope.app).
+#
+# Event-loop-thread data also covers whatever else the loop ran at the
+# same time, so profile on a quiet node when the numbers must be exact.
+# ================================================================
+
+import contextvars
+import cProfile
+import io
+import marshal
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+MODES = ("cprofile", "sampling")
+KEEP_SESSIONS = 8
+MAX_STACK_DEPTH = 128
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+# Session profiling the current request; copied into threadpool calls with the context
+_current: contextvars.ContextVar[Optional["ProfileSession"]] = contextvars.ContextVar("profile_session", default=None)
+
+Frame = Tuple[str, int, str]  # (file, first line, function) as in pstats
+
+
+class ProfileSession:
+    def __init__(self, pattern: str, requests: int, mode: str, method: Optional[str],
+                 interval_ms: float, expires_s: float):
+        self.id = uuid.uuid4().hex[:12]
+        self.pattern = pattern
+        self._regex = re.compile(pattern)
+        self.method = method.upper() if method else None
+        self.mode = mode
+        self.requested = requests
+        self.remaining = requests
+        self.interval_s = interval_ms / 1000.0
+        self.created_at = time.time()
+        self.expires_at = self.created_at + expires_s
+        self.status = "armed"          # armed | running | done | expired | cancelled
+        self.captured: List[Dict[str, Any]] = []
+        self._inflight = 0
+        self._lock = threading.Lock()
+        # cprofile
+        self._loop_profiler: Optional[cProfile.Profile] = None
+        self._stats: Optional[pstats.Stats] = None
+        # sampling
+        self._threads: Dict[int, int] = {}   # thread ident -> nesting depth
+        self._loop_ident: Optional[int] = None
+        self._samples: Counter = Counter()   # stack (root first) -> samples
+        self._sampler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ---- request bracketing (event loop thread) ----
+    def matches(self, method: str, path: str) -> bool:
+        return (self.method is None or self.method == method) and self._regex.search(path) is not None
+
+    def begin(self, method: str, path: str) -> Dict[str, Any]:
+        self.remaining -= 1
+        self.status = "running"
+        self._inflight += 1
+        record = {"method": method, "path": path, "started_at": time.time()}
+        self.captured.append(record)
+        if self._inflight > 1:
+            return record
+        if self.mode == "cprofile":
+            self._loop_profiler = cProfile.Profile()
+            self._loop_profiler.enable()
+        else:
+            self._loop_ident = threading.get_ident()
+            self._enter_thread(self._loop_ident)
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, name="profile-sampler", daemon=True)
+                self._sampler.start()
+        return record
+
+    def end(self, record: Dict[str, Any], started: float) -> None:
+        record["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        self._inflight -= 1
+        if self._inflight == 0:
+            if self.mode == "cprofile" and self._loop_profiler is not None:
+                self._loop_profiler.disable()
+                self._merge(self._loop_profiler)
+                self._loop_profiler = None
+            elif self._loop_ident is not None:
+                self._leave_thread(self._loop_ident)
+            if self.remaining <= 0:
+                self.finish("done")
+
+    def finish(self, status: str) -> None:
+        if self.status in ("done", "expired", "cancelled"):
+            return
+        if self._loop_profiler is not None:  # cancelled mid-request
+            self._loop_profiler.disable()
+            self._merge(self._loop_profiler)
+            self._loop_profiler = None
+        self.status = status
+        self._stop.set()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "expired", "cancelled")
+
+    # ---- threadpool calls ----
+    def wrap(self, func: Callable[[], Any]) -> Callable[[], Any]:
+        if self.finished:
+            return func
+
+        def profiled(*args):
+            if self.mode == "cprofile":
+                profiler = cProfile.Profile()
+                profiler.enable()
+                try:
+                    return func(*args)
+                finally:
+                    profiler.disable()
+                    self._merge(profiler)
+            ident = threading.get_ident()
+            self._enter_thread(ident)
+            try:
+                return func(*args)
+            finally:
+                self._leave_thread(ident)
+
+        return profiled
+
+    def _merge(self, profiler: cProfile.Profile) -> None:
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profiler)
+            else:
+                self._stats.add(profiler)
+
+    def _enter_thread(self, ident: int) -> None:
+        with self._lock:
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+
+    def _leave_thread(self, ident: int) -> None:
+        with self._lock:
+            depth = self._threads.get(ident, 1) - 1
+            if depth:
+                self._threads[ident] = depth
+            else:
+                self._threads.pop(ident, None)
+
+    # ---- sampling ----
+    def _sample_loop(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            with self._lock:
+                idents = list(self._threads)
+            if not idents:
+                continue
+            frames = sys._current_frames()
+            batch = []
+            for ident in idents:
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    code = frame.f_code
+                    stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                # the event loop thread waiting in select() is idle, not working for the request
+                if ident == self._loop_ident and stack and stack[0][0].endswith("selectors.py"):
+                    continue
+                batch.append(tuple(reversed(stack)))
+            with self._lock:
+                self._samples.update(batch)
+
+    def _sample_counts(self) -> Dict[Tuple[Frame, ...], int]:
+        with self._lock:
+            return dict(self._samples)
+
+    # ---- results ----
+    def pstats_bytes(self) -> bytes:
+        """Marshalled stats dict, the format of pstats.Stats.dump_stats() (snakeviz, pstats)."""
+        with self._lock:
+            return marshal.dumps(self._stats.stats if self._stats is not None else {})
+
+    def _weighted_stacks(self) -> Tuple[List[Tuple[Tuple[Frame, ...], float]], str]:
+        """[(stack root first, weight)] and the weight unit."""
+        if self.mode == "sampling":
+            ms = self.interval_s * 1000
+            return [(stack, n * ms) for stack, n in self._sample_counts().items()], "milliseconds"
+        with self._lock:
+            stats = dict(self._stats.stats) if self._stats is not None else {}
+        return _stacks_from_pstats(stats), "seconds"
+
+    def speedscope(self) -> Dict[str, Any]:
+        stacks, unit = self._weighted_stacks()
+        frame_index: Dict[Frame, int] = {}
+        frames, samples, weights = [], [], []
+        for stack, weight in stacks:
+            indices = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({"name": frame[2], "file": frame[0], "line": frame[1]})
+                indices.append(frame_index[frame])
+            samples.append(indices)
+            weights.append(weight)
+        total = sum(weights)
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": f"{self.pattern} ({self.mode}, {len(self.captured)} requests)",
+            "exporter": "healthlens",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": f"session {self.id}",
+                "unit": unit,
+                "startValue": 0,
+                "endValue": total,
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+    def top(self, limit: int = 30) -> Any:
+        """Hottest functions: pstats text (cprofile) or self/total sample counts (sampling)."""
+        if self.mode == "cprofile":
+            if self._stats is None:
+                return ""
+            out = io.StringIO()
+            stats = pstats.Stats(stream=out)
+            with self._lock:  # sort a copy, so merges from worker threads don't race with it
+                stats.add(self._stats)
+            stats.sort_stats("cumulative").print_stats(limit)
+            return out.getvalue()
+        own, total = Counter(), Counter()
+        for stack, n in self._sample_counts().items():
+            own[stack[-1]] += n
+            for frame in set(stack):
+                total[frame] += n
+        return [
+            {"function": f"{frame[2]} ({frame[0]}:{frame[1]})", "self_samples": own[frame], "total_samples": n}
+            for frame, n in total.most_common(limit)
+        ]
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "mode": self.mode,
+            "pattern": self.pattern,
+            "method": self.method,
+            "status": self.status,
+            "requested": self.requested,
+            "captured": len(self.captured),
+            "requests": self.captured,
+            "samples": sum(self._sample_counts().values()) if self.mode == "sampling" else None,
+            "created_at": self.created_at,
+            "expires_at": self.expires_at,
+        }
+
+
+def _stacks_from_pstats(stats: Dict[Frame, Any]) -> List[Tuple[Tuple[Frame, ...], float]]:
+    """
+    Approximate call stacks from a cProfile call graph for flame views.
+    cProfile only keeps caller -> callee edges, so each function's time is
+    split over its callees in proportion to the time recorded on each edge
+    (as flameprof / gprof2dot do); recursion is cut at the first repeat.
+    """
+    callees: Dict[Frame, List[Tuple[Frame, float]]] = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+    roots = [f for f, (_, _, _, _, callers) in stats.items() if not any(c in stats for c in callers)]
+    total = sum(stats[r][3] for r in roots) or 1.0
+    min_time = total * 1e-4
+    out: List[Tuple[Tuple[Frame, ...], float]] = []
+
+    def walk(func: Frame, time_here: float, path: Tuple[Frame, ...]) -> None:
+        path = path + (func,)
+        _, _, tt, ct, _ = stats[func]
+        if ct <= 0:
+            return
+        child_time = 0.0
+        if len(path) < MAX_STACK_DEPTH:
+            for callee, edge_ct in callees.get(func, ()):
+                share = time_here * edge_ct / ct
+                if callee in path or callee not in stats or share < min_time:
+                    continue
+                child_time += share
+                walk(callee, share, path)
+        own = max(time_here - child_time, 0.0)
+        if own > 0:
+            out.append((path, own))
+
+    for root in roots:
+        walk(root, stats[root][3], ())
+    return out
+
+
+# ================================================================
+# 🎛️ Registry of sessions
+# ================================================================
+class Profiler:
+    def __init__(self):
+        self.armed: Optional[ProfileSession] = None  # read on every request: keep it a plain attribute
+        self.sessions: "OrderedDict[str, ProfileSession]" = OrderedDict()
+
+    def arm(self, pattern: str, requests: int, mode: str, method: Optional[str] = None,
+            interval_ms: float = 2.0, expires_s: float = 600.0) -> ProfileSession:
+        armed = self.armed
+        if armed is not None and not armed.finished:
+            raise RuntimeError(f"Session {armed.id} is still armed")
+        session = ProfileSession(pattern, requests, mode, method, interval_ms, expires_s)
+        self.sessions[session.id] = session
+        while len(self.sessions) > KEEP_SESSIONS:
+            self.sessions.popitem(last=False)
+        self.armed = session
+        return session
+
+    def cancel(self, session_id: str) -> ProfileSession:
+        session = self.sessions[session_id]
+        session.finish("cancelled")
+        self._disarm(session)
+        return session
+
+    def claim(self, method: str, path: str) -> Optional[Tuple[ProfileSession, Dict[str, Any]]]:
+        """(session, request record) if this request is to be profiled."""
+        session = self.armed  # read once: cancel() runs in the threadpool and may clear it
+        if session is None:
+            return None
+        if not session.finished and time.time() > session.expires_at:
+            session.finish("expired")
+        if session.finished:
+            self._disarm(session)
+            return None
+        if not session.matches(method, path):
+            return None
+        record = session.begin(method, path)
+        if session.remaining <= 0:
+            self._disarm(session)  # later requests take the fast path again
+        return session, record
+
+    def _disarm(self, session: ProfileSession) -> None:
+        # a session armed after this one was cancelled must stay armed
+        if self.armed is session:
+            self.armed = None
+
+
+profiler = Profiler()
+
+
+# ================================================================
+# 🔌 Hooks
+# ================================================================
+class ProfilingMiddleware:
+    """Raw ASGI middleware: disarmed requests cost one attribute check."""
+
+    def __init__(self, app: Any):
+        self.app = app
+        install_threadpool_hook()
+
+    async def __call__(self, scope, receive, send):
+        if profiler.armed is None or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        claimed = profiler.claim(scope["method"], scope["path"])
+        if claimed is None:
+            return await self.app(scope, receive, send)
+        session, record = claimed
+        token = _current.set(session)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+            session.end(record, started)
+
+
+_hook_installed = False
+
+
+def install_threadpool_hook() -> None:
+    """
+    Route anyio.to_thread.run_sync (behind Starlette's run_in_threadpool and
+    sync endpoints) through the active session, so work a profiled request
+    offloads to worker threads is profiled in those threads.
+    """
+    global _hook_installed
+    if _hook_installed or not settings.PROFILING_ENABLED:
+        return
+    import anyio.to_thread
+
+    original = anyio.to_thread.run_sync
+
+    async def run_sync(func, *args, **kwargs):
+        session = _current.get()
+        if session is not None:
+            func = session.wrap(func)
+        return await original(func, *args, **kwargs)
+
+    anyio.to_thread.run_sync = run_sync
+    _hook_installed = True
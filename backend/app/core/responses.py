@@ -0,0 +1,170 @@
+# ================================================================
+# File: app/core/responses.py
+# Description: Numeric prediction responses + fast serialization
+#
+# The default ("display") prediction responses carry friendly labels and
+# percentage strings for the frontend. Machine clients can ask for the
+# versioned numeric representation instead: raw float probabilities,
+# label indices (names via GET /api/predict/labels) and optionally only
+# the top-k classes. It is selected with ?format=numeric or by the Accept
+# header, and encoded with orjson (JSON) or msgpack (MessagePack) when
+# those packages are installed.
+# ================================================================
+
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException, Query, Request
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional dependency; stdlib json fallback
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional dependency; MessagePack is then not offered
+    msgpack = None
+
+NUMERIC_SCHEMA = "healthlens.numeric/v1"
+
+JSON_MEDIA = "application/json"
+NUMERIC_JSON_MEDIA = "application/vnd.healthlens.numeric.v1+json"
+MSGPACK_MEDIA = "application/msgpack"
+MSGPACK_ALIASES = ("application/msgpack", "application/x-msgpack", "application/vnd.healthlens.numeric.v1+msgpack")
+
+
+# ================================================================
+# 🔢 Encoders
+# ================================================================
+def _default(obj: Any) -> Any:
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps_json(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps_json(obj: Any) -> bytes:
+        return json.dumps(obj, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_msgpack(obj: Any) -> bytes:
+    return msgpack.packb(obj, default=_default, use_bin_type=True)
+
+
+class FastJSONResponse(Response):
+    """JSONResponse through orjson; serializes NumPy arrays and scalars directly."""
+
+    media_type = JSON_MEDIA
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
+
+
+class MsgpackResponse(Response):
+    media_type = MSGPACK_MEDIA
+
+    def render(self, content: Any) -> bytes:
+        return dumps_msgpack(content)
+
+
+# ================================================================
+# 🤝 Negotiation
+# ================================================================
+@dataclass(frozen=True)
+class Representation:
+    numeric: bool
+    media_type: str = JSON_MEDIA
+    top_k: Optional[int] = None
+
+    def render(self, payload: Dict[str, Any], status_code: int = 200) -> Response:
+        if self.media_type == MSGPACK_MEDIA:
+            return MsgpackResponse(payload, status_code=status_code)
+        return FastJSONResponse(payload, status_code=status_code, media_type=self.media_type)
+
+
+def _media_ranges(accept: str) -> List[Tuple[str, float]]:
+    """Accept header -> [(media type, q)] sorted by preference (stable for equal q)."""
+    ranges = []
+    for part in accept.split(","):
+        fields = [f.strip() for f in part.split(";")]
+        if not fields[0]:
+            continue
+        q = 1.0
+        for param in fields[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        ranges.append((fields[0].lower(), q))
+    return sorted((r for r in ranges if r[1] > 0), key=lambda r: -r[1])
+
+
+def negotiate(accept: Optional[str], format: str = "display", top_k: Optional[int] = None) -> Representation:
+    """
+    Pick the representation for a prediction response.
+
+    MessagePack and the vendor JSON type always mean the numeric schema;
+    plain JSON means the display format unless ?format=numeric is given.
+    """
+    numeric = format == "numeric"
+    if not accept:
+        return Representation(numeric, JSON_MEDIA, top_k)
+    wanted_msgpack = False
+    for media, _ in _media_ranges(accept):
+        if media in MSGPACK_ALIASES:
+            wanted_msgpack = True
+            if msgpack is not None:
+                return Representation(True, MSGPACK_MEDIA, top_k)
+        elif media == NUMERIC_JSON_MEDIA:
+            return Representation(True, NUMERIC_JSON_MEDIA, top_k)
+        elif media in (JSON_MEDIA, "application/*", "*/*"):
+            return Representation(numeric, JSON_MEDIA, top_k)
+    if wanted_msgpack:
+        raise HTTPException(status_code=406, detail="MessagePack responses are not available on this server")
+    raise HTTPException(status_code=406, detail=f"Supported types: {JSON_MEDIA}, {NUMERIC_JSON_MEDIA}, {MSGPACK_MEDIA}")
+
+
+def response_representation(
+    request: Request,
+    format: str = Query("display", pattern="^(display|numeric)$", description="display (labels + percentages) or numeric"),
+    top_k: Optional[int] = Query(None, ge=1, description="Numeric format: only the k most probable classes"),
+) -> Representation:
+    """FastAPI dependency: the negotiated representation for this request."""
+    return negotiate(request.headers.get("accept"), format, top_k)
+
+
+# ================================================================
+# 🧮 Numeric Payloads
+# ================================================================
+def numeric_probs(probs: Any, top_k: Optional[int] = None) -> Dict[str, Any]:
+    """
+    {"label": argmax index, "score": its probability, "probs": all classes}
+
+    With top_k, "probs" is replaced by "top_k": {"labels": [...], "scores": [...]}
+    ordered by descending probability.
+    """
+    probs = np.asarray(probs, dtype="float32").ravel()
+    idx = int(np.argmax(probs))
+    out: Dict[str, Any] = {"label": idx, "score": float(probs[idx])}
+    if top_k is not None and top_k < len(probs):
+        order = np.argsort(-probs, kind="stable")[:top_k]
+        out["top_k"] = {"labels": order.astype("int32"), "scores": probs[order]}
+    else:
+        out["probs"] = probs
+    return out
+
+
+def numeric_envelope(model: str, version: Optional[str], **fields: Any) -> Dict[str, Any]:
+    return {"schema": NUMERIC_SCHEMA, "model": model, "model_version": version, **fields}
@@ -0,0 +1,83 @@
+# ================================================================
+# File: app/core/tuning.py
+# Description: Per-host tuning profiles written by app.tools.autotune
+#
+# A profile records, for this node type, the TensorFlow thread counts,
+# batch buckets and worker layout that gave the best measured throughput
+# within the p99 budget. The server applies it at startup; settings given
+# explicitly through the environment or .env always win over the profile.
+# ================================================================
+
+import json
+import os
+import socket
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+PROFILE_DIR = Path("tuning")
+
+# profile "server" key -> Settings field it overrides
+SETTINGS_KEYS = {
+    "inference_batch_buckets": "INFERENCE_BATCH_BUCKETS",
+    "admission_concurrency": "ADMISSION_CONCURRENCY",
+}
+
+
+def host_key() -> str:
+    """Profiles are per host name + core count, so identical nodes can share one."""
+    return f"{socket.gethostname()}-{os.cpu_count()}cpu"
+
+
+def profile_path() -> Path:
+    if settings.TUNING_PROFILE:
+        return Path(settings.TUNING_PROFILE)
+    return PROFILE_DIR / f"{host_key()}.json"
+
+
+def load_profile(path: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    path = path or profile_path()
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def save_profile(profile: Dict[str, Any], path: Optional[Path] = None) -> Path:
+    path = path or profile_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(profile, fh, indent=2)
+    os.replace(tmp, path)
+    return path
+
+
+def apply_settings(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy the profile's server values onto `settings` unless set explicitly."""
+    applied = {}
+    server = profile.get("server", {})
+    for key, field in SETTINGS_KEYS.items():
+        if key in server and field not in settings.model_fields_set:
+            setattr(settings, field, server[key])
+            applied[field] = server[key]
+    return applied
+
+
+def apply_threads(profile: Dict[str, Any]) -> Dict[str, int]:
+    """Set TensorFlow's thread pools; must run before TensorFlow executes anything."""
+    server = profile.get("server", {})
+    intra, inter = server.get("intra_op_threads"), server.get("inter_op_threads")
+    if not intra and not inter:
+        return {}
+    try:
+        import tensorflow as tf
+    except ImportError:  # sklearn-only deployment
+        return {}
+
+    if intra:
+        tf.config.threading.set_intra_op_parallelism_threads(int(intra))
+    if inter:
+        tf.config.threading.set_inter_op_parallelism_threads(int(inter))
+    return {"intra_op_threads": intra, "inter_op_threads": inter}
@@ -0,0 +1,394 @@
+# ================================================================
+# File: app/core/uploads.py
+# Description: Bounded, sniffing upload reader for image endpoints
+#
+# The multipart body is parsed as it arrives from the socket (FastAPI's
+# File() would spool the whole form first). The first chunk of every
+# upload is checked for a supported format (magic bytes, not the client's
+# Content-Type) and for the image dimensions in its header, so
+# unsupported files, oversized payloads and decompression bombs are
+# rejected before the rest is read. All buffered upload bytes are charged
+# to a process-wide memory budget.
+# ================================================================
+
+import asyncio
+import os
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Iterable, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from PIL import Image
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from app.core.config import settings
+
+BUDGET_WAIT_S = 2.0
+BUDGET_POLL_S = 0.01
+MULTIPART_OVERHEAD = 16 * 1024  # boundaries + part headers around the file
+SNIFF_BYTES = 132               # enough for every magic number (DICOM's sits after a 128-byte preamble)
+
+IMAGE_FORMATS = ("png", "jpeg")
+STUDY_FORMATS = ("dicom", "zip")
+
+# Let PIL enforce the same pixel ceiling if an image slips past the sniffer.
+Image.MAX_IMAGE_PIXELS = settings.MAX_IMAGE_PIXELS
+
+_PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+_JPEG_MAGIC = b"\xff\xd8\xff"
+_ZIP_MAGIC = b"PK\x03\x04"
+# Start-of-frame markers carry the dimensions (C4/C8/CC are DHT/JPG/DAC).
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+# ================================================================
+# 🔎 Format & Dimension Sniffing
+# ================================================================
+def sniff_format(head: bytes) -> Optional[str]:
+    if head.startswith(_PNG_MAGIC):
+        return "png"
+    if head.startswith(_JPEG_MAGIC):
+        return "jpeg"
+    if head[128:132] == b"DICM":  # 128-byte preamble + DICM prefix
+        return "dicom"
+    if head.startswith(_ZIP_MAGIC):
+        return "zip"
+    return None
+
+
+def _png_size(buf: bytes) -> Optional[Tuple[int, int]]:
+    if len(buf) < 24:
+        return None
+    if buf[12:16] != b"IHDR":
+        raise ValueError("PNG is missing its IHDR header")
+    return int.from_bytes(buf[16:20], "big"), int.from_bytes(buf[20:24], "big")
+
+
+def _jpeg_size(buf: bytes) -> Optional[Tuple[int, int]]:
+    """Walk JPEG segments up to the SOF marker; None means more bytes are needed."""
+    i = 2
+    while i + 4 <= len(buf):
+        if buf[i] != 0xFF:
+            raise ValueError("Corrupt JPEG segment structure")
+        marker = buf[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # markers without a length
+            i += 2
+            continue
+        if marker == 0xDA:
+            raise ValueError("JPEG scan data before frame header")
+        if marker in _JPEG_SOF:
+            if i + 9 > len(buf):
+                return None
+            height = int.from_bytes(buf[i + 5:i + 7], "big")
+            width = int.from_bytes(buf[i + 7:i + 9], "big")
+            return width, height
+        i += 2 + int.from_bytes(buf[i + 2:i + 4], "big")
+    return None
+
+
+def image_size(fmt: str, buf: bytes) -> Optional[Tuple[int, int]]:
+    if fmt == "png":
+        return _png_size(buf)
+    if fmt == "jpeg":
+        return _jpeg_size(buf)
+    return None
+
+
+def _check_format(head: bytes, formats: Tuple[str, ...]) -> str:
+    fmt = sniff_format(head)
+    if fmt not in formats:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Unsupported file type; expected one of: {', '.join(formats)}",
+        )
+    return fmt
+
+
+# ================================================================
+# 📨 Streaming Multipart
+# ================================================================
+def _form_field(field: str, schema: dict) -> dict:
+    """openapi_extra documenting the multipart body the dependencies below read themselves."""
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object", "required": [field], "properties": {field: schema},
+    }}}}}
+
+
+UPLOAD_FORM = _form_field("file", {"type": "string", "format": "binary"})
+
+
+class MultipartFile:
+    """One file field of a multipart request, yielded chunk by chunk straight off the socket."""
+
+    def __init__(self, request: Request, field: str = "file"):
+        content_type, params = parse_options_header(request.headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise HTTPException(status_code=415, detail="Expected a multipart/form-data upload")
+        self.request = request
+        self.field = field.encode()
+        self.boundary = params[b"boundary"]
+        self.filename: Optional[str] = None
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._in_file = False
+        self._done = False
+        self._pending: list = []
+
+    # ---- parser callbacks ----
+    def _on_part_begin(self) -> None:
+        self._disposition = b""
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._disposition)
+        self._in_file = not self._done and options.get(b"name") == self.field and b"filename" in options
+        if self._in_file:
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file:
+            self._pending.append(bytes(data[start:end]))
+
+    def _on_part_end(self) -> None:
+        if self._in_file:
+            self._in_file, self._done = False, True
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        """File bytes as they arrive; stops reading the body once the file part has ended."""
+        parser = MultipartParser(self.boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+        async for body in self.request.stream():
+            try:
+                parser.write(body)
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"Malformed multipart body: {e}")
+            pending, self._pending = self._pending, []
+            for chunk in pending:
+                yield chunk
+            if self._done:
+                return
+        if not self._done:
+            raise HTTPException(status_code=422, detail=f"Missing file field '{self.field.decode()}'")
+
+
+# ================================================================
+# 💾 Process-wide Memory Budget
+# ================================================================
+class MemoryBudget:
+    """Caps the total bytes buffered by in-flight uploads across requests."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self.peak = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self, n: int) -> bool:
+        with self._lock:
+            if self.used + n > self.limit:
+                return False
+            self.used += n
+            self.peak = max(self.peak, self.used)
+            return True
+
+    async def acquire(self, n: int, timeout: float = BUDGET_WAIT_S) -> None:
+        waited = 0.0
+        while not self.try_acquire(n):
+            if waited >= timeout:
+                with self._lock:
+                    self.rejected += 1
+                raise HTTPException(status_code=503, detail="Server is busy processing uploads; retry shortly")
+            await asyncio.sleep(BUDGET_POLL_S)
+            waited += BUDGET_POLL_S
+
+    def release(self, n: int) -> None:
+        with self._lock:
+            self.used -= n
+
+    def describe(self) -> dict:
+        return {"limit": self.limit, "used": self.used, "peak": self.peak, "rejected": self.rejected}
+
+
+upload_budget = MemoryBudget(settings.UPLOAD_MEMORY_BUDGET_BYTES)
+
+
+# ================================================================
+# 📥 Bounded Reader
+# ================================================================
+@dataclass
+class BufferedUpload:
+    data: bytearray
+    format: str
+    width: Optional[int]
+    height: Optional[int]
+    filename: Optional[str] = None
+    reserved: int = field(default=0, repr=False)
+
+
+async def read_upload(
+    upload: MultipartFile,
+    *,
+    formats: Iterable[str] = IMAGE_FORMATS,
+    max_bytes: Optional[int] = None,
+    max_pixels: Optional[int] = None,
+    budget: MemoryBudget = upload_budget,
+) -> BufferedUpload:
+    """
+    Read an upload chunk by chunk, rejecting it as early as possible.
+
+    The caller owns the returned reservation and must call
+    ``budget.release(upload.reserved)`` when done (see ``image_upload``).
+    """
+    formats = tuple(formats)
+    max_bytes = max_bytes or settings.MAX_UPLOAD_BYTES
+    max_pixels = max_pixels or settings.MAX_IMAGE_PIXELS
+
+    buf = bytearray()  # single growing buffer; no per-chunk list + join copy
+    fmt = None
+    dims = None
+    try:
+        async for chunk in upload.chunks():
+            if len(buf) + len(chunk) > max_bytes:
+                raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+            await budget.acquire(len(chunk))
+            buf += chunk
+
+            if fmt is None:
+                if len(buf) < SNIFF_BYTES:
+                    continue
+                fmt = _check_format(buf, formats)
+            if dims is None and fmt in IMAGE_FORMATS:
+                try:
+                    dims = image_size(fmt, buf)
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=f"Invalid image: {e}")
+                if dims is not None and dims[0] * dims[1] > max_pixels:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Image is {dims[0]}x{dims[1]}; at most {max_pixels} pixels are accepted",
+                    )
+        if not buf:
+            raise HTTPException(status_code=400, detail="Empty upload")
+        if fmt is None:  # shorter than SNIFF_BYTES
+            fmt = _check_format(buf, formats)
+            if fmt in IMAGE_FORMATS:
+                try:
+                    dims = image_size(fmt, buf)
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=f"Invalid image: {e}")
+        if fmt in IMAGE_FORMATS and dims is None:
+            raise HTTPException(status_code=400, detail="Invalid image: no dimensions found in header")
+    except BaseException:
+        budget.release(len(buf))
+        raise
+
+    return BufferedUpload(
+        data=buf,
+        format=fmt,
+        width=dims[0] if dims else None,
+        height=dims[1] if dims else None,
+        filename=upload.filename,
+        reserved=len(buf),
+    )
+
+
+async def image_upload(request: Request) -> AsyncIterator[BufferedUpload]:
+    """
+    FastAPI dependency: a sniffed, size-checked image upload from the `file` field.
+
+    Rejects on Content-Length before reading when possible and releases the
+    memory reservation once the request has been handled. Routes using it
+    document the body with ``openapi_extra=UPLOAD_FORM``.
+    """
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > settings.MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {settings.MAX_UPLOAD_BYTES} bytes")
+    buffered = await read_upload(MultipartFile(request))
+    try:
+        yield buffered
+    finally:
+        upload_budget.release(buffered.reserved)
+
+
+# ================================================================
+# 🗂️ Disk-spooled Studies
+# ================================================================
+@dataclass
+class SpooledUpload:
+    path: str
+    format: str
+    size: int
+    filename: Optional[str] = None
+
+
+async def spool_upload(
+    upload: MultipartFile,
+    *,
+    formats: Iterable[str] = STUDY_FORMATS,
+    max_bytes: Optional[int] = None,
+) -> SpooledUpload:
+    """Stream a large upload to a temp file (never fully in memory), sniffing the first chunk."""
+    formats = tuple(formats)
+    max_bytes = max_bytes or settings.MAX_STUDY_UPLOAD_BYTES
+    fd, path = tempfile.mkstemp(prefix="healthlens-study-")
+    fmt = None
+    head = b""
+    total = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            async for chunk in upload.chunks():
+                total += len(chunk)
+                if total > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+                if fmt is None:
+                    head += chunk[:SNIFF_BYTES]
+                    if len(head) >= SNIFF_BYTES:
+                        fmt = _check_format(head, formats)
+                out.write(chunk)
+        if not total:
+            raise HTTPException(status_code=400, detail="Empty upload")
+        if fmt is None:
+            fmt = _check_format(head, formats)
+    except BaseException:
+        os.remove(path)
+        raise
+    return SpooledUpload(path=path, format=fmt, size=total, filename=upload.filename)
+
+
+async def study_upload(request: Request) -> AsyncIterator[SpooledUpload]:
+    """FastAPI dependency: a DICOM file or ZIP series (`file` field) on disk, removed after the request."""
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > settings.MAX_STUDY_UPLOAD_BYTES + MULTIPART_OVERHEAD:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {settings.MAX_STUDY_UPLOAD_BYTES} bytes")
+    spooled = await spool_upload(MultipartFile(request))
+    try:
+        yield spooled
+    finally:
+        os.remove(spooled.path)
@@ -0,0 +1,270 @@
+# ================================================================
+# File: app/db/blobstore.py
+# Description: Content-addressed store for uploaded images
+#
+# Each distinct upload is written once to BLOB_DIR/ab/cd/<sha256> (the
+# same digest DecodedImage already computes) and recorded in `blobs`.
+# `diagnoses.image_sha256` references it; SQLite triggers keep
+# blobs.refcount in step with diagnoses inserts, deletes and updates
+# inside the writing transaction, like the search index triggers
+# (diagnoses in monthly partitions are counted by app/db/partitions.py).
+# Reads memory-map the file, so re-scoring and audits decode straight
+# from the page cache. `python -m app.tools.blob_gc` deletes blobs
+# nobody references after BLOB_GC_GRACE_HOURS and cleans up the tree.
+# ================================================================
+
+import hashlib
+import mmap
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+from sqlalchemy import case, text
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.config import settings
+
+CHUNK = 1024 * 1024
+TMP_DIR = "tmp"
+
+TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS blobs_ref_ai AFTER INSERT ON diagnoses
+    WHEN new.image_sha256 IS NOT NULL BEGIN
+        INSERT INTO blobs(sha256, refcount, created_at) VALUES (new.image_sha256, 1, CURRENT_TIMESTAMP)
+        ON CONFLICT(sha256) DO UPDATE SET refcount = refcount + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS blobs_ref_ad AFTER DELETE ON diagnoses
+    WHEN old.image_sha256 IS NOT NULL BEGIN
+        UPDATE blobs SET refcount = refcount - 1 WHERE sha256 = old.image_sha256;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS blobs_ref_au AFTER UPDATE OF image_sha256 ON diagnoses
+    WHEN old.image_sha256 IS NOT new.image_sha256 BEGIN
+        UPDATE blobs SET refcount = refcount - 1 WHERE sha256 = old.image_sha256;
+        INSERT INTO blobs(sha256, refcount, created_at)
+        SELECT new.image_sha256, 1, CURRENT_TIMESTAMP WHERE new.image_sha256 IS NOT NULL
+        ON CONFLICT(sha256) DO UPDATE SET refcount = refcount + 1;
+    END
+    """,
+]
+
+
+def ensure_blob_schema(engine: Engine) -> None:
+    """Add diagnoses.image_sha256 to databases created before the blob store, plus the refcount triggers."""
+    if engine.dialect.name != "sqlite":
+        return  # create_all covers new databases; refcounts come from recount()
+    with engine.begin() as conn:
+        columns = {row[1] for row in conn.execute(text("PRAGMA table_info(diagnoses)"))}
+        if not columns:
+            return
+        if "image_sha256" not in columns:
+            conn.execute(text("ALTER TABLE diagnoses ADD COLUMN image_sha256 VARCHAR(64)"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_diagnoses_image_sha256 ON diagnoses (image_sha256)"))
+        for statement in TRIGGERS:
+            conn.execute(text(statement))
+
+
+def reference_counts(conn: Connection) -> None:
+    """(Re)fill the temp table blob_refs(sha256, n) from diagnoses and, when partitioned, every month."""
+    conn.execute(text("CREATE TEMP TABLE IF NOT EXISTS blob_refs (sha256 VARCHAR(64) PRIMARY KEY, n INTEGER NOT NULL)"))
+    conn.execute(text("DELETE FROM blob_refs"))
+    conn.execute(text(
+        "INSERT INTO blob_refs SELECT image_sha256, COUNT(*) FROM diagnoses WHERE image_sha256 IS NOT NULL GROUP BY 1"
+    ))
+    from app.db import partitions
+    if partitions.enabled():
+        partitions.add_blob_refs(conn)
+
+
+def recount(conn: Connection) -> int:
+    """Re-derive every refcount from diagnoses (other databases, or after bulk edits); returns rows fixed."""
+    reference_counts(conn)
+    conn.execute(text(
+        """
+        INSERT INTO blobs(sha256, refcount, created_at)
+        SELECT r.sha256, 0, CURRENT_TIMESTAMP FROM blob_refs r
+        WHERE NOT EXISTS (SELECT 1 FROM blobs b WHERE b.sha256 = r.sha256)
+        """
+    ))
+    return conn.execute(text(
+        """
+        UPDATE blobs SET refcount = COALESCE((SELECT n FROM blob_refs r WHERE r.sha256 = blobs.sha256), 0)
+        WHERE refcount != COALESCE((SELECT n FROM blob_refs r WHERE r.sha256 = blobs.sha256), 0)
+        """
+    )).rowcount
+
+
+def map_image(path: str, digest: Optional[str] = None) -> Any:
+    """DecodedImage decoded straight from a memory-mapped file (no read() copy)."""
+    from PIL import Image
+    from app.ml.common.preproc import DecodedImage
+
+    with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        img = Image.open(mm)
+        img.load()
+        return DecodedImage(img, digest=digest or hashlib.sha256(mm).hexdigest())
+
+
+class BlobStore:
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="blob-writer")
+        self.written = 0
+        self.deduplicated = 0
+
+    # ---- layout ----
+    def path(self, sha256: str) -> Path:
+        if len(sha256) != 64 or any(c not in "0123456789abcdef" for c in sha256):
+            raise ValueError(f"Not a SHA-256 hex digest: {sha256!r}")
+        return self.root / sha256[:2] / sha256[2:4] / sha256
+
+    def exists(self, sha256: str) -> bool:
+        return self.path(sha256).is_file()
+
+    # ---- writes ----
+    def _write_file(self, sha256: str, chunks: Iterator[bytes]) -> int:
+        """Write once: temp file + atomic rename; an existing blob is left untouched."""
+        final = self.path(sha256)
+        if final.is_file():
+            self.deduplicated += 1
+            return final.stat().st_size
+        tmp_dir = self.root / TMP_DIR
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        tmp = tmp_dir / f"{sha256}.{uuid.uuid4().hex}"
+        digest, size = hashlib.sha256(), 0
+        try:
+            with open(tmp, "wb") as fh:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    size += len(chunk)
+                    fh.write(chunk)
+                fh.flush()
+                os.fsync(fh.fileno())
+            if digest.hexdigest() != sha256:
+                raise ValueError(f"Content does not match {sha256}")
+            final.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp, final)  # identical content, so a concurrent writer winning is harmless
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        self.written += 1
+        return size
+
+    @staticmethod
+    def _record(conn: Connection, sha256: str, size: int, fmt: Optional[str]) -> None:
+        from app.models.blob import Blob
+
+        dialect = conn.dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(Blob.__table__).values(
+            sha256=sha256, size=size, format=fmt, refcount=0, created_at=datetime.utcnow()
+        )
+        # a diagnosis may have referenced it first (row created by the trigger); an
+        # unreferenced row stored again restarts its blob_gc grace period
+        table = Blob.__table__
+        conn.execute(stmt.on_conflict_do_update(
+            index_elements=["sha256"],
+            set_={
+                "size": stmt.excluded.size,
+                "format": stmt.excluded.format,
+                "created_at": case((table.c.refcount <= 0, stmt.excluded.created_at), else_=table.c.created_at),
+            },
+        ))
+
+    def put(self, data: Any, sha256: Optional[str] = None, fmt: Optional[str] = None) -> str:
+        """Store bytes (synchronously) and return their digest."""
+        from app.db.session import engine
+
+        sha256 = sha256 or hashlib.sha256(data).hexdigest()
+        view = memoryview(data)
+        size = self._write_file(sha256, (view[i:i + CHUNK] for i in range(0, len(view), CHUNK)))
+        with engine.begin() as conn:
+            self._record(conn, sha256, size, fmt)
+        return sha256
+
+    def put_file(self, conn: Connection, source: str, sha256: str, fmt: Optional[str] = None) -> str:
+        """Copy a file into the store on an open connection; the copy is verified against `sha256`."""
+        def chunks() -> Iterator[bytes]:
+            with open(source, "rb") as fh:
+                yield from iter(lambda: fh.read(CHUNK), b"")
+
+        size = self._write_file(sha256, chunks())
+        self._record(conn, sha256, size, fmt or Path(source).suffix.lstrip(".").lower() or None)
+        return sha256
+
+    def put_async(self, data: Any, sha256: str, fmt: Optional[str] = None) -> str:
+        """
+        Store an upload on the background writer; the digest is known up front.
+        Queued bytes are charged to the upload memory budget; once it is spent
+        the write happens in the calling (threadpool) thread instead. Content
+        already on disk is not rewritten, but its row is upserted right away,
+        so a concurrent blob_gc that already dropped the row keeps the file.
+        """
+        from app.core.uploads import upload_budget
+        from app.db.session import engine
+
+        try:
+            size: Optional[int] = self.path(sha256).stat().st_size
+        except FileNotFoundError:
+            size = None
+        if size is not None:
+            self.deduplicated += 1
+            with engine.begin() as conn:
+                self._record(conn, sha256, size, fmt)
+        elif upload_budget.try_acquire(len(data)):
+            self._writer.submit(self._put_logged, data, sha256, fmt, len(data))
+        else:
+            self._put_logged(data, sha256, fmt)
+        return sha256
+
+    def _put_logged(self, data: Any, sha256: str, fmt: Optional[str], reserved: int = 0) -> None:
+        from app.core.uploads import upload_budget
+
+        try:
+            self.put(data, sha256, fmt)
+        except Exception as e:
+            print(f"⚠️ Could not store blob {sha256[:12]}: {e}")
+        finally:
+            upload_budget.release(reserved)
+
+    # ---- reads ----
+    @contextmanager
+    def open(self, sha256: str) -> Iterator[mmap.mmap]:
+        """Read-only memory map of a blob (file-like: PIL can open it directly)."""
+        with open(self.path(sha256), "rb") as fh:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield mm
+
+    def decode(self, sha256: str) -> Any:
+        return map_image(str(self.path(sha256)), sha256)
+
+    def describe(self) -> Dict[str, Any]:
+        from app.db.session import engine
+
+        with engine.connect() as conn:
+            count, size, unreferenced = conn.execute(text(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(CASE WHEN refcount <= 0 THEN 1 ELSE 0 END), 0) FROM blobs"
+            )).one()
+        return {
+            "enabled": settings.BLOB_STORE_ENABLED,
+            "root": str(self.root),
+            "blobs": count,
+            "stored_mb": round(size / (1024 * 1024), 2),
+            "unreferenced": unreferenced,
+            "written": self.written,            # by this process
+            "deduplicated": self.deduplicated,  # writes skipped: content already stored
+        }
+
+
+blobs = BlobStore(settings.BLOB_DIR)
@@ -0,0 +1,31 @@
+# ================================================================
+# File: app/db/fingerprints.py
+# Description: `image_fingerprints` schema upkeep and bulk inserts
+#
+# Kept apart from app/ml/dedup.py (which pulls in NumPy and PIL for
+# hashing) so init_db and the bulk tools can use them without paying
+# for those imports.
+# ================================================================
+
+from typing import Any, Dict, List
+
+from sqlalchemy import inspect, text
+
+
+def ensure_fingerprint_schema(engine: Any) -> None:
+    """Add image_fingerprints.patient_id to databases created before reuse was scoped by patient."""
+    with engine.begin() as conn:
+        columns = {c["name"] for c in inspect(conn).get_columns("image_fingerprints")}
+        if columns and "patient_id" not in columns:
+            conn.execute(text("ALTER TABLE image_fingerprints ADD COLUMN patient_id INTEGER REFERENCES patients(id)"))
+
+
+def insert_fingerprints(conn: Any, rows: List[Dict[str, Any]]) -> List[int]:
+    """Insert image_fingerprints rows on an open connection; returns their ids."""
+    from app.models.image_fingerprint import ImageFingerprint
+
+    if not rows:
+        return []
+    table = ImageFingerprint.__table__
+    stmt = table.insert().returning(table.c.id, sort_by_parameter_order=True)
+    return list(conn.execute(stmt, rows).scalars().all())
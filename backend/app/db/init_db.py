@@ -1,8 +1,14 @@
 # File: app/db/init_db.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text, bindparam
 from sqlalchemy.orm import sessionmaker
 from app.db.session import Base
-from app.models import user, patient  # import all models so metadata is aware
+from app.models import user, patient, diagnosis, patient_disease_status, image_fingerprint, blob, diagnosis_partition  # import all models so metadata is aware
+from app.db.blobstore import ensure_blob_schema
+from app.core.config import settings
+from app.db import partitions
+from app.db.search import ensure_search_index
+from app.db.fingerprints import ensure_fingerprint_schema
+from app.repositories.status_repo import mark_risk_scores, rebuild_statuses, risk_scores_current
 
 # SQLite database
 DATABASE_URL = "sqlite:///./local.db"
@@ -13,8 +19,45 @@ engine = create_engine(
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+def ensure_user_roles(engine) -> int:
+    """Add users.role to databases created before it; grant admin to ADMIN_EMAILS. Returns admins granted."""
+    from app.dependencies.auth import admin_emails
+
+    with engine.begin() as conn:
+        if "role" not in {c["name"] for c in inspect(conn).get_columns("users")}:
+            conn.execute(text("ALTER TABLE users ADD COLUMN role VARCHAR(32) NOT NULL DEFAULT 'clinician'"))
+        emails = sorted(admin_emails())
+        if not emails:
+            return 0
+        return conn.execute(
+            text("UPDATE users SET role = 'admin' WHERE lower(email) IN :emails AND role != 'admin'")
+            .bindparams(bindparam("emails", expanding=True)),
+            {"emails": emails},
+        ).rowcount
+
+
 def init_db():
     """Initialize database: create tables if they don't exist."""
     print("📦 Initializing database...")
+    new_status_table = not inspect(engine).has_table("patient_disease_status")
     Base.metadata.create_all(bind=engine)
+    ensure_blob_schema(engine)
+    ensure_fingerprint_schema(engine)
+    if ensure_user_roles(engine):
+        print("🔑 Admin role granted to ADMIN_EMAILS accounts.")
+    if partitions.enabled():
+        from app.db.session import engine as app_engine
+        partitions.install(app_engine)
+        print(f"🗓️ Diagnoses partitioned by month under {settings.DIAGNOSIS_PARTITION_DIR}/")
+    if new_status_table or not risk_scores_current(engine):
+        db = SessionLocal()
+        try:
+            count = rebuild_statuses(db)
+        finally:
+            db.close()
+        mark_risk_scores(engine)
+        if count:
+            print(f"📋 Worklist status table backfilled from {count} diagnoses.")
+    if ensure_search_index(engine):
+        print("🔎 Search index created and backfilled.")
     print("✅ Database ready.")
@@ -0,0 +1,417 @@
+# ================================================================
+# File: app/db/partitions.py
+# Description: Monthly partitions of the diagnoses history
+#
+# With DIAGNOSIS_PARTITIONS on, new diagnoses go to one SQLite file per
+# month (DIAGNOSIS_PARTITION_DIR/diagnoses_YYYY_MM.db), ATTACHed to each
+# pooled connection as schema p_YYYY_MM. Only the current and previous
+# month are attached, so inserts, index maintenance and recent-window
+# queries work on a month-sized B-tree whatever the total history. Ids
+# encode their month (yyyymm * 10^9 + n), which routes lookups by id.
+#
+# `diagnosis_partitions` catalogs the months. `python -m
+# app.tools.partitions` seals months that left the write window (stats,
+# ANALYZE, VACUUM) and archives older ones to read-only Parquet files,
+# read column-pruned and filtered by row-group statistics. Rows of the
+# legacy main `diagnoses` table are still read as the oldest "month"
+# until `app.tools.partitions migrate` moves them.
+#
+# SQLite triggers cannot reach attached databases, so the search index
+# rows and blob refcounts the main-table triggers maintain are written
+# here instead, in the inserting transaction.
+# ================================================================
+
+import sqlite3
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import (Column, DateTime, Index, Integer, MetaData, String, Table, Text, create_engine, event,
+                        func, insert, select, text)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.pool import NullPool
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from app.core.config import settings
+
+ID_SPAN = 10 ** 9                   # ids of month yyyymm: yyyymm * ID_SPAN + 1, 2, ...
+INFO_KEY = "diagnosis_partitions"   # connection.info: months attached to that connection
+COLUMNS = ("id", "patient_id", "disease_key", "label", "probs_json", "model_version", "created_at", "image_sha256")
+
+
+def enabled() -> bool:
+    return settings.DIAGNOSIS_PARTITIONS
+
+
+# ================================================================
+# 📅 Months & Ids
+# ================================================================
+def month_key(when: datetime) -> str:
+    return f"{when.year:04d}_{when.month:02d}"
+
+
+def month_start(key: str) -> datetime:
+    return datetime(int(key[:4]), int(key[5:]), 1)
+
+
+def next_month(key: str) -> str:
+    return month_key((month_start(key) + timedelta(days=32)).replace(day=1))
+
+
+def previous_month(key: str) -> str:
+    return month_key(month_start(key) - timedelta(days=1))
+
+
+def live_keys(now: Optional[datetime] = None) -> Tuple[str, str]:
+    """Months attached for writes and hot reads: the current one and the one before."""
+    current = month_key(now or datetime.utcnow())
+    return current, previous_month(current)
+
+
+def schema_name(key: str) -> str:
+    return "p_" + key
+
+
+def id_base(key: str) -> int:
+    return int(key.replace("_", "")) * ID_SPAN
+
+
+def key_of_id(diagnosis_id: int) -> Optional[str]:
+    """Month a partitioned id belongs to; None for ids of the legacy main table."""
+    month = diagnosis_id // ID_SPAN
+    if month < 190001:
+        return None
+    return f"{month // 100:04d}_{month % 100:02d}"
+
+
+def partition_path(key: str) -> Path:
+    return Path(settings.DIAGNOSIS_PARTITION_DIR) / f"diagnoses_{key}.db"
+
+
+def archive_path(key: str) -> Path:
+    return Path(settings.DIAGNOSIS_PARTITION_DIR) / "archive" / f"diagnoses_{key}.parquet"
+
+
+# ================================================================
+# 🗂️ Schema & Attachment
+# ================================================================
+_tables: Dict[Optional[str], Table] = {}
+
+
+def table(schema: Optional[str] = None) -> Table:
+    """`diagnoses` as laid out in a partition (schema p_YYYY_MM, or None in a detached file)."""
+    if schema not in _tables:
+        _tables[schema] = Table(
+            "diagnoses", MetaData(schema=schema),
+            Column("id", Integer, primary_key=True),
+            Column("patient_id", Integer, nullable=False),
+            Column("disease_key", String(64), nullable=False),
+            Column("label", String(128), nullable=False),
+            Column("probs_json", Text, nullable=False),
+            Column("model_version", String(16), nullable=False),
+            Column("created_at", DateTime, nullable=False),
+            Column("image_sha256", String(64)),
+            Index("ix_diagnoses_created_at", "created_at"),
+            Index("ix_diagnoses_disease_created", "disease_key", "created_at"),
+            Index("ix_diagnoses_patient_id", "patient_id"),
+            Index("ix_diagnoses_image_sha256", "image_sha256"),
+        )
+    return _tables[schema]
+
+
+def _ddl(schema: Optional[str]) -> List[str]:
+    from sqlalchemy.dialects import sqlite
+
+    t, dialect = table(schema), sqlite.dialect()
+    return [str(CreateTable(t, if_not_exists=True).compile(dialect=dialect))] + [
+        str(CreateIndex(i, if_not_exists=True).compile(dialect=dialect)) for i in t.indexes
+    ]
+
+
+def attach(dbapi_conn: Any, key: str) -> None:
+    """ATTACH a month's file (created on first use) with its schema, and catalog it."""
+    path = partition_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    schema = schema_name(key)
+    dbapi_conn.execute(f"ATTACH DATABASE ? AS {schema}", (str(path),))
+    for statement in _ddl(schema):
+        dbapi_conn.execute(statement)
+    try:
+        dbapi_conn.execute(
+            "INSERT OR IGNORE INTO diagnosis_partitions (key, state, path) VALUES (?, 'live', ?)", (key, str(path))
+        )
+        dbapi_conn.commit()
+    except sqlite3.OperationalError:
+        pass  # catalog not created yet, or busy: months on disk are found without it
+
+
+def _sync_attached(dbapi_conn: Any, record: Any, proxy: Any) -> None:
+    """Pool checkout hook (no transaction is open): attach the live months, detach stale ones."""
+    wanted = live_keys()
+    if record.info.get(INFO_KEY) == wanted:
+        return
+    attached = {row[1] for row in dbapi_conn.execute("PRAGMA database_list")}
+    for name in attached:
+        if name.startswith("p_") and name[2:] not in wanted:
+            dbapi_conn.execute(f"DETACH DATABASE {name}")
+    for key in wanted:
+        if schema_name(key) not in attached:
+            attach(dbapi_conn, key)
+    record.info[INFO_KEY] = wanted
+
+
+def install(engine: Engine) -> None:
+    """Attach the live partitions to every connection `engine` hands out."""
+    if engine.dialect.name != "sqlite" or event.contains(engine, "checkout", _sync_attached):
+        return
+    event.listen(engine, "checkout", _sync_attached)
+
+
+# ================================================================
+# ✍️ Writes
+# ================================================================
+def insert_month(conn: Connection, key: str, values: Sequence[Dict[str, Any]]) -> List[int]:
+    """Insert rows into an attached month with month-encoded ids; returns the ids in order."""
+    t = table(schema_name(key))
+    # computed inside each INSERT, i.e. under the write lock
+    next_id = select(func.max(func.coalesce(func.max(t.c.id), 0), id_base(key)) + 1).scalar_subquery()
+    return [conn.execute(insert(t).values(id=next_id, **v).returning(t.c.id)).scalar_one() for v in values]
+
+
+def insert_diagnoses(conn: Connection, values: Sequence[Dict[str, Any]]) -> List[int]:
+    """Insert rows (created_at set) into their month's partition, indexed; returns the new ids in order."""
+    attached = conn.info.get(INFO_KEY, ())
+    for v in values:
+        if month_key(v["created_at"]) not in attached:
+            raise ValueError(
+                f"Diagnosis partition {month_key(v['created_at'])} is not attached (live: {', '.join(attached) or 'none'})"
+            )
+    ids = []
+    for v in values:
+        ids.extend(insert_month(conn, month_key(v["created_at"]), [v]))
+    index_rows(conn, [{**v, "id": i} for v, i in zip(values, ids)])
+    return ids
+
+
+def _has_table(conn: Connection, name: str) -> bool:
+    return conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = :n"), {"n": name}).first() is not None
+
+
+def index_rows(conn: Connection, rows: Sequence[Dict[str, Any]]) -> None:
+    """Search index rows and blob references of partitioned diagnoses (the main-table triggers' job)."""
+    if not rows:
+        return
+    if _has_table(conn, "diagnoses_fts"):
+        from app.db.search import index_partitioned
+
+        index_partitioned(conn, [{k: r[k] for k in ("id", "patient_id", "label", "disease_key")} for r in rows])
+    refs = [{"sha": r["image_sha256"]} for r in rows if r.get("image_sha256")]
+    if refs and _has_table(conn, "blobs"):
+        conn.execute(text(
+            """
+            INSERT INTO blobs(sha256, refcount, created_at) VALUES (:sha, 1, CURRENT_TIMESTAMP)
+            ON CONFLICT(sha256) DO UPDATE SET refcount = refcount + 1
+            """
+        ), refs)
+
+
+# ================================================================
+# 📖 Reads
+# ================================================================
+@dataclass
+class Source:
+    key: Optional[str]          # None: the legacy main table
+    kind: str                   # attached | file | archive | legacy
+    path: Optional[str] = None
+    stats: Any = None           # catalog row once sealed
+
+    @property
+    def end(self) -> Optional[datetime]:
+        return month_start(next_month(self.key)) if self.key else None
+
+    @property
+    def start(self) -> Optional[datetime]:
+        return month_start(self.key) if self.key else None
+
+
+def catalog(conn: Connection) -> Dict[str, Any]:
+    from app.models.diagnosis_partition import DiagnosisPartition
+
+    if not _has_table(conn, "diagnosis_partitions"):
+        return {}
+    return {row.key: row for row in conn.execute(select(DiagnosisPartition.__table__))}
+
+
+def sources(conn: Connection) -> List[Source]:
+    """Every month newest first, then the legacy main table."""
+    attached = conn.info.get(INFO_KEY, ())
+    rows = catalog(conn)
+    on_disk = {p.stem[len("diagnoses_"):] for p in Path(settings.DIAGNOSIS_PARTITION_DIR).glob("diagnoses_*.db")}
+    found = []
+    for key in sorted(set(attached) | set(rows) | on_disk, reverse=True):
+        row = rows.get(key)
+        stats = row if row is not None and row.state != "live" else None
+        if key in attached:
+            found.append(Source(key, "attached"))
+        elif row is not None and row.state == "archived":
+            found.append(Source(key, "archive", row.path, stats))
+        elif partition_path(key).is_file():
+            found.append(Source(key, "file", str(partition_path(key)), stats))
+    found.append(Source(None, "legacy"))
+    return found
+
+
+@contextmanager
+def _open(conn: Connection, source: Source) -> Iterator[Tuple[Connection, Table]]:
+    """(connection, table) to query a SQL source; detached months open read-only."""
+    if source.kind == "attached":
+        yield conn, table(schema_name(source.key))
+    elif source.kind == "legacy":
+        from app.models.diagnosis import Diagnosis
+        yield conn, Diagnosis.__table__
+    else:
+        engine = create_engine(f"sqlite:///file:{source.path}?mode=ro&uri=true", poolclass=NullPool)
+        try:
+            with engine.connect() as ro:
+                yield ro, table(None)
+        finally:
+            engine.dispose()
+
+
+def _clauses(t: Table, since=None, disease_key=None, labels=None) -> list:
+    clauses = []
+    if since is not None:
+        clauses.append(t.c.created_at >= since)
+    if disease_key is not None:
+        clauses.append(t.c.disease_key == disease_key)
+    if labels is not None:
+        clauses.append(t.c.label.in_(list(labels)))
+    return clauses
+
+
+def _read_archive(source: Source, columns: Sequence[str], since=None, disease_key=None, labels=None,
+                  ids=None) -> Any:
+    """pyarrow Table of an archived month; filters prune row groups by their statistics."""
+    import pyarrow.parquet as pq
+
+    filters = []
+    if since is not None:
+        filters.append(("created_at", ">=", since))
+    if disease_key is not None:
+        filters.append(("disease_key", "=", disease_key))
+    if labels is not None:
+        filters.append(("label", "in", list(labels)))
+    if ids is not None:
+        filters.append(("id", "in", list(ids)))
+    return pq.read_table(source.path, columns=list(columns), filters=filters or None)
+
+
+def rows(conn: Connection, source: Source, columns: Sequence[str] = COLUMNS, since=None, disease_key=None,
+         labels=None, ids=None, newest_first: bool = True, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    if source.kind == "archive":
+        found = _read_archive(source, columns, since, disease_key, labels, ids).to_pylist()
+        found.sort(key=lambda r: (r.get("created_at"), r.get("id")), reverse=newest_first)
+        return found[:limit] if limit is not None else found
+    with _open(conn, source) as (c, t):
+        clauses = _clauses(t, since, disease_key, labels)
+        if ids is not None:
+            clauses.append(t.c.id.in_(list(ids)))
+        order = (t.c.created_at.desc(), t.c.id.desc()) if newest_first else (t.c.created_at, t.c.id)
+        stmt = select(*[t.c[name] for name in columns]).where(*clauses).order_by(*order)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        return [dict(r) for r in c.execute(stmt).mappings()]
+
+
+def count_rows(conn: Connection, source: Source, since=None, labels=None) -> int:
+    whole_month = since is None or (source.start is not None and source.start >= since)
+    if source.stats is not None and source.stats.rows is not None and whole_month:
+        if labels is None:
+            return source.stats.rows
+        import json
+        counts = json.loads(source.stats.label_counts_json or "{}")
+        return sum(counts.get(label, 0) for label in labels)
+    if source.kind == "archive":
+        return _read_archive(source, ["id"], since, labels=labels).num_rows
+    with _open(conn, source) as (c, t):
+        return c.execute(select(func.count()).select_from(t).where(*_clauses(t, since, labels=labels))).scalar()
+
+
+def recent(conn: Connection, limit: int, disease_key: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Newest diagnoses; stops at the first month(s) that fill `limit`."""
+    found: List[Dict[str, Any]] = []
+    for source in sources(conn):
+        found.extend(rows(conn, source, disease_key=disease_key, limit=limit - len(found)))
+        if len(found) >= limit:
+            break
+    return found
+
+
+def count(conn: Connection, since: Optional[datetime] = None, labels: Optional[Sequence[str]] = None) -> int:
+    """Diagnoses created at or after `since`; months ending before it are never opened."""
+    return sum(
+        count_rows(conn, source, since, labels)
+        for source in sources(conn)
+        if since is None or source.end is None or source.end > since
+    )
+
+
+def fetch(conn: Connection, ids: Sequence[int]) -> Dict[int, Dict[str, Any]]:
+    """Diagnoses by id, each looked up in the month its id names."""
+    by_key: Dict[Optional[str], List[int]] = defaultdict(list)
+    for diagnosis_id in ids:
+        by_key[key_of_id(diagnosis_id)].append(diagnosis_id)
+    found = {}
+    for source in sources(conn):
+        if source.key in by_key:
+            found.update({r["id"]: r for r in rows(conn, source, ids=by_key[source.key])})
+    return found
+
+
+def scan(conn: Connection, columns: Sequence[str], since: Optional[datetime] = None,
+         disease_key: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Matching rows of every month, oldest first (legacy table first)."""
+    for source in reversed(sources(conn)):
+        if since is not None and source.end is not None and source.end <= since:
+            continue
+        yield from rows(conn, source, columns, since=since, disease_key=disease_key, newest_first=False)
+
+
+def add_blob_refs(conn: Connection, into: str = "blob_refs") -> None:
+    """Add per-digest reference counts of every month to the `into` (sha256, n) table on `conn`."""
+    upsert = text(
+        f"INSERT INTO {into} (sha256, n) VALUES (:sha, :n) ON CONFLICT(sha256) DO UPDATE SET n = n + excluded.n"
+    )
+    for source in sources(conn):
+        if source.kind == "legacy":
+            continue
+        if source.kind == "archive":
+            grouped = _read_archive(source, ["image_sha256"]).group_by("image_sha256").aggregate(
+                [("image_sha256", "count")]
+            ).to_pylist()
+            counts = [{"sha": g["image_sha256"], "n": g["image_sha256_count"]} for g in grouped if g["image_sha256"]]
+        else:
+            with _open(conn, source) as (c, t):
+                counts = [
+                    {"sha": sha, "n": n} for sha, n in c.execute(
+                        select(t.c.image_sha256, func.count()).where(t.c.image_sha256.is_not(None))
+                        .group_by(t.c.image_sha256)
+                    )
+                ]
+        if counts:
+            conn.execute(upsert, counts)
+
+
+def partition_stats(conn: Connection, t: Table) -> Dict[str, Any]:
+    """Catalog stats of one month: row count, id / created_at ranges and label counts."""
+    import json
+
+    n, min_id, max_id, lo, hi = conn.execute(select(
+        func.count(), func.min(t.c.id), func.max(t.c.id), func.min(t.c.created_at), func.max(t.c.created_at)
+    )).one()
+    labels = dict(conn.execute(select(t.c.label, func.count()).group_by(t.c.label)).all())
+    return {"rows": n, "min_id": min_id, "max_id": max_id, "min_created_at": lo, "max_created_at": hi,
+            "label_counts_json": json.dumps(labels)}
@@ -0,0 +1,259 @@
+# ================================================================
+# File: app/db/search.py
+# Description: SQLite FTS5 search index over patients and diagnoses
+#
+# Two FTS5 tables with the trigram tokenizer, so any 3+ character
+# substring matches through the index instead of a LIKE '%...%' scan:
+#   patients_fts   - external-content index of patients.name
+#   diagnoses_fts  - patient name + label + disease key per diagnosis
+# Triggers keep both in sync inside the writing transaction, so every
+# save_diagnosis() and patient insert/rename/delete is reflected without
+# any application-side bookkeeping. Diagnoses in monthly partitions
+# (app/db/partitions.py) are indexed by the inserting code instead, which
+# also records their patient in diagnoses_fts_patients: triggers cannot
+# see attached months, and a rename finds its index rows by id.
+# ================================================================
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.db import partitions
+
+MIN_TRIGRAM = 3  # shorter queries fall back to an indexed name prefix scan
+
+SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS patients_fts USING fts5(
+        name, content='patients', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS diagnoses_fts USING fts5(
+        patient_name, label, disease_key, tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS diagnoses_fts_patients (
+        id INTEGER PRIMARY KEY,         -- partitioned diagnosis id (= diagnoses_fts rowid)
+        patient_id INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_diagnoses_fts_patients_patient ON diagnoses_fts_patients(patient_id)",
+    # ---- patients ----
+    """
+    CREATE TRIGGER IF NOT EXISTS patients_fts_ai AFTER INSERT ON patients BEGIN
+        INSERT INTO patients_fts(rowid, name) VALUES (new.id, new.name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS patients_fts_ad AFTER DELETE ON patients BEGIN
+        INSERT INTO patients_fts(patients_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS patients_fts_au AFTER UPDATE OF name ON patients BEGIN
+        INSERT INTO patients_fts(patients_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO patients_fts(rowid, name) VALUES (new.id, new.name);
+        UPDATE diagnoses_fts SET patient_name = new.name WHERE rowid IN (
+            SELECT id FROM diagnoses WHERE patient_id = new.id
+            UNION ALL SELECT id FROM diagnoses_fts_patients WHERE patient_id = new.id
+        );
+    END
+    """,
+    # ---- diagnoses ----
+    """
+    CREATE TRIGGER IF NOT EXISTS diagnoses_fts_ai AFTER INSERT ON diagnoses BEGIN
+        INSERT INTO diagnoses_fts(rowid, patient_name, label, disease_key)
+        VALUES (new.id, COALESCE((SELECT name FROM patients WHERE id = new.patient_id), ''),
+                new.label, new.disease_key);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS diagnoses_fts_ad AFTER DELETE ON diagnoses BEGIN
+        DELETE FROM diagnoses_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS diagnoses_fts_au AFTER UPDATE OF patient_id, label, disease_key ON diagnoses BEGIN
+        DELETE FROM diagnoses_fts WHERE rowid = old.id;
+        INSERT INTO diagnoses_fts(rowid, patient_name, label, disease_key)
+        VALUES (new.id, COALESCE((SELECT name FROM patients WHERE id = new.patient_id), ''),
+                new.label, new.disease_key);
+    END
+    """,
+]
+# triggers of earlier layouts whose bodies changed (CREATE ... IF NOT EXISTS keeps old ones)
+OUTDATED = ["patients_fts_au", "diagnoses_fts_ai", "diagnoses_fts_ad", "diagnoses_fts_au"]
+
+# index rows of a partitioned diagnosis (main-table rows are indexed by the triggers)
+INDEX_PARTITIONED = [
+    """
+    INSERT INTO diagnoses_fts(rowid, patient_name, label, disease_key)
+    VALUES (:id, COALESCE((SELECT name FROM patients WHERE id = :patient_id), ''), :label, :disease_key)
+    """,
+    "INSERT OR REPLACE INTO diagnoses_fts_patients(id, patient_id) VALUES (:id, :patient_id)",
+]
+
+
+def index_partitioned(conn: Connection, rows: List[Dict[str, Any]]) -> None:
+    """Search index rows for diagnoses stored in monthly partitions (id, patient_id, label, disease_key)."""
+    for statement in INDEX_PARTITIONED:
+        conn.execute(text(statement), rows)
+
+
+def is_sqlite(bind: Any) -> bool:
+    return bind.dialect.name == "sqlite"
+
+
+def _exists(conn: Connection, name: str) -> bool:
+    row = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = :n"), {"n": name}).first()
+    return row is not None
+
+
+def ensure_search_index(engine: Engine) -> bool:
+    """Create the FTS tables + triggers if missing and backfill them. Returns True if created."""
+    if not is_sqlite(engine):
+        return False
+    with engine.begin() as conn:
+        if not (_exists(conn, "patients") and _exists(conn, "diagnoses")):
+            return False
+        created = not _exists(conn, "diagnoses_fts")
+        if not created and (
+            "patient_id" in {r[1] for r in conn.execute(text("PRAGMA table_info(diagnoses_fts)"))}
+            or not _exists(conn, "diagnoses_fts_patients")
+        ):
+            # an earlier layout: rebuild the diagnoses side with the current triggers
+            for trigger in OUTDATED:
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+            conn.execute(text("DROP TABLE diagnoses_fts"))
+            created = True
+        for statement in SCHEMA:
+            conn.execute(text(statement))
+        if created:
+            _backfill(conn)
+    return created
+
+
+def _backfill(conn: Connection) -> None:
+    conn.execute(text("INSERT INTO patients_fts(patients_fts) VALUES ('rebuild')"))
+    conn.execute(text("DELETE FROM diagnoses_fts"))
+    conn.execute(text("DELETE FROM diagnoses_fts_patients"))
+    conn.execute(text(
+        """
+        INSERT INTO diagnoses_fts(rowid, patient_name, label, disease_key)
+        SELECT d.id, COALESCE(p.name, ''), d.label, d.disease_key
+        FROM diagnoses d LEFT JOIN patients p ON p.id = d.patient_id
+        """
+    ))
+    if partitions.enabled():
+        for source in partitions.sources(conn):
+            if source.kind != "legacy":
+                batch = partitions.rows(conn, source, ("id", "patient_id", "label", "disease_key"), newest_first=False)
+                if batch:
+                    index_partitioned(conn, batch)
+
+
+def rebuild_search_index(engine: Engine) -> None:
+    """Re-derive both indexes from the base tables (e.g. after a bulk load with triggers dropped)."""
+    with engine.begin() as conn:
+        _backfill(conn)
+        conn.execute(text("INSERT INTO patients_fts(patients_fts) VALUES ('optimize')"))
+        conn.execute(text("INSERT INTO diagnoses_fts(diagnoses_fts) VALUES ('optimize')"))
+
+
+# ================================================================
+# 🔎 Queries
+# ================================================================
+def match_expression(query: str) -> Optional[str]:
+    """
+    User text -> FTS5 MATCH expression: every whitespace-separated term
+    must occur (as a substring) somewhere in the row. Terms are quoted so
+    FTS syntax characters in user input are taken literally.
+    """
+    terms = [t for t in query.split() if len(t) >= MIN_TRIGRAM]
+    if not terms:
+        return None
+    return " AND ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+
+def search_patients(conn: Connection, query: str, limit: int, offset: int) -> Tuple[List[Dict[str, Any]], bool]:
+    """(page of patients best match first, has_more)."""
+    expr = match_expression(query)
+    if expr is not None:
+        rows = conn.execute(text(
+            """
+            SELECT p.id, p.name, bm25(patients_fts) AS score
+            FROM patients_fts JOIN patients p ON p.id = patients_fts.rowid
+            WHERE patients_fts MATCH :q
+            ORDER BY score LIMIT :limit OFFSET :offset
+            """
+        ), {"q": expr, "limit": limit + 1, "offset": offset}).mappings().all()
+    else:
+        # 1-2 characters: name prefix over the B-tree index on patients.name
+        prefix = query.strip()
+        rows = conn.execute(text(
+            """
+            SELECT id, name, NULL AS score FROM patients
+            WHERE name >= :lo AND name < :hi
+            ORDER BY name LIMIT :limit OFFSET :offset
+            """
+        ), {"lo": prefix, "hi": prefix + "\uffff", "limit": limit + 1, "offset": offset}).mappings().all()
+    items = [dict(r) for r in rows[:limit]]
+    return items, len(rows) > limit
+
+
+def search_diagnoses(
+    conn: Connection,
+    query: str,
+    limit: int,
+    offset: int,
+    disease_key: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], bool]:
+    expr = match_expression(query)
+    if expr is None:
+        return [], False
+    if partitions.enabled():
+        return _search_partitioned(conn, expr, limit, offset, disease_key)
+    # disease keys like "tb" are shorter than a trigram, so filter them in SQL
+    rows = conn.execute(text(
+        """
+        SELECT d.id, d.patient_id, diagnoses_fts.patient_name, d.disease_key, d.label, d.model_version,
+               d.created_at, bm25(diagnoses_fts) AS score
+        FROM diagnoses_fts JOIN diagnoses d ON d.id = diagnoses_fts.rowid
+        WHERE diagnoses_fts MATCH :q AND (:disease IS NULL OR d.disease_key = :disease)
+        ORDER BY score LIMIT :limit OFFSET :offset
+        """
+    ), {"q": expr, "disease": disease_key, "limit": limit + 1, "offset": offset}).mappings().all()
+    items = [dict(r) for r in rows[:limit]]
+    return items, len(rows) > limit
+
+
+def _search_partitioned(
+    conn: Connection, expr: str, limit: int, offset: int, disease_key: Optional[str]
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """Rank in the index alone, then fetch the page's rows from the months their ids name."""
+    hits = conn.execute(text(
+        """
+        SELECT rowid AS id, patient_name, bm25(diagnoses_fts) AS score
+        FROM diagnoses_fts
+        WHERE diagnoses_fts MATCH :q AND (:disease IS NULL OR disease_key = :disease)
+        ORDER BY score LIMIT :limit OFFSET :offset
+        """
+    ), {"q": expr, "disease": disease_key, "limit": limit + 1, "offset": offset}).mappings().all()
+    found = partitions.fetch(conn, [h["id"] for h in hits[:limit]])
+    items = [
+        {
+            "id": h["id"],
+            "patient_id": found[h["id"]]["patient_id"],
+            "patient_name": h["patient_name"],
+            "disease_key": found[h["id"]]["disease_key"],
+            "label": found[h["id"]]["label"],
+            "model_version": found[h["id"]]["model_version"],
+            "created_at": found[h["id"]]["created_at"],
+            "score": h["score"],
+        }
+        for h in hits[:limit] if h["id"] in found
+    ]
+    return items, len(hits) > limit
@@ -1,4 +1,47 @@
-from fastapi import Depends
-def get_current_user():
-    # Stub: return a demo user payload.
-    return {"id": 1, "email": "demo@user.com", "role": "clinician"}
+from typing import Optional
+
+import jwt
+from fastapi import Depends, Header, HTTPException
+
+from app.core.config import settings
+
+ADMIN_ROLES = {"admin"}
+ANONYMOUS_ROLE = "anonymous"
+
+
+def admin_emails() -> set:
+    return {e.strip().lower() for e in settings.ADMIN_EMAILS.split(",") if e.strip()}
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+
+def get_current_user(authorization: Optional[str] = Header(None)):
+    """The caller behind the bearer token from /auth/login; requests without a token are anonymous."""
+    if not authorization:
+        return {"id": None, "email": None, "role": ANONYMOUS_ROLE}
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise _unauthorized("Invalid authorization header")
+    try:
+        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALG])
+    except jwt.PyJWTError:
+        raise _unauthorized("Invalid or expired token")
+
+    from app.db.session import SessionLocal
+    from app.models.user import User
+
+    with SessionLocal() as db:
+        user = db.query(User).filter(User.email == payload.get("sub")).first()
+    if user is None:
+        raise _unauthorized("Unknown user")
+    return {"id": user.id, "email": user.email, "role": user.role}
+
+
+def require_admin(user=Depends(get_current_user)):
+    if user["id"] is None:
+        raise _unauthorized("Authentication required")
+    if user.get("role") not in ADMIN_ROLES:
+        raise HTTPException(status_code=403, detail="Admin role required")
+    return user
@@ -1,17 +1,12 @@
 # File: app/main.py
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
+import importlib
 import os
-import joblib
 import warnings
-from tensorflow.keras.models import load_model
 
-# Routers
-from app.routers.diagnoses import router as diagnoses_router
-from app.routers.stats import router as stats_router
-from app.routers.dashboard import router as dashboard_router
-from app.routers.auth import router as auth_router
-from app.routers.multi_disease_predictor import router as multi_predict_router
+from app.core.config import settings
 
 # Database init
 from app.db.init_db import init_db
@@ -49,6 +44,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# -----------------------------------------------------
+# 🔬 On-demand Profiling (armed via /api/admin/profile)
+# -----------------------------------------------------
+if settings.PROFILING_ENABLED:
+    from app.core.profiling import ProfilingMiddleware
+
+    app.add_middleware(ProfilingMiddleware)
+
+# -----------------------------------------------------
+# 🧮 Per-route Memory Accounting (/api/admin/memory)
+# -----------------------------------------------------
+if settings.MEMORY_TRACK_PATHS.strip():
+    from app.core.memory import MemoryMiddleware
+
+    app.add_middleware(MemoryMiddleware)
+
 # -----------------------------------------------------
 # 🧠 Define model paths (absolute paths)
 # -----------------------------------------------------
@@ -69,11 +80,105 @@ def root():
 # -----------------------------------------------------
 # 📦 Include Routers
 # -----------------------------------------------------
-app.include_router(dashboard_router)  # already has prefix="/api"
-app.include_router(auth_router, prefix="/api", tags=["auth"])
-app.include_router(diagnoses_router, prefix="/api", tags=["diagnoses"])
-app.include_router(stats_router, prefix="/api", tags=["stats"])
-app.include_router(multi_predict_router)
+# Routers are imported only when enabled (settings.ENABLED_ROUTERS), so a
+# dashboard- or auth-only process never pays for numpy/PIL/TensorFlow.
+ROUTERS = {
+    "dashboard": ("app.routers.dashboard", {}),  # already has prefix="/api"
+    "auth": ("app.routers.auth", {"prefix": "/api", "tags": ["auth"]}),
+    "diagnoses": ("app.routers.diagnoses", {"prefix": "/api", "tags": ["diagnoses"]}),
+    "stats": ("app.routers.stats", {"prefix": "/api", "tags": ["stats"]}),
+    "predict": ("app.routers.multi_disease_predictor", {}),
+    "admin_models": ("app.routers.admin_models", {}),
+    "search": ("app.routers.search", {}),
+    "worklist": ("app.routers.worklist", {}),
+    "admin_ops": ("app.routers.admin_ops", {}),
+}
+
+# Routers that need app.state.models populated at startup
+ML_ROUTERS = {"predict", "admin_models"}
+
+
+def enabled_routers() -> list:
+    value = settings.ENABLED_ROUTERS.strip()
+    if value in ("", "all"):
+        return list(ROUTERS)
+    names = [n.strip() for n in value.split(",") if n.strip()]
+    unknown = [n for n in names if n not in ROUTERS]
+    if unknown:
+        raise ValueError(f"Unknown routers in ENABLED_ROUTERS: {unknown}")
+    return names
+
+
+ENABLED_ROUTERS = enabled_routers()
+
+# -----------------------------------------------------
+# 🎛️ Per-host Tuning Profile
+# -----------------------------------------------------
+# Written by `python -m app.tools.autotune`. Settings it covers (batch
+# buckets, admission concurrency) are applied before the routers import
+# them; TF thread pools are set in load_models() before any model loads.
+from app.core import tuning
+
+TUNING_PROFILE = tuning.load_profile() if settings.APPLY_TUNING_PROFILE else None
+if TUNING_PROFILE:
+    tuning.apply_settings(TUNING_PROFILE)
+
+for name in ENABLED_ROUTERS:
+    module_path, kwargs = ROUTERS[name]
+    app.include_router(importlib.import_module(module_path).router, **kwargs)
+
+# -----------------------------------------------------
+# 🧠 Model Loading
+# -----------------------------------------------------
+def load_models():
+    """Load MODEL_PATHS into a ModelManager on app.state.models."""
+    from os.path import exists
+    from app.ml.serving import ModelManager  # heavy ML imports stay lazy
+    from app.ml.explain import explainer
+
+    if TUNING_PROFILE:
+        threads = tuning.apply_threads(TUNING_PROFILE)
+        server = TUNING_PROFILE.get("server", {})
+        print(f"🎛️ Tuning profile {tuning.profile_path()}: threads={threads}, "
+              f"buckets={settings.INFERENCE_BATCH_BUCKETS}, concurrency={settings.ADMISSION_CONCURRENCY}, "
+              f"recommended uvicorn workers={server.get('uvicorn_workers')}")
+
+    app.state.models = ModelManager()
+    explainer.busy = app.state.models.busy  # explanations yield to predictions
+
+    for key, path in MODEL_PATHS.items():
+        if not exists(path):
+            print(f"⚠️ Skipping {key}: file not found at {path}")
+            continue
+
+        slot = app.state.models.load(key, path)
+        if slot.status == "ready":
+            print(f"✅ Loaded {key} ({slot.version}) successfully from:\n   {path}\n")
+        else:
+            print(f"❌ Failed to load {key} at:\n   {path}\n   Error: {slot.error}")
+
+    load_cascades()
+
+
+def load_cascades():
+    """First-stage models for CASCADE_STAGE1_PATHS, served next to the full models."""
+    from os.path import exists
+    from app.ml.cascade import cascade, stage1_name
+
+    for key, spec in cascade.specs.items():
+        if not exists(spec.path):
+            print(f"⚠️ Skipping {key} cascade: file not found at {spec.path}")
+            continue
+        slot = app.state.models.load(stage1_name(key), spec.path)
+        if slot.status != "ready":
+            print(f"❌ Failed to load {key} first stage at:\n   {spec.path}\n   Error: {slot.error}")
+            continue
+        error = cascade.check(app.state.models, key)
+        if error:
+            print(f"❌ {key} cascade disabled: {error}")
+        else:
+            print(f"✅ {key} cascade: first stage {spec.path} answers at confidence >= {spec.threshold}")
+
 
 # -----------------------------------------------------
 # 🚀 Startup Tasks
@@ -86,9 +191,6 @@ def on_startup():
     - Loads all ML models
     - Prints loaded models & registered routes
     """
-    from os.path import exists
-    import traceback
-
     # ---- 1. Initialize database ----
     print("📦 Initializing database...")
     init_db()
@@ -97,41 +199,17 @@ def on_startup():
     print("🚀 Starting HealthLens API...")
 
     # ---- 2. Load ML models ----
-    app.state.models = {}
-
-    def safe_load(name, loader, path):
-        """Safely loads a model or scaler and logs its status."""
-        try:
-            # For Keras models, disable optimizer loading
-            if path.endswith(".h5"):
-                model = load_model(path, compile=False)  # ✅ skip optimizer state
-            else:
-                model = loader(path)
-
-            app.state.models[name] = model
-            print(f"✅ Loaded {name} successfully from:\n   {path}\n")
-
-        except Exception as e:
-            print(f"❌ Failed to load {name} at:\n   {path}\n   Error: {e}")
-            traceback.print_exc()
-
-    # Iterate through defined paths
-    for key, path in MODEL_PATHS.items():
-        if not exists(path):
-            print(f"⚠️ Skipping {key}: file not found at {path}")
-            continue
-
-        if path.endswith(".h5"):
-            safe_load(key, load_model, path)
-        elif path.endswith(".pkl"):
-            safe_load(key, joblib.load, path)
-        else:
-            print(f"⚠️ Unsupported model file format for {key}: {path}")
+    # New versions can later be staged and promoted via /api/admin/models
+    if ML_ROUTERS.intersection(ENABLED_ROUTERS):
+        load_models()
+    else:
+        print("⏭️ No inference routers enabled; skipping model loading.")
 
     # ---- 3. Print all loaded models ----
     print("🧠 Loaded Models Summary:")
-    if app.state.models:
-        for name in app.state.models.keys():
+    models = getattr(app.state, "models", None)
+    if models:
+        for name in models.keys():
             print(f"   • {name}")
     else:
         print("   ⚠️ No models were loaded successfully!")
@@ -140,15 +218,42 @@ def on_startup():
     # ---- 4. Print all registered routes ----
     print("📌 Registered Routes:")
     for route in app.router.routes:
-        methods = ",".join(sorted(route.methods))
+        if not hasattr(route, "path"):
+            continue
+        methods = ",".join(sorted(getattr(route, "methods", None) or []))
         print(f"   {methods:15s} {route.path}")
     print("-" * 60)
 
+    # ---- 5. Memory accounting (tracemalloc snapshots, if enabled) ----
+    if settings.MEMORY_TRACK_PATHS.strip():
+        from app.core.memory import monitor
+
+        monitor.start()
+        if settings.MEMORY_RECYCLE_GROWTH_MB:
+            print(f"♻️ Worker recycles after {settings.MEMORY_RECYCLE_GROWTH_MB} MB of RSS growth")
+
+    # ---- 6. Start canary probes (read by /api/status/health) ----
+    if settings.HEALTH_PROBE_ENABLED:
+        from app.core.health import prober
+
+        prober.start(app, asyncio.get_event_loop())
+        print(f"🩺 Health prober running every {prober.interval_s:g}s")
+
     print("✅ HealthLens API ready and serving at: http://127.0.0.1:8000\n")
 
+
+@app.on_event("shutdown")
+def on_shutdown():
+    from app.core.health import prober
+    from app.core.memory import monitor
+
+    prober.stop()
+    monitor.stop()
+
 # -----------------------------------------------------
 # 💡 Notes:
-# - app.state.models can be accessed anywhere in the app (e.g., in routes)
-#   Example: model = request.app.state.models["skin_cancer"]
-# - For production, consider moving model loading into a separate module.
+# - app.state.models is a ModelManager (app/ml/serving.py) with a dict-like
+#   read API. Example: model = request.app.state.models.get("skin_cancer")
+# - Use request.app.state.models.predict(name, x) so compiled inference,
+#   shadow traffic and hot swaps apply to the call.
 # -----------------------------------------------------
@@ -0,0 +1,172 @@
+# ================================================================
+# File: app/ml/cascade.py
+# Description: Confidence-gated two-stage inference per disease
+#
+# A small first-stage model (distilled / low-resolution, same classes in
+# the same order as the MODEL_PATHS model) answers on its own when its
+# temperature-calibrated top-1 probability reaches the disease's
+# threshold; everything else escalates to the full model. Thresholds
+# and temperatures come from `python -m app.tools.eval_cascade`, which
+# measures escalation rate, speed-up and disagreement with the full model.
+#
+#   CASCADE_STAGE1_PATHS=skin_cancer:ml models/skin cancer models/stage1.h5
+#   CASCADE_THRESHOLDS=skin_cancer:0.93
+#   CASCADE_TEMPERATURES=skin_cancer:1.6
+# ================================================================
+
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.core.admission import parse_mapping
+from app.core.config import settings
+
+STAGE1_SUFFIX = "_stage1"
+
+
+def stage1_name(key: str) -> str:
+    """ModelManager name of a disease's first-stage model."""
+    return key + STAGE1_SUFFIX
+
+
+def disease_key(name: str) -> str:
+    """Disease key of a ModelManager name (full or first-stage model)."""
+    return name[: -len(STAGE1_SUFFIX)] if name.endswith(STAGE1_SUFFIX) else name
+
+
+def calibrate(probs: np.ndarray, temperature: float) -> np.ndarray:
+    """Temperature scaling applied to softmax outputs (same as dividing the logits by T)."""
+    if temperature == 1.0:
+        return probs
+    logits = np.log(np.clip(probs, 1e-12, 1.0)) / temperature
+    logits -= logits.max(axis=-1, keepdims=True)
+    scaled = np.exp(logits)
+    return scaled / scaled.sum(axis=-1, keepdims=True)
+
+
+def input_layout(model: Any) -> Tuple[str, Tuple[int, int]]:
+    """(PIL mode, (width, height)) a Keras image model expects."""
+    shape = model.input_shape[0] if isinstance(model.input_shape, list) else model.input_shape
+    height, width, channels = shape[1], shape[2], shape[3] if len(shape) > 3 else 1
+    return ("L" if channels == 1 else "RGB"), (width, height)
+
+
+@dataclass
+class CascadeSpec:
+    key: str
+    path: str
+    threshold: float
+    temperature: float = 1.0
+
+
+def cascade_specs() -> Dict[str, CascadeSpec]:
+    thresholds = parse_mapping(settings.CASCADE_THRESHOLDS)
+    temperatures = parse_mapping(settings.CASCADE_TEMPERATURES)
+    return {
+        key: CascadeSpec(
+            key=key,
+            path=path,
+            threshold=float(thresholds.get(key, settings.CASCADE_DEFAULT_THRESHOLD)),
+            temperature=float(temperatures.get(key, 1.0)),
+        )
+        for key, path in parse_mapping(settings.CASCADE_STAGE1_PATHS).items()
+    }
+
+
+class CascadeStats:
+    def __init__(self):
+        self.requests = 0
+        self.answered = 0   # by the first stage alone
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "answered_by_stage1": self.answered,
+            "escalated": self.requests - self.answered,
+            "escalation_rate": round(1 - self.answered / self.requests, 4) if self.requests else None,
+        }
+
+
+class Cascade:
+    def __init__(self, specs: Dict[str, CascadeSpec]):
+        self.specs = specs
+        self.stats = {key: CascadeStats() for key in specs}
+        self.errors: Dict[str, str] = {}   # cascades disabled by check()
+        self._checked: Dict[str, Tuple[Optional[str], Optional[str]]] = {}  # serving (full, stage 1) versions
+
+    def check(self, models: Any, key: str) -> Optional[str]:
+        """Reject a first stage whose class count differs from the full model's."""
+        self._checked[key] = (models.version(key), models.version(stage1_name(key)))
+        stage1, full = models.get(stage1_name(key)), models.get(key)
+        if stage1 is None or full is None:
+            return None
+        if stage1.output_shape[-1] != full.output_shape[-1]:
+            self.errors[key] = (
+                f"first stage has {stage1.output_shape[-1]} outputs, full model {full.output_shape[-1]}"
+            )
+        else:
+            self.errors.pop(key, None)
+        return self.errors.get(key)
+
+    def active(self, models: Any, key: str) -> Optional[CascadeSpec]:
+        spec = self.specs.get(key)
+        if spec is None or not settings.CASCADE_ENABLED or models.get(stage1_name(key)) is None:
+            return None
+        # either side may have been promoted or reloaded since the last check
+        if self._checked.get(key) != (models.version(key), models.version(stage1_name(key))):
+            error = self.check(models, key)
+            if error:
+                print(f"❌ {key} cascade disabled: {error}")
+        if key in self.errors:
+            return None
+        return spec
+
+    def version(self, models: Any, key: str, escalate: bool = False) -> Optional[str]:
+        """
+        Version that produced a result, e.g. 'v2+v1' when the first stage
+        may have answered; cached results (dedup) are keyed by it.
+        """
+        version = models.version(key)
+        if escalate or self.active(models, key) is None:
+            return version
+        return f"{version}+{models.version(stage1_name(key))}"
+
+    def predict(self, models: Any, key: str, image: Any, mode: str, size: Tuple[int, int],
+                escalate: bool = False) -> Tuple[np.ndarray, Optional[Dict[str, Any]]]:
+        """
+        (class probabilities, cascade info or None). The full model runs
+        only when the first stage is unsure, missing, or `escalate` is set.
+        """
+        spec = self.active(models, key)
+        if spec is None:
+            return np.asarray(models.predict(key, image.batch(mode, size))[0]), None
+
+        stats = self.stats[key]
+        stats.requests += 1
+        info: Dict[str, Any] = {"threshold": spec.threshold}
+        if not escalate:
+            name = stage1_name(key)
+            s1_mode, s1_size = input_layout(models.get(name))
+            probs = calibrate(np.asarray(models.predict(name, image.batch(s1_mode, s1_size))[0]), spec.temperature)
+            info["stage1_confidence"] = round(float(probs.max()), 4)
+            if probs.max() >= spec.threshold:
+                stats.answered += 1
+                return probs, {**info, "stage": 1}
+        return np.asarray(models.predict(key, image.batch(mode, size))[0]), {**info, "stage": 2}
+
+    def describe(self, models: Any = None) -> Dict[str, Any]:
+        return {
+            key: {
+                "stage1_path": spec.path,
+                "threshold": spec.threshold,
+                "temperature": spec.temperature,
+                "active": models is not None and self.active(models, key) is not None,
+                "error": self.errors.get(key),
+                **self.stats[key].describe(),
+            }
+            for key, spec in self.specs.items()
+        }
+
+
+cascade = Cascade(cascade_specs())
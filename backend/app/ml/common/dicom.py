@@ -0,0 +1,251 @@
+# ================================================================
+# File: app/ml/common/dicom.py
+# Description: Lazy DICOM volume access for MRI studies
+#
+# A study is either one (multi-frame) DICOM file or a ZIP archive of a
+# slice series. Slices are only read when a batch asks for them:
+# uncompressed pixel data is memory-mapped straight from the file,
+# compressed frames are decoded one at a time, and archive members are
+# read per slice. Windowing and rescaling run vectorized over a batch.
+# ================================================================
+
+import io
+import zipfile
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+PIXEL_DATA_TAG = (0x7FE0, 0x0010)
+
+
+def _pydicom():
+    try:
+        import pydicom
+    except ImportError as e:  # optional dependency
+        raise RuntimeError("DICOM support requires the 'pydicom' package") from e
+    return pydicom
+
+
+def _first(value, default=None):
+    """DICOM multi-valued fields (e.g. WindowCenter) -> first number."""
+    if value is None or value == "":
+        return default
+    if hasattr(value, "__getitem__") and not isinstance(value, (str, bytes)):
+        return float(value[0]) if len(value) else default
+    return float(value)
+
+
+@dataclass
+class SliceParams:
+    """Per-slice display parameters used by the vectorized windowing."""
+    slope: float = 1.0
+    intercept: float = 0.0
+    center: Optional[float] = None
+    width: Optional[float] = None
+    invert: bool = False  # MONOCHROME1
+
+    @classmethod
+    def from_dataset(cls, ds) -> "SliceParams":
+        return cls(
+            slope=_first(getattr(ds, "RescaleSlope", None), 1.0),
+            intercept=_first(getattr(ds, "RescaleIntercept", None), 0.0),
+            center=_first(getattr(ds, "WindowCenter", None)),
+            width=_first(getattr(ds, "WindowWidth", None)),
+            invert=getattr(ds, "PhotometricInterpretation", "") == "MONOCHROME1",
+        )
+
+
+# ================================================================
+# 📚 Volume Sources
+# ================================================================
+class DicomVolume:
+    """Random access to slices of a study without loading the whole study."""
+
+    params: List[SliceParams]
+    series_count: int = 1
+    fallback_window: Optional[Tuple[float, float]] = None  # when slices lack WindowWidth
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def read(self, start: int, stop: int) -> np.ndarray:
+        """Raw stored values for slices [start, stop) as (n, rows, cols) float32."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def batches(self, batch_size: int) -> Iterator[Tuple[int, np.ndarray]]:
+        """Yield (first slice index, windowed [0, 1] batch) pairs."""
+        for start in range(0, len(self), batch_size):
+            stop = min(start + batch_size, len(self))
+            raw = self.read(start, stop)
+            yield start, apply_window(raw, self.params[start:stop], self.fallback_window)
+
+
+class MultiFrameVolume(DicomVolume):
+    """A single DICOM file; each frame is a slice."""
+
+    def __init__(self, path: str):
+        pydicom = _pydicom()
+        self.path = path
+        # defer_size keeps PixelData on disk; we only want its offset
+        self.ds = pydicom.dcmread(path, defer_size=1024)
+        self.frames = int(getattr(self.ds, "NumberOfFrames", 1) or 1)
+        self.rows, self.cols = int(self.ds.Rows), int(self.ds.Columns)
+        params = SliceParams.from_dataset(self.ds)
+        self.params = [params] * self.frames
+        self._mmap = self._memory_map()
+
+    def _memory_map(self) -> Optional[np.ndarray]:
+        ds = self.ds
+        syntax = ds.file_meta.TransferSyntaxUID
+        if syntax.is_compressed or not syntax.is_little_endian:
+            return None
+        if int(getattr(ds, "SamplesPerPixel", 1)) != 1 or int(ds.BitsAllocated) not in (8, 16, 32):
+            return None
+        elem = ds.get_item(PIXEL_DATA_TAG)
+        offset = getattr(elem, "value_tell", None)
+        if offset is None:
+            return None
+        kind = "i" if int(getattr(ds, "PixelRepresentation", 0)) == 1 else "u"
+        dtype = np.dtype(f"<{kind}{int(ds.BitsAllocated) // 8}")
+        return np.memmap(self.path, dtype=dtype, mode="r", offset=offset,
+                         shape=(self.frames, self.rows, self.cols))
+
+    def __len__(self) -> int:
+        return self.frames
+
+    def read(self, start: int, stop: int) -> np.ndarray:
+        if self._mmap is not None:
+            return np.asarray(self._mmap[start:stop], dtype="float32")
+        return np.stack([self._decode_frame(i) for i in range(start, stop)]).astype("float32")
+
+    def _decode_frame(self, index: int) -> np.ndarray:
+        try:  # pydicom >= 3 can decode a single frame
+            from pydicom.pixels import pixel_array
+            frame = pixel_array(self.path, index=index)
+        except ImportError:
+            frame = self.ds.pixel_array if self.frames == 1 else self.ds.pixel_array[index]
+        return _to_gray(frame)
+
+    def close(self) -> None:
+        self._mmap = None
+
+
+class ArchiveSeriesVolume(DicomVolume):
+    """A ZIP archive of single-slice DICOM files, ordered along the slice axis."""
+
+    def __init__(self, path: str, max_slices: int, max_unpacked_bytes: int):
+        pydicom = _pydicom()
+        self._pydicom = pydicom
+        self.zip = zipfile.ZipFile(path)
+        members = [m for m in self.zip.infolist() if not m.is_dir()]
+        if len(members) > max_slices:
+            raise ValueError(f"Archive has {len(members)} files; at most {max_slices} slices are accepted")
+        if sum(m.file_size for m in members) > max_unpacked_bytes:
+            raise ValueError("Archive unpacks to more than the allowed study size")
+
+        headers = []
+        for member in members:
+            with self.zip.open(member) as fh:
+                try:
+                    ds = pydicom.dcmread(fh, stop_before_pixels=True)
+                except Exception:
+                    continue  # skip non-DICOM files (DICOMDIR, readmes, ...)
+            if "Rows" not in ds:
+                continue
+            headers.append((self._sort_key(ds), member.filename, SliceParams.from_dataset(ds),
+                            getattr(ds, "SeriesInstanceUID", "")))
+        if not headers:
+            raise ValueError("Archive contains no DICOM image slices")
+        headers.sort(key=lambda h: h[0])
+        self.names = [h[1] for h in headers]
+        self.params = [h[2] for h in headers]
+        self.series_count = len({h[3] for h in headers})
+
+    @staticmethod
+    def _sort_key(ds) -> Tuple:
+        position = getattr(ds, "ImagePositionPatient", None)
+        z = float(position[2]) if position is not None and len(position) == 3 else 0.0
+        return (str(getattr(ds, "SeriesInstanceUID", "")), z, int(getattr(ds, "InstanceNumber", 0) or 0))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def read(self, start: int, stop: int) -> np.ndarray:
+        frames = []
+        shape = None
+        for name in self.names[start:stop]:
+            ds = self._pydicom.dcmread(io.BytesIO(self.zip.read(name)))
+            frame = _to_gray(ds.pixel_array)
+            if shape is None:
+                shape = frame.shape
+            elif frame.shape != shape:
+                frame = np.asarray(Image.fromarray(frame.astype("float32"), "F").resize(shape[::-1]))
+            frames.append(frame)
+        return np.stack(frames).astype("float32")
+
+    def close(self) -> None:
+        self.zip.close()
+
+
+def _to_gray(frame: np.ndarray) -> np.ndarray:
+    return frame.mean(axis=-1) if frame.ndim == 3 else frame
+
+
+def open_volume(path: str, fmt: str, max_slices: int, max_unpacked_bytes: int) -> DicomVolume:
+    volume: DicomVolume
+    if fmt == "zip":
+        volume = ArchiveSeriesVolume(path, max_slices, max_unpacked_bytes)
+    else:
+        volume = MultiFrameVolume(path)
+        if len(volume) > max_slices:
+            raise ValueError(f"Study has {len(volume)} frames; at most {max_slices} slices are accepted")
+    if any(p.width is None for p in volume.params):
+        volume.fallback_window = estimate_window(volume)
+    return volume
+
+
+# ================================================================
+# 🪟 Vectorized Windowing & Resize
+# ================================================================
+def estimate_window(volume: DicomVolume, samples: int = 8) -> Tuple[float, float]:
+    """(low, high) from the 1st/99th percentile of a few evenly spaced slices."""
+    n = len(volume)
+    idx = np.unique(np.linspace(0, n - 1, num=min(samples, n)).astype(int))
+    raw = np.concatenate([volume.read(i, i + 1) for i in idx])
+    slope = np.array([volume.params[i].slope for i in idx], dtype="float32").reshape(-1, 1, 1)
+    intercept = np.array([volume.params[i].intercept for i in idx], dtype="float32").reshape(-1, 1, 1)
+    low, high = np.percentile(raw * slope + intercept, [1, 99])
+    return float(low), float(max(high, low + 1.0))
+
+
+def apply_window(
+    raw: np.ndarray,
+    params: List[SliceParams],
+    fallback: Optional[Tuple[float, float]] = None,
+) -> np.ndarray:
+    """Rescale + window a (n, rows, cols) batch into [0, 1] with per-slice parameters."""
+    def column(values):
+        return np.asarray(values, dtype="float32").reshape(-1, 1, 1)
+
+    low_default, high_default = fallback if fallback else (float(raw.min()), float(raw.max()) or 1.0)
+    slope = column([p.slope for p in params])
+    intercept = column([p.intercept for p in params])
+    low = column([p.center - p.width / 2 if p.width else low_default for p in params])
+    width = column([p.width if p.width else max(high_default - low_default, 1e-6) for p in params])
+    invert = column([p.invert for p in params]).astype(bool)
+
+    out = np.clip((raw * slope + intercept - low) / width, 0.0, 1.0)
+    return np.where(invert, 1.0 - out, out).astype("float32")
+
+
+def resize_batch(batch: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    """(n, rows, cols) in [0, 1] -> (n, h, w, 1) float32 model input."""
+    out = np.empty((len(batch), size[1], size[0], 1), dtype="float32")
+    for i, frame in enumerate(batch):
+        out[i, ..., 0] = np.asarray(Image.fromarray(frame, "F").resize(size, Image.BILINEAR))
+    return out
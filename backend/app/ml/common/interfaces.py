@@ -14,5 +14,30 @@ class BaseDiseasePipeline(ABC):
     def infer(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         ...
 
+    def saliency_model(self) -> Any:
+        """Differentiable (Keras) model used for Grad-CAM, or None if not explainable."""
+        return None
+
     def explain(self, payload: Dict[str, Any]) -> Dict[str, Any]:
-        return {"explainable": False}
+        """
+        Queue a Grad-CAM explanation for payload["image"] (a DecodedImage).
+
+        Returns immediately with an explanation_id; the overlay is computed in
+        the background and cached by image hash + model version.
+        """
+        model = self.saliency_model()
+        image = payload.get("image")
+        if model is None or image is None:
+            return {"explainable": False}
+        from app.ml.explain import explainer
+
+        job = explainer.submit(
+            digest=image.digest,
+            model_name=self.name,
+            version=self.version,
+            model=model,
+            input_batch=image.batch("RGB", self.input_size),
+            base_rgb=image.array("RGB", self.input_size),
+            labels=getattr(self, "labels", None),
+        )
+        return job.describe()
@@ -0,0 +1,121 @@
+"""
+Perceptual image hashes and a multi-index hash table for Hamming-radius search.
+
+pHash (low-frequency DCT signs) survives re-encoding, resizing and small
+crops; dHash (horizontal gradient signs) is cheaper and is used as a second
+check. Both are 64-bit ints.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+HASH_BITS = 64
+CHUNKS = 4          # 16-bit substrings for the multi-index table
+CHUNK_BITS = HASH_BITS // CHUNKS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+MAX_RADIUS = 3 * CHUNKS - 1  # exact search needs <= 2 flips per substring
+
+_PHASH_SIZE = 32
+_n = np.arange(_PHASH_SIZE)
+# Orthonormal DCT-II basis; coefficients = D @ block @ D.T
+_DCT = np.sqrt(2.0 / _PHASH_SIZE) * np.cos(np.pi * (2 * _n[None, :] + 1) * _n[:, None] / (2 * _PHASH_SIZE))
+_DCT[0] /= np.sqrt(2.0)
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int("".join("1" if b else "0" for b in bits.ravel()), 2)
+
+
+def phash(gray: Image.Image) -> int:
+    pixels = np.asarray(gray.resize((_PHASH_SIZE, _PHASH_SIZE), Image.LANCZOS), dtype="float64")
+    low = (_DCT @ pixels @ _DCT.T)[:8, :8]
+    median = np.median(low.ravel()[1:])  # DC term excluded: it only tracks brightness
+    return _bits_to_int(low > median)
+
+
+def dhash(gray: Image.Image) -> int:
+    pixels = np.asarray(gray.resize((9, 8), Image.LANCZOS), dtype="float64")
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def fingerprint(image) -> Tuple[int, int]:
+    """(phash, dhash) of a DecodedImage, computed once per image."""
+    if image.fingerprint is None:
+        gray = image.converted("L")
+        image.fingerprint = (phash(gray), dhash(gray))
+    return image.fingerprint
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def to_signed(value: int) -> int:
+    """64-bit hash -> signed int that fits an SQLite INTEGER."""
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+
+def to_unsigned(value: int) -> int:
+    return value + (1 << HASH_BITS) if value < 0 else value
+
+
+def _neighbours(value: int, radius: int) -> Iterable[int]:
+    """Every CHUNK_BITS-bit value within `radius` bit flips of `value`."""
+    yield value
+    if radius >= 1:
+        for i in range(CHUNK_BITS):
+            flipped = value ^ (1 << i)
+            yield flipped
+            if radius >= 2:
+                for j in range(i + 1, CHUNK_BITS):
+                    yield flipped ^ (1 << j)
+
+
+class MultiIndexHash:
+    """
+    Hamming-radius search over 64-bit hashes (Norouzi et al.'s multi-index
+    hashing). Each hash is split into CHUNKS 16-bit substrings with one
+    table per substring; by pigeonhole, a hash within distance r of the
+    query matches some substring within r // CHUNKS bits, so a lookup only
+    probes those few buckets and verifies the candidates.
+    """
+
+    def __init__(self):
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in range(CHUNKS)]
+        self._hashes: Dict[int, int] = {}  # entry id -> hash
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    @staticmethod
+    def _chunks(value: int) -> List[int]:
+        return [(value >> (i * CHUNK_BITS)) & CHUNK_MASK for i in range(CHUNKS)]
+
+    def add(self, entry_id: int, value: int) -> None:
+        self._hashes[entry_id] = value
+        for table, chunk in zip(self._tables, self._chunks(value)):
+            table.setdefault(chunk, []).append(entry_id)
+
+    def search(self, value: int, radius: int) -> List[Tuple[int, int]]:
+        """[(distance, entry id)] within `radius`, closest first."""
+        if not 0 <= radius <= MAX_RADIUS:
+            raise ValueError(f"radius must be between 0 and {MAX_RADIUS}")
+        sub_radius = radius // CHUNKS
+        seen = set()
+        found = []
+        for table, chunk in zip(self._tables, self._chunks(value)):
+            for probe in _neighbours(chunk, sub_radius):
+                for entry_id in table.get(probe, ()):
+                    if entry_id in seen:
+                        continue
+                    seen.add(entry_id)
+                    distance = hamming(value, self._hashes[entry_id])
+                    if distance <= radius:
+                        found.append((distance, entry_id))
+        found.sort()
+        return found
+
+    def nearest(self, value: int, radius: int) -> Optional[Tuple[int, int]]:
+        found = self.search(value, radius)
+        return found[0] if found else None
@@ -1,9 +1,69 @@
+import hashlib
 import io
-from typing import Tuple
+import threading
+from typing import Any, Dict, Optional, Tuple
 from PIL import Image
 import numpy as np
 
+
+class DecodedImage:
+    """
+    A single decode of uploaded image bytes, shared by every model that needs it.
+
+    Color conversions and resized float arrays are derived from that decode and
+    cached per (mode, size), so checking one image with N models costs one
+    decode plus one resize per distinct input shape.
+    """
+
+    def __init__(self, image: Image.Image, digest: Optional[str] = None):
+        self.image = image
+        self.digest = digest  # sha256 of the source bytes, when known
+        self.fingerprint = None  # (phash, dhash), set by app.ml.common.phash.fingerprint()
+        self._converted: Dict[str, Image.Image] = {}
+        self._arrays: Dict[Tuple[str, Tuple[int, int]], np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_bytes(cls, file_bytes: bytes) -> "DecodedImage":
+        img = Image.open(io.BytesIO(file_bytes))
+        img.load()
+        return cls(img, digest=hashlib.sha256(file_bytes).hexdigest())
+
+    def converted(self, mode: str) -> Image.Image:
+        with self._lock:
+            if mode not in self._converted:
+                self._converted[mode] = self.image if self.image.mode == mode else self.image.convert(mode)
+            return self._converted[mode]
+
+    def array(self, mode: str, size: Tuple[int, int]) -> np.ndarray:
+        """HWC float32 array in [0, 1]; grayscale keeps a trailing channel axis."""
+        key = (mode, tuple(size))
+        cached = self._arrays.get(key)
+        if cached is not None:
+            return cached
+        arr = np.asarray(self.converted(mode).resize(size), dtype="float32") / 255.0
+        if arr.ndim == 2:
+            arr = arr[..., np.newaxis]
+        arr.setflags(write=False)  # shared between concurrent models
+        self._arrays[key] = arr
+        return arr
+
+    def batch(self, mode: str, size: Tuple[int, int]) -> np.ndarray:
+        """NHWC batch of one, as Keras models expect."""
+        return self.array(mode, size)[np.newaxis, ...]
+
+    def chw(self, size: Tuple[int, int]) -> np.ndarray:
+        """CHW RGB array, as the ONNX pipelines expect."""
+        return np.transpose(self.array("RGB", size), (2, 0, 1))
+
+
 def load_image_rgb(file_bytes: bytes, size: Tuple[int, int]) -> np.ndarray:
-    img = Image.open(io.BytesIO(file_bytes)).convert("RGB").resize(size)
-    arr = np.asarray(img).astype("float32") / 255.0
-    return np.transpose(arr, (2, 0, 1))
+    return DecodedImage.from_bytes(file_bytes).chw(size)
+
+
+def payload_image(payload: Dict[str, Any], size: Tuple[int, int]) -> np.ndarray:
+    """CHW RGB input from a pipeline payload: a shared DecodedImage or raw bytes."""
+    image = payload.get("image")
+    if image is None:
+        image = DecodedImage.from_bytes(payload["file"])
+    return image.chw(size)
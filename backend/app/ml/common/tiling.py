@@ -0,0 +1,251 @@
+# ================================================================
+# File: app/ml/common/tiling.py
+# Description: Tiled inference for high-resolution images
+#
+# Instead of squashing a 4000 px dermoscopy photo to the model input
+# size, find the lesion on a cheap thumbnail, read only that region at
+# the resolution the tile budget allows, and cut it into overlapping
+# model-sized tiles. JPEGs are decoded at the coarsest DCT scale that
+# covers the needed resolution (PIL draft mode: 1/8 for the thumbnail),
+# and only the ROI crop is kept past the read, so per-request memory is
+# the crop plus at most one transient decode; PNG has no scaled decode.
+# Tiles go through the model in batches, most lesion-covered first, and
+# stop early once a tile is confident enough.
+# ================================================================
+
+import io
+import math
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+Box = Tuple[int, int, int, int]
+
+THUMB_SIDE = 512        # ROI detection resolution
+ROI_MARGIN = 0.10       # grow the lesion box by this share of its size
+ROI_MIN_SHARE = 0.002   # masks smaller than this share of the thumbnail are noise
+ROI_MAX_SHARE = 0.90    # ... and larger ones mean "no distinct region": use the whole image
+BORDER = 0.05           # dermatoscope vignetting lives in the outer band
+
+
+@dataclass
+class TilePlan:
+    region: Image.Image                 # ROI at inference scale, in the model's color mode
+    roi: Box                            # ROI in source pixels
+    source_size: Tuple[int, int]
+    scale: float                        # inference pixels per source pixel
+    decode_reduction: int               # JPEG draft reduction used for the region read
+    tiles: List[Box] = field(default_factory=list)        # in region pixels, evaluation order
+    coverage: List[float] = field(default_factory=list)   # lesion share of each tile
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "source_size": list(self.source_size),
+            "roi": list(self.roi),
+            "scale": round(self.scale, 4),
+            "decode_reduction": self.decode_reduction,
+            "tiles": len(self.tiles),
+        }
+
+
+# ================================================================
+# 🎯 Region of Interest
+# ================================================================
+def _otsu(values: np.ndarray) -> float:
+    hist, edges = np.histogram(values, bins=64, range=(0.0, 1.0))
+    weights = hist.astype("float64") / max(hist.sum(), 1)
+    centers = (edges[:-1] + edges[1:]) / 2
+    w0 = np.cumsum(weights)
+    m0 = np.cumsum(weights * centers)
+    between = (m0[-1] * w0 - m0) ** 2 / np.clip(w0 * (1 - w0), 1e-12, None)
+    return float(centers[int(np.argmax(between))])
+
+
+def lesion_mask(gray: np.ndarray) -> np.ndarray:
+    """Darker-than-skin pixels (Otsu split), ignoring the vignetted outer band."""
+    h, w = gray.shape
+    inner = np.zeros_like(gray, dtype=bool)
+    bh, bw = int(h * BORDER), int(w * BORDER)
+    inner[bh:h - bh, bw:w - bw] = True
+    if gray[inner].size == 0 or np.ptp(gray[inner]) < 0.05:
+        return np.zeros_like(gray, dtype=bool)
+    return (gray < _otsu(gray[inner])) & inner
+
+
+def mask_box(mask: np.ndarray) -> Optional[Box]:
+    """Bounding box of the mask (with margin), or None when there is no distinct region."""
+    share = float(mask.mean())
+    if share < ROI_MIN_SHARE or share > ROI_MAX_SHARE:
+        return None
+    rows, cols = np.flatnonzero(mask.any(axis=1)), np.flatnonzero(mask.any(axis=0))
+    y0, y1, x0, x1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+    my, mx = int((y1 - y0) * ROI_MARGIN) + 1, int((x1 - x0) * ROI_MARGIN) + 1
+    h, w = mask.shape
+    return max(0, x0 - mx), max(0, y0 - my), min(w, x1 + mx), min(h, y1 + my)
+
+
+def _thumbnail(data: bytes) -> Image.Image:
+    img = Image.open(io.BytesIO(data))
+    img.draft("RGB", (THUMB_SIDE, THUMB_SIDE))  # JPEG: decode at 1/2..1/8 scale
+    thumb = img.convert("L")
+    thumb.thumbnail((THUMB_SIDE, THUMB_SIDE))
+    return thumb
+
+
+# ================================================================
+# 🧩 Tile Layout
+# ================================================================
+def axis_positions(length: int, tile: int, overlap: float) -> List[int]:
+    """Tile offsets covering [0, length); the last tile is flush with the end."""
+    if length <= tile:
+        return [(length - tile) // 2]   # one tile, padded around the region
+    stride = max(1, int(round(tile * (1 - overlap))))
+    return list(range(0, length - tile, stride)) + [length - tile]
+
+
+def tile_count(width: float, height: float, tile: int, overlap: float) -> int:
+    return len(axis_positions(int(width), tile, overlap)) * len(axis_positions(int(height), tile, overlap))
+
+
+def fit_scale(width: int, height: int, tile: int, overlap: float, max_tiles: int) -> float:
+    """Largest scale <= 1 (never upsampled past native) whose tiling fits max_tiles."""
+    scale = 1.0
+    if min(width, height) < tile:
+        scale = tile / min(width, height)  # small lesion: enlarge to one full tile
+    while scale * max(width, height) > tile and tile_count(width * scale, height * scale, tile, overlap) > max_tiles:
+        scale *= 0.95
+    return scale
+
+
+def plan_tiles(data: bytes, tile: int, mode: str, overlap: float, max_tiles: int, roi: bool = True) -> TilePlan:
+    """Locate the lesion, read that region at the scale the tile budget allows and lay out tiles."""
+    if not 0 <= overlap < 1:
+        raise ValueError("overlap must be in [0, 1)")
+    with Image.open(io.BytesIO(data)) as probe:
+        source_w, source_h = probe.size  # header only
+
+    thumb = _thumbnail(data)
+    mask = lesion_mask(np.asarray(thumb, dtype="float32") / 255.0)
+    box = mask_box(mask) if roi else None
+    tx = source_w / thumb.size[0]
+    ty = source_h / thumb.size[1]
+    if box is None:
+        roi_box = (0, 0, source_w, source_h)
+    else:
+        roi_box = (int(box[0] * tx), int(box[1] * ty), min(source_w, math.ceil(box[2] * tx)),
+                   min(source_h, math.ceil(box[3] * ty)))
+    roi_w, roi_h = roi_box[2] - roi_box[0], roi_box[3] - roi_box[1]
+
+    scale = fit_scale(roi_w, roi_h, tile, overlap, max_tiles)
+    out_w, out_h = max(1, round(roi_w * scale)), max(1, round(roi_h * scale))
+
+    # windowed read: decode at the coarsest JPEG scale that still covers the
+    # target resolution, then crop the ROI out of that reduced bitmap
+    with Image.open(io.BytesIO(data)) as img:
+        img.draft(img.mode if img.mode in ("RGB", "L") else "RGB",
+                  (max(1, math.ceil(source_w * min(scale, 1.0))), max(1, math.ceil(source_h * min(scale, 1.0)))))
+        reduction = max(1, round(source_w / img.size[0]))
+        crop = img.crop(tuple(int(round(v / reduction)) for v in roi_box))
+        region = crop.convert(mode).resize((out_w, out_h))
+
+    plan = TilePlan(region, roi_box, (source_w, source_h), scale, reduction)
+    # thumbnail-mask coverage of each tile orders the evaluation
+    for y in axis_positions(out_h, tile, overlap):
+        for x in axis_positions(out_w, tile, overlap):
+            plan.tiles.append((x, y, x + tile, y + tile))
+    coverage = []
+    for x0, y0, x1, y1 in plan.tiles:
+        sx0 = int((roi_box[0] + max(0, x0) / scale) / tx)
+        sy0 = int((roi_box[1] + max(0, y0) / scale) / ty)
+        sx1 = math.ceil((roi_box[0] + min(out_w, x1) / scale) / tx)
+        sy1 = math.ceil((roi_box[1] + min(out_h, y1) / scale) / ty)
+        cell = mask[sy0:max(sy1, sy0 + 1), sx0:max(sx1, sx0 + 1)]
+        coverage.append(float(cell.mean()) if cell.size else 0.0)
+    order = sorted(range(len(plan.tiles)), key=lambda i: -coverage[i])
+    plan.tiles = [plan.tiles[i] for i in order]
+    plan.coverage = [coverage[i] for i in order]
+    return plan
+
+
+def tile_arrays(plan: TilePlan, boxes: List[Box]) -> np.ndarray:
+    """NHWC float32 batch in [0, 1]; tiles past the region edge are zero-padded."""
+    arrs = [np.asarray(plan.region.crop(b), dtype="float32") / 255.0 for b in boxes]
+    batch = np.stack(arrs)
+    return batch[..., np.newaxis] if batch.ndim == 3 else batch
+
+
+# ================================================================
+# 🧠 Tiled Prediction
+# ================================================================
+def predict_tiled(
+    plan: TilePlan,
+    predict: Callable[[np.ndarray], Any],
+    tile: int,
+    batch_size: int = 0,
+    early_exit: float = 0.0,
+    aggregate: str = "mean",
+) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    (class probabilities, tiling report). The ROI overview (whole region
+    at tile size) rides in the first batch for context. batch_size 0
+    scores every tile in one call; otherwise batches stop early once a
+    tile's top probability reaches `early_exit` (0 disables).
+    """
+    overview = np.asarray(plan.region.resize((tile, tile)), dtype="float32") / 255.0
+    if overview.ndim == 2:
+        overview = overview[..., np.newaxis]
+
+    size = batch_size or len(plan.tiles)
+    probs: List[np.ndarray] = []
+    calls, decided_by = 0, None
+    for start in range(0, len(plan.tiles), size):
+        batch = tile_arrays(plan, plan.tiles[start:start + size])
+        if start == 0:
+            batch = np.concatenate([overview[np.newaxis], batch])
+        out = np.asarray(predict(batch), dtype="float64")
+        calls += 1
+        probs.extend(out)
+        if early_exit and start + size < len(plan.tiles):
+            top = int(np.argmax(out.max(axis=1)))
+            if out[top].max() >= early_exit:
+                decided_by = len(probs) - len(out) + top
+                break
+
+    all_probs = np.asarray(probs)
+    tile_probs = all_probs[1:]
+    if decided_by is not None:
+        preds = all_probs[decided_by]
+    elif aggregate == "max":
+        preds = all_probs.max(axis=0)
+        preds = preds / preds.sum()
+    else:
+        # lesion-weighted mean; the overview counts as one fully covered tile
+        weights = np.asarray([1.0] + [c + 0.05 for c in plan.coverage[:len(tile_probs)]])
+        preds = (all_probs * weights[:, np.newaxis]).sum(axis=0) / weights.sum()
+
+    best = int(np.argmax(tile_probs.max(axis=1))) if len(tile_probs) else None
+    report = {
+        **plan.describe(),
+        "evaluated": len(tile_probs),
+        "model_calls": calls,
+        "aggregate": "early_exit" if decided_by is not None else aggregate,
+        "early_exit": decided_by is not None,
+        "top_tile": None if best is None else {
+            "box": list(_source_box(plan, plan.tiles[best])),
+            "confidence": round(float(tile_probs[best].max()), 4),
+            "label_index": int(np.argmax(tile_probs[best])),
+        },
+    }
+    return preds, report
+
+
+def _source_box(plan: TilePlan, box: Box) -> Box:
+    x0, y0, x1, y1 = box
+    return (
+        max(0, int(plan.roi[0] + x0 / plan.scale)),
+        max(0, int(plan.roi[1] + y0 / plan.scale)),
+        min(plan.source_size[0], int(plan.roi[0] + x1 / plan.scale)),
+        min(plan.source_size[1], int(plan.roi[1] + y1 / plan.scale)),
+    )
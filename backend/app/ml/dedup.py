@@ -0,0 +1,220 @@
+# ================================================================
+# File: app/ml/dedup.py
+# Description: Near-duplicate upload index so re-uploads of the same
+#              image reuse the earlier prediction instead of re-running
+#              inference.
+#
+# Every image scored for a patient is fingerprinted (pHash + dHash,
+# app/ml/common/phash.py) and stored in `image_fingerprints` with its
+# probabilities, patient and diagnosis. Matches are only ever returned for
+# the same patient. Per (disease, model version) the hashes live in an
+# in-memory multi-index hash table,
+# so a lookup is a handful of dict probes. Other processes' inserts (other
+# uvicorn workers, bulk_score --to-db) are picked up by an incremental
+# catch-up read at most every DEDUP_SYNC_INTERVAL_S.
+# ================================================================
+
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.db.fingerprints import insert_fingerprints
+from app.ml.common.phash import MAX_RADIUS, MultiIndexHash, fingerprint, hamming, to_signed, to_unsigned
+
+LATENCY_SAMPLES = 1024
+
+
+@dataclass
+class Match:
+    fingerprint_id: int
+    diagnosis_id: Optional[int]
+    distance: int
+    probs: List[float]
+    created_at: Any
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "fingerprint_id": self.fingerprint_id,
+            "diagnosis_id": self.diagnosis_id,
+            "distance": self.distance,
+            "scored_at": self.created_at.isoformat() if isinstance(self.created_at, datetime) else self.created_at,
+        }
+
+
+class DedupStats:
+    def __init__(self):
+        self.lookups = 0
+        self.hits = 0
+        self.registered = 0
+        self.lookup_ms: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+    def describe(self) -> Dict[str, Any]:
+        times = sorted(self.lookup_ms)
+
+        def pct(q: float) -> Optional[float]:
+            return round(times[min(len(times) - 1, int(q * len(times)))], 3) if times else None
+
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "misses": self.lookups - self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else None,
+            "registered": self.registered,
+            "lookup_ms_p50": pct(0.50),
+            "lookup_ms_p99": pct(0.99),
+        }
+
+
+class _ModelIndex:
+    """Hashes of one (disease, model version)."""
+
+    def __init__(self):
+        self.phashes = MultiIndexHash()
+        self.dhashes: Dict[int, int] = {}
+        self.patients: Dict[int, Optional[int]] = {}
+        self.last_id = 0      # highest row id read from the table
+        self.synced_at = 0.0
+
+    def add(self, fingerprint_id: int, ph: int, dh: int, patient_id: Optional[int]) -> None:
+        if fingerprint_id not in self.dhashes:
+            self.phashes.add(fingerprint_id, ph)
+            self.dhashes[fingerprint_id] = dh
+            self.patients[fingerprint_id] = patient_id
+
+
+def fingerprint_row(
+    disease_key: str, version: str, image: Any, probs: Sequence[float],
+    diagnosis_id: Optional[int] = None, patient_id: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Values for one image_fingerprints row."""
+    ph, dh = fingerprint(image)
+    return {
+        "disease_key": disease_key,
+        "model_version": version,
+        "phash": to_signed(ph),
+        "dhash": to_signed(dh),
+        "probs_json": json.dumps([float(p) for p in probs]),
+        "diagnosis_id": diagnosis_id,
+        "patient_id": patient_id,
+        "created_at": datetime.utcnow(),
+    }
+
+
+class NearDuplicateIndex:
+    def __init__(self, max_distance: int, dhash_max_distance: int, sync_interval_s: float):
+        if not 0 <= max_distance <= MAX_RADIUS:
+            raise ValueError(f"DEDUP_MAX_DISTANCE must be between 0 and {MAX_RADIUS}")
+        self.max_distance = max_distance
+        self.dhash_max_distance = dhash_max_distance
+        self.sync_interval_s = sync_interval_s
+        self._indexes: Dict[Tuple[str, str], _ModelIndex] = {}
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dedup-writer")
+        self.stats: Dict[str, DedupStats] = {}
+
+    @classmethod
+    def from_settings(cls) -> "NearDuplicateIndex":
+        return cls(settings.DEDUP_MAX_DISTANCE, settings.DEDUP_DHASH_MAX_DISTANCE, settings.DEDUP_SYNC_INTERVAL_S)
+
+    # ---- table sync ----
+    def _index(self, key: str, version: str) -> _ModelIndex:
+        with self._lock:
+            index = self._indexes.setdefault((key, version), _ModelIndex())
+        if time.monotonic() - index.synced_at >= self.sync_interval_s:
+            self._catch_up(key, version, index)
+        return index
+
+    def _catch_up(self, key: str, version: str, index: _ModelIndex) -> None:
+        """Load rows added since the last read (first call: the whole history)."""
+        from sqlalchemy import select
+        from app.db.session import engine
+        from app.models.image_fingerprint import ImageFingerprint as F
+
+        index.synced_at = time.monotonic()
+        with engine.connect() as conn:
+            rows = conn.execute(
+                select(F.id, F.phash, F.dhash, F.patient_id)
+                .where(F.disease_key == key, F.model_version == version, F.id > index.last_id)
+                .order_by(F.id)
+            ).all()
+        with self._lock:
+            for fid, ph, dh, patient_id in rows:
+                index.add(fid, to_unsigned(ph), to_unsigned(dh), patient_id)
+            if rows:
+                index.last_id = max(index.last_id, rows[-1][0])
+
+    @staticmethod
+    def _fetch(fingerprint_id: int) -> Optional[Tuple[str, Optional[int], Any]]:
+        from sqlalchemy import select
+        from app.db.session import engine
+        from app.models.image_fingerprint import ImageFingerprint as F
+
+        with engine.connect() as conn:
+            return conn.execute(
+                select(F.probs_json, F.diagnosis_id, F.created_at).where(F.id == fingerprint_id)
+            ).first()
+
+    # ---- lookups ----
+    def lookup(self, key: str, version: str, image: Any, patient_id: int) -> Optional[Match]:
+        """Closest earlier image of this patient within both distance limits, or None."""
+        start = time.perf_counter()
+        stats = self.stats.setdefault(key, DedupStats())
+        ph, dh = fingerprint(image)
+        index = self._index(key, version)
+        with self._lock:
+            candidates = [
+                (distance, fid) for distance, fid in index.phashes.search(ph, self.max_distance)
+                if index.patients[fid] == patient_id and hamming(dh, index.dhashes[fid]) <= self.dhash_max_distance
+            ]
+        match = None
+        for distance, fid in candidates:
+            row = self._fetch(fid)
+            if row is not None:
+                match = Match(fid, row[1], distance, json.loads(row[0]), row[2])
+                break
+        stats.lookups += 1
+        stats.hits += int(match is not None)
+        stats.lookup_ms.append((time.perf_counter() - start) * 1000)
+        return match
+
+    def register(
+        self, key: str, version: str, image: Any, probs: Sequence[float], patient_id: int, diagnosis_id: int
+    ) -> None:
+        """Record a fresh, saved prediction; the write happens on a background thread."""
+        row = fingerprint_row(key, version, image, probs, diagnosis_id, patient_id)
+        self.stats.setdefault(key, DedupStats()).registered += 1
+        self._writer.submit(self._write, key, version, row)
+
+    def _write(self, key: str, version: str, row: Dict[str, Any]) -> None:
+        from app.db.session import engine
+
+        try:
+            with engine.begin() as conn:
+                (fid,) = insert_fingerprints(conn, [row])
+        except Exception as e:
+            print(f"⚠️ Could not store image fingerprint for {key}: {e}")
+            return
+        with self._lock:
+            index = self._indexes.get((key, version))
+            if index is not None:
+                index.add(fid, to_unsigned(row["phash"]), to_unsigned(row["dhash"]), row["patient_id"])
+
+    def describe(self) -> Dict[str, Any]:
+        with self._lock:
+            sizes = {f"{key}@{version}": len(index.dhashes) for (key, version), index in self._indexes.items()}
+        return {
+            "enabled": settings.DEDUP_ENABLED,
+            "max_distance": self.max_distance,
+            "dhash_max_distance": self.dhash_max_distance,
+            "indexed": sizes,
+            "diseases": {key: s.describe() for key, s in self.stats.items()},
+        }
+
+
+dedup = NearDuplicateIndex.from_settings()
@@ -2,7 +2,7 @@ from pathlib import Path
 from typing import Any, Dict
 import numpy as np
 from app.ml.common.interfaces import BaseDiseasePipeline
-from app.ml.common.preproc import load_image_rgb
+from app.ml.common.preproc import payload_image
 from app.ml.common.postproc import softmax, load_labels
 
 class MalariaPipeline(BaseDiseasePipeline):
@@ -26,7 +26,7 @@ class MalariaPipeline(BaseDiseasePipeline):
 
     def infer(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         # Demo-only: generate fake logits so the API works end-to-end.
-        _ = load_image_rgb(payload["file"], self.input_size)
+        _ = payload_image(payload, self.input_size)
         logits = np.random.randn(len(self.labels)).astype("float32")
         probs = softmax(logits)
         idx = int(np.argmax(probs))
@@ -0,0 +1,296 @@
+# ================================================================
+# File: app/ml/explain.py
+# Description: Batched, cached Grad-CAM explanations computed in the
+#              background so they never delay the primary prediction.
+# ================================================================
+
+import base64
+import io
+import itertools
+import queue
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+MAX_BATCH = 8
+BATCH_WINDOW_S = 0.05        # how long to wait for more jobs to fill a batch
+YIELD_SLEEP_S = 0.005        # back-off while primary predictions are running
+MAX_YIELD_S = 0.5            # never starve explanations for longer than this
+CACHE_SIZE = 512
+MAX_QUEUED = 128             # waiting jobs (each holds its decoded input) before submit() refuses
+OVERLAY_ALPHA = 0.45
+OVERLAY_COLORS = 64          # palette size for the compact PNG
+
+
+# ================================================================
+# 🎨 Heatmap Rendering
+# ================================================================
+def _jet(cam: np.ndarray) -> np.ndarray:
+    """Map values in [0, 1] to RGB in [0, 1] with a jet-like colormap."""
+    four = 4.0 * cam[..., None]
+    rgb = 1.5 - np.abs(four - np.array([3.0, 2.0, 1.0], dtype="float32"))
+    return np.clip(rgb, 0.0, 1.0)
+
+
+def render_overlay(base_rgb: np.ndarray, cam: np.ndarray) -> bytes:
+    """Blend a [0, 1] heatmap over an HWC RGB image and encode a palette PNG."""
+    h, w = base_rgb.shape[:2]
+    cam_img = Image.fromarray((cam * 255).astype("uint8")).resize((w, h), Image.BILINEAR)
+    cam = np.asarray(cam_img, dtype="float32") / 255.0
+    alpha = OVERLAY_ALPHA * cam[..., None]
+    blended = (1.0 - alpha) * base_rgb + alpha * _jet(cam)
+    img = Image.fromarray((blended * 255).astype("uint8"), "RGB").quantize(colors=OVERLAY_COLORS)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", optimize=True)
+    return buf.getvalue()
+
+
+# ================================================================
+# 🔥 Grad-CAM
+# ================================================================
+# id(model) -> (weak ref to that model, grad model); ids are reused once a
+# swapped-out model is collected, so an entry counts only while its ref is alive
+_grad_models: Dict[int, Tuple[Any, Any]] = {}
+MAX_GRAD_MODELS = 4  # bounded so hot-swapped models are not pinned forever
+
+
+def _last_conv_layer(model: Any) -> Any:
+    for layer in reversed(model.layers):
+        shape = getattr(layer, "output_shape", None)
+        if shape is None:
+            shape = tuple(layer.output.shape)
+        if isinstance(shape, tuple) and len(shape) == 4:
+            return layer
+    raise ValueError("Model has no 4D (convolutional) layer to explain")
+
+
+def _grad_model(model: Any) -> Any:
+    """Model returning (last conv activations, predictions); shares weights with `model`."""
+    key = id(model)
+    entry = _grad_models.get(key)
+    if entry is None or entry[0]() is not model:
+        import tensorflow as tf
+
+        conv = _last_conv_layer(model)
+        for stale in [k for k, (ref, _) in _grad_models.items() if ref() is None]:
+            del _grad_models[stale]
+        if len(_grad_models) >= MAX_GRAD_MODELS:
+            _grad_models.clear()
+        entry = (weakref.ref(model), tf.keras.Model(model.inputs, [conv.output, model.output]))
+        _grad_models[key] = entry
+    return entry[1]
+
+
+def grad_cam(model: Any, batch: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Grad-CAM for a batch in one forward/backward pass.
+
+    Returns (cams, class_idx): cams is (N, h, w) in [0, 1] at the conv
+    layer's resolution, class_idx the explained (top-1) class per sample.
+    """
+    import tensorflow as tf
+
+    grad_model = _grad_model(model)
+    x = tf.convert_to_tensor(batch, dtype=tf.float32)
+    with tf.GradientTape() as tape:
+        conv_out, preds = grad_model(x, training=False)
+        class_idx = tf.argmax(preds, axis=-1)
+        scores = tf.gather(preds, class_idx, axis=1, batch_dims=1)
+    grads = tape.gradient(scores, conv_out)
+    weights = tf.reduce_mean(grads, axis=(1, 2), keepdims=True)
+    cams = tf.nn.relu(tf.reduce_sum(weights * conv_out, axis=-1)).numpy()
+    peak = cams.reshape(len(cams), -1).max(axis=1).reshape(-1, 1, 1)
+    cams = cams / np.maximum(peak, 1e-8)
+    return cams, class_idx.numpy()
+
+
+# ================================================================
+# 🧵 Background Service
+# ================================================================
+class ExplanationQueueFull(RuntimeError):
+    """Too many explanations are waiting; the caller should retry later."""
+
+
+@dataclass
+class ExplanationJob:
+    key: str
+    model_name: str
+    version: str
+    model: Any
+    input_batch: Optional[np.ndarray]  # (1, H, W, C) model input
+    base_rgb: Optional[np.ndarray]     # (H, W, 3) image the overlay is drawn on
+    labels: Optional[List[str]] = None
+    status: str = "queued"           # queued | running | done | failed
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    submitted_at: float = field(default_factory=time.time)
+
+    def describe(self, include_png: bool = True) -> Dict[str, Any]:
+        out = {
+            "explanation_id": self.key,
+            "explainable": True,
+            "status": self.status,
+            "model": self.model_name,
+            "model_version": self.version,
+        }
+        if self.error:
+            out["error"] = self.error
+        if self.result:
+            out.update({k: v for k, v in self.result.items() if include_png or k != "overlay_png"})
+        return out
+
+
+class ExplanationService:
+    """
+    Queues Grad-CAM jobs and processes them on one low-priority worker thread.
+
+    Jobs for the same model/version are grouped into batches that run through
+    the serving model's own weights. Finished jobs are kept in an LRU cache
+    keyed by image hash + model + version, so repeat requests are free; jobs
+    still queued or running are never evicted. At most `max_queued` jobs
+    wait at once; beyond that submit() raises ExplanationQueueFull.
+    """
+
+    def __init__(
+        self, cache_size: int = CACHE_SIZE, busy: Optional[Callable[[], bool]] = None, max_queued: int = MAX_QUEUED
+    ):
+        self._jobs: "OrderedDict[str, ExplanationJob]" = OrderedDict()
+        self._cache_size = cache_size
+        self._max_queued = max_queued
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self.busy = busy or (lambda: False)
+        self.stats = {"submitted": 0, "cache_hits": 0, "batches": 0, "explained": 0, "failed": 0, "rejected": 0}
+
+    @staticmethod
+    def cache_key(digest: str, model_name: str, version: str) -> str:
+        return f"{model_name}:{version}:{digest}"
+
+    def get(self, key: str) -> Optional[ExplanationJob]:
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None:
+                self._jobs.move_to_end(key)
+            return job
+
+    def submit(
+        self,
+        *,
+        digest: str,
+        model_name: str,
+        version: str,
+        model: Any,
+        input_batch: np.ndarray,
+        base_rgb: np.ndarray,
+        labels: Optional[List[str]] = None,
+    ) -> ExplanationJob:
+        """Queue an explanation (or return the cached/in-flight one) without blocking; raises ExplanationQueueFull."""
+        key = self.cache_key(digest, model_name, version)
+        with self._lock:
+            self.stats["submitted"] += 1
+            job = self._jobs.get(key)
+            if job is not None and job.status != "failed":
+                self.stats["cache_hits"] += 1
+                self._jobs.move_to_end(key)
+                return job
+            if self._queue.qsize() >= self._max_queued:
+                self.stats["rejected"] += 1
+                raise ExplanationQueueFull(f"{self._max_queued} explanations are already queued")
+            job = ExplanationJob(key, model_name, version, model, input_batch, base_rgb, labels)
+            self._jobs[key] = job
+            self._evict()
+            self._queue.put((job.submitted_at, next(self._seq), job))
+            self._ensure_worker()
+        return job
+
+    def _evict(self) -> None:
+        """Drop least recently used finished jobs down to the cache size (caller holds the lock)."""
+        excess = len(self._jobs) - self._cache_size
+        if excess <= 0:
+            return
+        finished = [k for k, job in self._jobs.items() if job.status in ("done", "failed")]
+        for key in finished[:excess]:
+            del self._jobs[key]
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="explainer", daemon=True)
+            self._worker.start()
+
+    # ---- worker ----
+    def _next_batch(self) -> List[ExplanationJob]:
+        _, _, first = self._queue.get()
+        batch = [first]
+        deadline = time.monotonic() + BATCH_WINDOW_S
+        deferred = []
+        while len(batch) < MAX_BATCH:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            job = item[2]
+            if job.model is first.model and job.input_batch.shape == first.input_batch.shape:
+                batch.append(job)
+            else:
+                deferred.append(item)
+        for item in deferred:
+            self._queue.put(item)
+        return batch
+
+    def _yield_to_primary(self) -> None:
+        waited = 0.0
+        while self.busy() and waited < MAX_YIELD_S:
+            time.sleep(YIELD_SLEEP_S)
+            waited += YIELD_SLEEP_S
+
+    @staticmethod
+    def _release(job: ExplanationJob) -> None:
+        # Cached results must not pin inputs or swapped-out models in memory.
+        job.model = job.input_batch = job.base_rgb = None
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            self._yield_to_primary()
+            for job in batch:
+                job.status = "running"
+            try:
+                start = time.perf_counter()
+                inputs = np.concatenate([job.input_batch for job in batch], axis=0)
+                cams, class_idx = grad_cam(batch[0].model, inputs)
+                elapsed = (time.perf_counter() - start) * 1000
+                for job, cam, idx in zip(batch, cams, class_idx):
+                    png = render_overlay(job.base_rgb, cam)
+                    job.result = {
+                        "method": "grad-cam",
+                        "class_index": int(idx),
+                        "class_label": job.labels[int(idx)] if job.labels else None,
+                        "overlay_png": base64.b64encode(png).decode("ascii"),
+                        "overlay_bytes": len(png),
+                        "batch_size": len(batch),
+                        "compute_ms": round(elapsed, 1),
+                    }
+                    job.status = "done"
+                    self._release(job)
+                self.stats["batches"] += 1
+                self.stats["explained"] += len(batch)
+            except Exception as e:
+                for job in batch:
+                    job.status = "failed"
+                    job.error = str(e)
+                    self._release(job)
+                self.stats["failed"] += len(batch)
+
+
+explainer = ExplanationService()
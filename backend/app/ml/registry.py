@@ -1,17 +1,55 @@
-from typing import Dict, Type
+import importlib
+import threading
+from collections.abc import Mapping
+from typing import Dict, Iterator, Type
 from app.ml.common.interfaces import BaseDiseasePipeline
 
-from app.ml.diseases.skin_cancer.pipeline import SkinCancerPipeline
-from app.ml.diseases.brain_tumor.pipeline import BrainTumorPipeline
-from app.ml.diseases.malnutrition.pipeline import MalnutritionPipeline
-from app.ml.diseases.tb.pipeline import TbPipeline as TBPipeline if False else None  # type: ignore
-from app.ml.diseases.tb.pipeline import TbPipeline as TBPipeline
-from app.ml.diseases.malaria.pipeline import MalariaPipeline
-
-REGISTRY: Dict[str, Type[BaseDiseasePipeline]] = {
-    "skin_cancer": SkinCancerPipeline,
-    "brain_tumor": BrainTumorPipeline,
-    "malnutrition": MalnutritionPipeline,
-    "tb": TBPipeline,
-    "malaria": MalariaPipeline,
-}
+
+class _LazyRegistry(Mapping):
+    """Maps disease keys to pipeline classes, importing each module on first use."""
+
+    def __init__(self, paths: Dict[str, str]):
+        self._paths = paths
+        self._classes: Dict[str, Type[BaseDiseasePipeline]] = {}
+
+    def __getitem__(self, key: str) -> Type[BaseDiseasePipeline]:
+        if key not in self._classes:
+            module_path, cls_name = self._paths[key].split(":")
+            self._classes[key] = getattr(importlib.import_module(module_path), cls_name)
+        return self._classes[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._paths)
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+
+REGISTRY: Mapping[str, Type[BaseDiseasePipeline]] = _LazyRegistry({
+    "skin_cancer": "app.ml.diseases.skin_cancer.pipeline:SkinCancerPipeline",
+    "brain_tumor": "app.ml.diseases.brain_tumor.pipeline:BrainTumorPipeline",
+    "malnutrition": "app.ml.diseases.malnutrition.pipeline:MalnutritionPipeline",
+    "tb": "app.ml.diseases.tb.pipeline:TbPipeline",
+    "malaria": "app.ml.diseases.malaria.pipeline:MalariaPipeline",
+})
+
+_pipelines: Dict[str, BaseDiseasePipeline] = {}
+_pipelines_lock = threading.Lock()
+
+
+def get_pipeline(key: str) -> BaseDiseasePipeline:
+    """Return the process-wide loaded pipeline for `key`, loading it on first use."""
+    pipeline = _pipelines.get(key)
+    if pipeline is None:
+        with _pipelines_lock:
+            pipeline = _pipelines.get(key)
+            if pipeline is None:
+                pipeline = REGISTRY[key]()
+                pipeline.load()
+                _pipelines[key] = pipeline
+    return pipeline
+
+
+def loaded_pipelines() -> Dict[str, BaseDiseasePipeline]:
+    """Pipelines loaded so far (does not load anything)."""
+    return dict(_pipelines)
@@ -0,0 +1,352 @@
+# ================================================================
+# File: app/ml/serving.py
+# Description: Versioned model slots with background loading,
+#              warm-up, shadow comparison and atomic promotion.
+# ================================================================
+
+import random
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+DEFAULT_VERSION = "v1"
+WARMUP_RUNS = 3
+LATENCY_WINDOW = 1000
+
+
+# ================================================================
+# 📦 Artifact Loading
+# ================================================================
+def load_artifact(path: str) -> Any:
+    """Load a Keras (.h5) model or a joblib (.pkl) artifact from disk."""
+    if path.endswith(".h5"):
+        from tensorflow.keras.models import load_model
+        return load_model(path, compile=False)  # ✅ skip optimizer state
+    if path.endswith(".pkl"):
+        import joblib
+        return joblib.load(path)
+    raise ValueError(f"Unsupported model file format: {path}")
+
+
+def synthetic_input(model: Any) -> Optional[np.ndarray]:
+    """Build a single random sample matching the model's input shape."""
+    shape = getattr(model, "input_shape", None)
+    if shape is not None:
+        if isinstance(shape, list):
+            shape = shape[0]
+        dims = [1] + [d or 1 for d in shape[1:]]
+        return np.random.rand(*dims).astype("float32")
+    n_features = getattr(model, "n_features_in_", None)
+    if n_features is not None:
+        return np.random.rand(1, n_features)
+    return None
+
+
+def run_model(model: Any, x: Any) -> Any:
+    """Run a forward pass, using transform() for preprocessors like scalers."""
+    if hasattr(model, "predict"):
+        if hasattr(model, "input_shape"):
+            return model.predict(x, verbose=0)
+        return model.predict(x)
+    return model.transform(x)
+
+
+def build_runner(model: Any) -> Optional[Callable[[Any], Any]]:
+    """Compiled inference function for Keras/sklearn models (None: use run_model)."""
+    if not settings.COMPILED_INFERENCE:
+        return None
+    if not hasattr(model, "input_shape"):
+        from app.ml.tabular import compile_checked  # parity-checked NumPy evaluator
+        return compile_checked(model)
+    from app.ml.compiled import CompiledKerasModel, parse_buckets
+
+    return CompiledKerasModel(
+        model,
+        buckets=parse_buckets(settings.INFERENCE_BATCH_BUCKETS),
+        jit_compile=settings.XLA_JIT_COMPILE,
+    )
+
+
+def _agrees(a: Any, b: Any) -> bool:
+    a, b = np.asarray(a), np.asarray(b)
+    if a.dtype.kind == "f" and a.ndim >= 2:
+        return bool(np.array_equal(np.argmax(a, axis=-1), np.argmax(b, axis=-1)))
+    if a.dtype.kind == "f":
+        return bool(np.allclose(a, b, rtol=1e-3, atol=1e-5))
+    return bool(np.array_equal(a, b))
+
+
+def _percentile(values, q: float) -> Optional[float]:
+    if not values:
+        return None
+    return round(float(np.percentile(np.fromiter(values, dtype="float64"), q)), 3)
+
+
+# ================================================================
+# 🧩 Slots & Shadow Statistics
+# ================================================================
+@dataclass
+class ModelSlot:
+    name: str
+    version: str
+    path: str
+    model: Any = None
+    runner: Optional[Callable[[Any], Any]] = None  # compiled forward pass, if any
+    status: str = "loading"  # loading | ready | failed
+    error: Optional[str] = None
+    loaded_at: Optional[float] = None
+    load_ms: Optional[float] = None
+    warmup_ms: Optional[float] = None
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "path": self.path,
+            "status": self.status,
+            "error": self.error,
+            "loaded_at": self.loaded_at,
+            "load_ms": self.load_ms,
+            "warmup_ms": self.warmup_ms,
+            "compiled": self.runner.describe() if hasattr(self.runner, "describe") else None,
+        }
+
+    def run(self, x: Any) -> Any:
+        if self.runner is not None:
+            return self.runner(x)
+        return run_model(self.model, x)
+
+
+@dataclass
+class ShadowStats:
+    sample_rate: float = 0.0
+    compared: int = 0
+    agreed: int = 0
+    errors: int = 0
+    primary_ms: Deque[float] = field(default_factory=lambda: deque(maxlen=LATENCY_WINDOW))
+    candidate_ms: Deque[float] = field(default_factory=lambda: deque(maxlen=LATENCY_WINDOW))
+    # shadow pool threads record concurrently; promote decisions read the counts
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record(self, primary_ms: float, candidate_ms: float, agreed: bool) -> None:
+        with self.lock:
+            self.primary_ms.append(primary_ms)
+            self.candidate_ms.append(candidate_ms)
+            self.compared += 1
+            self.agreed += int(agreed)
+
+    def record_error(self) -> None:
+        with self.lock:
+            self.errors += 1
+
+    def describe(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "sample_rate": self.sample_rate,
+                "compared": self.compared,
+                "agreement": round(self.agreed / self.compared, 4) if self.compared else None,
+                "errors": self.errors,
+                "primary_latency_ms": {"p50": _percentile(self.primary_ms, 50), "p99": _percentile(self.primary_ms, 99)},
+                "candidate_latency_ms": {
+                    "p50": _percentile(self.candidate_ms, 50), "p99": _percentile(self.candidate_ms, 99)
+                },
+            }
+
+
+# ================================================================
+# 🧠 Model Manager
+# ================================================================
+class ModelManager:
+    """
+    Holds the serving model for each key plus an optional candidate.
+
+    Reads go through a plain dict lookup, so promotion is a single reference
+    swap: requests already holding the old model finish on it, new requests
+    get the candidate. Supports the read-only dict API the routers already
+    use on ``app.state.models`` (``get``, ``in``, ``keys``).
+    """
+
+    def __init__(self):
+        self._active: Dict[str, ModelSlot] = {}
+        self._candidates: Dict[str, ModelSlot] = {}
+        self._shadow: Dict[str, ShadowStats] = {}
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-loader")
+        self._shadow_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="model-shadow")
+
+    # ---- dict-style read API ----
+    def get(self, name: str, default: Any = None) -> Any:
+        slot = self._active.get(name)
+        return slot.model if slot is not None else default
+
+    def __getitem__(self, name: str) -> Any:
+        return self._active[name].model
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._active
+
+    def __iter__(self):
+        return iter(list(self._active))
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+    def keys(self):
+        return list(self._active)
+
+    def version(self, name: str) -> Optional[str]:
+        slot = self._active.get(name)
+        return slot.version if slot is not None else None
+
+    # ---- loading ----
+    def _build_slot(self, name: str, path: str, version: str) -> ModelSlot:
+        slot = ModelSlot(name=name, version=version, path=path)
+        try:
+            start = time.perf_counter()
+            slot.model = load_artifact(path)
+            slot.runner = build_runner(slot.model)  # traces + warms every batch bucket
+            slot.load_ms = round((time.perf_counter() - start) * 1000, 1)
+            slot.warmup_ms = self._warm_up(slot)
+            slot.loaded_at = time.time()
+            slot.status = "ready"
+        except Exception as e:
+            slot.status = "failed"
+            slot.error = str(e)
+            traceback.print_exc()
+        return slot
+
+    @staticmethod
+    def _warm_up(slot: ModelSlot) -> Optional[float]:
+        x = synthetic_input(slot.model)
+        if x is None:
+            return None
+        start = time.perf_counter()
+        for _ in range(WARMUP_RUNS):
+            slot.run(x)
+        return round((time.perf_counter() - start) * 1000, 1)
+
+    def load(self, name: str, path: str, version: str = DEFAULT_VERSION) -> ModelSlot:
+        """Load synchronously and serve immediately (used at startup)."""
+        slot = self._build_slot(name, path, version)
+        if slot.status == "ready":
+            self._active[name] = slot
+        return slot
+
+    def stage(self, name: str, path: str, version: str, shadow_rate: float = 0.0) -> ModelSlot:
+        """Load a candidate next to the serving model in the background."""
+        with self._lock:
+            current = self._candidates.get(name)
+            if current is not None and current.status == "loading":
+                raise RuntimeError(f"A candidate for {name} is already loading")
+            placeholder = ModelSlot(name=name, version=version, path=path)
+            self._candidates[name] = placeholder
+            self._shadow[name] = ShadowStats(sample_rate=shadow_rate)
+
+        def _load():
+            slot = self._build_slot(name, path, version)
+            with self._lock:
+                # Ignore the result if the candidate was discarded meanwhile.
+                if self._candidates.get(name) is placeholder:
+                    self._candidates[name] = slot
+
+        self._loader.submit(_load)
+        return placeholder
+
+    def promote(self, name: str) -> ModelSlot:
+        """Atomically make the ready candidate the serving model."""
+        with self._lock:
+            slot = self._candidates.get(name)
+            if slot is None or slot.status != "ready":
+                raise RuntimeError(f"No ready candidate for {name}")
+            self._active[name] = slot
+            del self._candidates[name]
+            self._shadow.pop(name, None)
+        return slot
+
+    def discard(self, name: str) -> None:
+        with self._lock:
+            self._candidates.pop(name, None)
+            self._shadow.pop(name, None)
+
+    def set_shadow_rate(self, name: str, rate: float) -> None:
+        with self._lock:
+            if name not in self._candidates:
+                raise RuntimeError(f"No candidate staged for {name}")
+            self._shadow.setdefault(name, ShadowStats()).sample_rate = rate
+
+    # ---- inference ----
+    def predict(self, name: str, x: Any) -> Any:
+        """Run the serving model, mirroring a sample of calls to the candidate."""
+        slot = self._active[name]
+        with self._lock:
+            self._inflight += 1
+        try:
+            start = time.perf_counter()
+            out = slot.run(x)
+            elapsed = (time.perf_counter() - start) * 1000
+        finally:
+            with self._lock:
+                self._inflight -= 1
+
+        stats = self._shadow.get(name)
+        candidate = self._candidates.get(name)
+        if (
+            stats is not None
+            and candidate is not None
+            and candidate.status == "ready"
+            and random.random() < stats.sample_rate
+        ):
+            self._shadow_pool.submit(self._compare, stats, candidate, x, out, elapsed)
+        return out
+
+    def probe(self, name: str) -> float:
+        """
+        Canary: one synthetic sample through the serving model, outside the
+        in-flight count and shadow sampling. Returns the latency in ms.
+        """
+        slot = self._active[name]
+        x = synthetic_input(slot.model)
+        if x is None:
+            raise RuntimeError(f"No synthetic input for {name}")
+        start = time.perf_counter()
+        slot.run(x)
+        return (time.perf_counter() - start) * 1000
+
+    def busy(self) -> bool:
+        """True while any primary prediction is running (background work should yield)."""
+        return self._inflight > 0
+
+    @staticmethod
+    def _compare(stats: ShadowStats, candidate: ModelSlot, x: Any, primary_out: Any, primary_ms: float) -> None:
+        try:
+            start = time.perf_counter()
+            out = candidate.run(x)
+            candidate_ms = (time.perf_counter() - start) * 1000
+            agreed = _agrees(primary_out, out)
+        except Exception:
+            stats.record_error()
+            return
+        stats.record(primary_ms, candidate_ms, agreed)
+
+    # ---- reporting ----
+    def status(self) -> Dict[str, Any]:
+        names = sorted(set(self._active) | set(self._candidates))
+        report = {}
+        for name in names:
+            active = self._active.get(name)
+            candidate = self._candidates.get(name)
+            shadow = self._shadow.get(name)
+            report[name] = {
+                "serving": active.describe() if active else None,
+                "candidate": candidate.describe() if candidate else None,
+                "shadow": shadow.describe() if shadow and candidate else None,
+            }
+        return report
@@ -0,0 +1,283 @@
+# ================================================================
+# File: app/ml/tabular.py
+# Description: Pure-NumPy evaluators for the sklearn tabular models
+#
+# The malnutrition path is a StandardScaler + RandomForestClassifier on a
+# five-feature row. Through pandas + sklearn, input validation and
+# per-call dispatch dominate the cost. Here the fitted parameters are
+# lifted into flat arrays once: the scaler becomes one affine transform
+# and the forest one node table walked for all trees and rows at once.
+# Large batches go back to sklearn, whose compiled per-row traversal wins
+# once its fixed per-call cost is amortized.
+# Every compiled estimator is checked against sklearn before it is used.
+# ================================================================
+
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+PARITY_ROWS = 512
+BLOCK_ROWS = 256            # rows walked together; keeps the (trees, rows) slot arrays in cache
+SKLEARN_BATCH_ROWS = 1024   # from here on the fitted sklearn forest is faster per row
+
+
+class UnsupportedEstimator(ValueError):
+    """The estimator type has no NumPy evaluator; callers fall back to sklearn."""
+
+
+def _kind(est: Any) -> str:
+    return type(est).__name__
+
+
+def is_sklearn(obj: Any) -> bool:
+    return type(obj).__module__.startswith("sklearn.")
+
+
+# ================================================================
+# 📏 Scalers -> affine transform
+# ================================================================
+class AffineTransform:
+    """x * scale + offset, column-wise; equivalent to the fitted scaler's transform()."""
+
+    def __init__(self, scale: np.ndarray, offset: np.ndarray, feature_names: Optional[Sequence[str]] = None):
+        self.scale = np.asarray(scale, dtype="float64")
+        self.offset = np.asarray(offset, dtype="float64")
+        self.feature_names = list(feature_names) if feature_names is not None else None
+
+    def __call__(self, X: Any) -> np.ndarray:
+        return np.asarray(X, dtype="float64") * self.scale + self.offset
+
+    def describe(self) -> Dict[str, Any]:
+        return {"evaluator": "numpy-affine", "features": len(self.scale)}
+
+
+def compile_scaler(scaler: Any) -> AffineTransform:
+    kind = _kind(scaler)
+    n = scaler.n_features_in_
+    names = getattr(scaler, "feature_names_in_", None)
+    if kind == "StandardScaler":
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(n)
+        std = scaler.scale_ if scaler.with_std else np.ones(n)
+        return AffineTransform(1.0 / std, -mean / std, names)
+    if kind == "MinMaxScaler":
+        return AffineTransform(scaler.scale_, scaler.min_, names)
+    if kind == "MaxAbsScaler":
+        return AffineTransform(1.0 / scaler.scale_, np.zeros(n), names)
+    if kind == "RobustScaler":
+        center = scaler.center_ if scaler.with_centering else np.zeros(n)
+        scale = scaler.scale_ if scaler.with_scaling else np.ones(n)
+        return AffineTransform(1.0 / scale, -center / scale, names)
+    raise UnsupportedEstimator(f"No NumPy evaluator for {kind}")
+
+
+# ================================================================
+# 🌲 Tree ensembles -> flat node table
+# ================================================================
+class TreeEnsembleClassifier:
+    """
+    All trees of a fitted forest in one node table.
+
+    Leaves point at themselves with a +inf threshold, so walking every tree
+    for every row is a fixed number (max depth) of gather + compare steps
+    with no branching. Batches of SKLEARN_BATCH_ROWS or more are handed to
+    `estimator` (the fitted sklearn model) when one is given.
+    """
+
+    def __init__(self, trees: List[Any], classes: np.ndarray, estimator: Any = None):
+        offsets, feature, threshold, left, right, value, nan_right = [], [], [], [], [], [], []
+        base = 0
+        for tree in trees:
+            n = tree.node_count
+            is_leaf = tree.children_left == -1
+            idx = np.arange(n)
+            offsets.append(base)
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+            # per-node NaN direction (sklearn >= 1.3); older trees reject NaN inputs
+            missing_left = getattr(tree, "missing_go_to_left", None)
+            nan_right.append(np.ones(n, bool) if missing_left is None else ~missing_left.astype(bool))
+            left.append(np.where(is_leaf, idx, tree.children_left) + base)
+            right.append(np.where(is_leaf, idx, tree.children_right) + base)
+            v = tree.value[:, 0, :].astype("float64")
+            total = v.sum(axis=1, keepdims=True)
+            value.append(v / np.where(total == 0, 1.0, total))
+            base += n
+
+        # Nodes are addressed by slot = 2 * node so that slot + go_right picks
+        # the child directly: children[slot] is the left child's slot,
+        # children[slot + 1] the right one's.
+        feature = np.concatenate(feature).astype("intp")
+        self.roots = 2 * np.asarray(offsets, dtype="intp")
+        self.feature = np.repeat(feature, 2)
+        self.threshold = np.repeat(np.concatenate(threshold), 2)
+        self.nan_right = np.repeat(np.concatenate(nan_right), 2)
+        self.children = 2 * np.stack([np.concatenate(left), np.concatenate(right)], axis=1).ravel().astype("intp")
+        self.value = np.concatenate(value)
+        self.n_nodes = len(feature)
+        self.depth = max(int(tree.max_depth) for tree in trees)
+        self.classes_ = classes
+        self.n_trees = len(trees)
+        self.estimator = estimator
+
+    def predict_proba(self, X: Any) -> np.ndarray:
+        if self.estimator is not None and len(X) >= SKLEARN_BATCH_ROWS:
+            return self.estimator.predict_proba(np.asarray(X, dtype="float64"))
+        return self.walk_proba(X)
+
+    def walk_proba(self, X: Any) -> np.ndarray:
+        """predict_proba evaluated in NumPy whatever the batch size."""
+        # sklearn trees evaluate on float32 inputs against float64 thresholds.
+        X = np.asarray(X, dtype="float32")
+        has_nan = bool(np.isnan(X).any())
+        if len(X) <= BLOCK_ROWS:
+            return self._walk(X, has_nan)
+        return np.concatenate([self._walk(X[i:i + BLOCK_ROWS], has_nan) for i in range(0, len(X), BLOCK_ROWS)])
+
+    def _walk(self, X: np.ndarray, has_nan: bool) -> np.ndarray:
+        # Feature-major flat copy so each step is a single 1-D take().
+        n = len(X)
+        flat = np.ascontiguousarray(X.T).ravel()
+        rows = np.arange(n)
+        offsets = self.feature * n
+        slot = np.repeat(self.roots[:, np.newaxis], n, axis=1)  # (trees, rows)
+        for _ in range(self.depth):
+            x = flat.take(offsets.take(slot) + rows)
+            go_right = x > self.threshold.take(slot)
+            if has_nan:
+                # NaN follows each node's learned missing-value branch, as in sklearn
+                missing = np.isnan(x)
+                go_right[missing] = self.nan_right.take(slot[missing])
+            slot = self.children.take(slot + go_right)
+        return self.value[slot >> 1].mean(axis=0)
+
+    def __call__(self, X: Any) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "evaluator": "numpy-trees", "trees": self.n_trees, "nodes": self.n_nodes, "depth": self.depth,
+            "sklearn_batch_rows": SKLEARN_BATCH_ROWS if self.estimator is not None else None,
+        }
+
+
+class LinearClassifier:
+    """Linear decision function (LogisticRegression, LinearSVC, RidgeClassifier)."""
+
+    def __init__(self, coef: np.ndarray, intercept: np.ndarray, classes: np.ndarray):
+        self.coef_t = np.asarray(coef, dtype="float64").T
+        self.intercept = np.asarray(intercept, dtype="float64")
+        self.classes_ = classes
+
+    def __call__(self, X: Any) -> np.ndarray:
+        scores = np.asarray(X, dtype="float64") @ self.coef_t + self.intercept
+        if scores.shape[1] == 1:
+            return self.classes_[(scores[:, 0] > 0).astype(int)]
+        return self.classes_[np.argmax(scores, axis=1)]
+
+    def describe(self) -> Dict[str, Any]:
+        return {"evaluator": "numpy-linear", "classes": len(self.classes_)}
+
+
+def compile_classifier(model: Any) -> Any:
+    kind = _kind(model)
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise UnsupportedEstimator(f"Multi-output {kind} is not supported")
+    if kind in ("RandomForestClassifier", "ExtraTreesClassifier"):
+        return TreeEnsembleClassifier([est.tree_ for est in model.estimators_], model.classes_, model)
+    if kind in ("DecisionTreeClassifier", "ExtraTreeClassifier"):
+        return TreeEnsembleClassifier([model.tree_], model.classes_, model)
+    if kind in ("LogisticRegression", "LinearSVC", "RidgeClassifier", "SGDClassifier"):
+        return LinearClassifier(model.coef_, model.intercept_, model.classes_)
+    raise UnsupportedEstimator(f"No NumPy evaluator for {kind}")
+
+
+def compile_estimator(est: Any) -> Any:
+    """NumPy evaluator for a fitted scaler or classifier (raises UnsupportedEstimator)."""
+    if hasattr(est, "predict"):
+        return compile_classifier(est)
+    return compile_scaler(est)
+
+
+# ================================================================
+# 🔗 Fused scaler + classifier
+# ================================================================
+class FusedTabularModel:
+    """Scaler affine + classifier evaluation as one callable over raw feature rows."""
+
+    def __init__(self, transform: AffineTransform, classifier: Any):
+        self.transform = transform
+        self.classifier = classifier
+        self.feature_names = transform.feature_names
+
+    @classmethod
+    def compile(cls, scaler: Any, model: Any) -> "FusedTabularModel":
+        return cls(compile_scaler(scaler), compile_classifier(model))
+
+    def __call__(self, X: Any) -> np.ndarray:
+        return self.classifier(self.transform(X))
+
+    def rows(self, records: List[Dict[str, float]]) -> np.ndarray:
+        """Raw feature matrix from dicts, in the scaler's fitted column order."""
+        return np.array([[r[name] for name in self.feature_names] for r in records], dtype="float64")
+
+
+# ================================================================
+# ✅ Parity against sklearn
+# ================================================================
+def synthetic_rows(est: Any, n: int = PARITY_ROWS, seed: int = 0) -> np.ndarray:
+    """Random rows around the fitted data (scaler statistics when available)."""
+    rng = np.random.default_rng(seed)
+    n_features = est.n_features_in_
+    center = getattr(est, "mean_", None)
+    spread = getattr(est, "scale_", None) if center is not None else None
+    X = rng.normal(size=(n, n_features)) * 2.0
+    if center is not None and spread is not None:
+        X = X * spread + center
+    return X
+
+
+def check_parity(est: Any, compiled: Any, X: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """Compare a compiled evaluator with the sklearn estimator on the same rows."""
+    X = synthetic_rows(est) if X is None else X
+    if hasattr(est, "predict"):
+        if hasattr(compiled, "walk_proba"):
+            # the NumPy walk itself, not the sklearn hand-off large batches take
+            proba = compiled.walk_proba(X)
+            got = compiled.classes_[np.argmax(proba, axis=1)]
+        else:
+            proba, got = None, compiled(X)
+        expected = est.predict(X)
+        mismatches = int(np.sum(expected != got))
+        report = {"rows": len(X), "mismatches": mismatches}
+        if proba is not None:
+            report["max_proba_diff"] = float(np.max(np.abs(est.predict_proba(X) - proba)))
+    else:
+        diff = np.abs(est.transform(X) - compiled(X))
+        report = {"rows": len(X), "mismatches": int(np.sum(diff > 1e-9)), "max_abs_diff": float(diff.max())}
+    report["ok"] = report["mismatches"] == 0
+    return report
+
+
+def compile_checked(est: Any) -> Optional[Any]:
+    """Compiled evaluator if supported and it matches sklearn exactly, else None."""
+    if not is_sklearn(est):
+        return None
+    try:
+        compiled = compile_estimator(est)
+    except UnsupportedEstimator:
+        return None
+    report = check_parity(est, compiled)
+    if not report["ok"]:
+        print(f"⚠️ NumPy evaluator for {_kind(est)} disagrees with sklearn ({report}); using sklearn")
+        return None
+    return compiled
+
+
+def time_call(fn, X: np.ndarray, runs: int = 1000) -> float:
+    """Mean microseconds per call."""
+    fn(X)
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn(X)
+    return (time.perf_counter() - start) / runs * 1e6
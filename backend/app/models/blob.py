@@ -0,0 +1,17 @@
+from sqlalchemy import String, Integer, BigInteger, DateTime, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from app.db.session import Base
+
+class Blob(Base):
+    """Uploaded image stored once under its SHA-256 (app/db/blobstore.py)."""
+    __tablename__ = "blobs"
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=True)   # NULL until the file write lands
+    format: Mapped[str] = mapped_column(String(16), nullable=True)
+    refcount: Mapped[int] = mapped_column(Integer, default=0)      # diagnoses rows pointing here
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_blobs_unreferenced", "refcount", "created_at"),
+    )
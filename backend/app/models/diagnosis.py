@@ -12,3 +12,4 @@ class Diagnosis(Base):
     probs_json: Mapped[str] = mapped_column(Text)   # JSON as text for simplicity
     model_version: Mapped[str] = mapped_column(String(16), default="v1")
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    image_sha256: Mapped[str] = mapped_column(String(64), nullable=True, index=True)  # blobs.sha256
@@ -0,0 +1,19 @@
+from sqlalchemy import String, Integer, DateTime, Text
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from app.db.session import Base
+
+class DiagnosisPartition(Base):
+    """Catalog of monthly diagnosis partitions (app/db/partitions.py)."""
+    __tablename__ = "diagnosis_partitions"
+    key: Mapped[str] = mapped_column(String(7), primary_key=True)       # "2026_10"
+    state: Mapped[str] = mapped_column(String(16), default="live")      # live | sealed | archived
+    path: Mapped[str] = mapped_column(String(512))                      # .db file, or .parquet once archived
+    rows: Mapped[int] = mapped_column(Integer, nullable=True)           # stats below are set when sealed
+    min_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    max_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    min_created_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    max_created_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    label_counts_json: Mapped[str] = mapped_column(Text, nullable=True)  # {"positive": 12, ...}
+    sealed_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
@@ -0,0 +1,21 @@
+from sqlalchemy import String, Integer, BigInteger, ForeignKey, DateTime, Text, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from app.db.session import Base
+
+class ImageFingerprint(Base):
+    """Perceptual hashes of scored uploads with the prediction they got (app/ml/dedup.py)."""
+    __tablename__ = "image_fingerprints"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    disease_key: Mapped[str] = mapped_column(String(64))
+    model_version: Mapped[str] = mapped_column(String(16))
+    phash: Mapped[int] = mapped_column(BigInteger)   # signed 64-bit
+    dhash: Mapped[int] = mapped_column(BigInteger)
+    probs_json: Mapped[str] = mapped_column(Text)    # JSON list in the model's label order
+    diagnosis_id: Mapped[int] = mapped_column(Integer, ForeignKey("diagnoses.id"), nullable=True)
+    patient_id: Mapped[int] = mapped_column(Integer, ForeignKey("patients.id"), nullable=True)  # reuse scope
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_fingerprints_model", "disease_key", "model_version", "id"),
+    )
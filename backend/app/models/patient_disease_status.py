@@ -0,0 +1,24 @@
+from sqlalchemy import String, Integer, Float, ForeignKey, DateTime, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from app.db.session import Base
+
+class PatientDiseaseStatus(Base):
+    """Latest diagnosis per (patient, disease); upserted by save_diagnosis()."""
+    __tablename__ = "patient_disease_status"
+    patient_id: Mapped[int] = mapped_column(Integer, ForeignKey("patients.id"), primary_key=True)
+    disease_key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    diagnosis_id: Mapped[int] = mapped_column(Integer, ForeignKey("diagnoses.id"))
+    label: Mapped[str] = mapped_column(String(128))
+    confidence: Mapped[float] = mapped_column(Float, nullable=True)
+    risk: Mapped[float] = mapped_column(Float, default=0.0)
+    model_version: Mapped[str] = mapped_column(String(16), default="v1")
+    diagnosed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    # Worklist orderings, each ending in the primary key for keyset paging
+    __table_args__ = (
+        Index("ix_pds_risk", "risk", "diagnosed_at", "patient_id", "disease_key"),
+        Index("ix_pds_recent", "diagnosed_at", "patient_id", "disease_key"),
+        Index("ix_pds_disease_risk", "disease_key", "risk", "diagnosed_at", "patient_id"),
+        Index("ix_pds_disease_recent", "disease_key", "diagnosed_at", "patient_id"),
+    )
@@ -1,16 +1,77 @@
 import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
+from app.db import partitions
 from app.models.diagnosis import Diagnosis
+from app.repositories.status_repo import status_row, upsert_statuses
 
-def save_diagnosis(db: Session, *, patient_id: int, disease_key: str, label: str, probs: dict, version: str) -> Diagnosis:
+def save_diagnosis(db: Session, *, patient_id: int, disease_key: str, label: str, probs: dict, version: str,
+                   image_sha256: Optional[str] = None) -> Diagnosis:
+    if partitions.enabled():
+        return _save_partitioned(db, patient_id=patient_id, disease_key=disease_key, label=label, probs=probs,
+                                 version=version, image_sha256=image_sha256)
     d = Diagnosis(
         patient_id=patient_id,
         disease_key=disease_key,
         label=label,
         probs_json=json.dumps(probs),
-        model_version=version
+        model_version=version,
+        image_sha256=image_sha256,  # blob store reference; refcounted by trigger
     )
     db.add(d)
+    db.flush()  # assigns id + created_at for the status row
+    # Latest-status-per-patient summary, in the same transaction
+    upsert_statuses(db, [status_row(d.id, patient_id, disease_key, label, probs, version, d.created_at)])
     db.commit()
     db.refresh(d)
     return d
+
+
+def _save_partitioned(db: Session, *, patient_id: int, disease_key: str, label: str, probs: dict, version: str,
+                      image_sha256: Optional[str]) -> Diagnosis:
+    """Insert into the current month's partition; the returned Diagnosis is detached from the session."""
+    values = {
+        "patient_id": patient_id,
+        "disease_key": disease_key,
+        "label": label,
+        "probs_json": json.dumps(probs),
+        "model_version": version,
+        "created_at": datetime.utcnow(),
+        "image_sha256": image_sha256,
+    }
+    [diagnosis_id] = partitions.insert_diagnoses(db.connection(), [values])
+    upsert_statuses(db, [status_row(diagnosis_id, patient_id, disease_key, label, probs, version, values["created_at"])])
+    db.commit()
+    return Diagnosis(id=diagnosis_id, **values)
+
+
+# ---- readers (routed through the monthly partitions when enabled) ----
+def _as_dict(d: Diagnosis) -> Dict[str, Any]:
+    return {c: getattr(d, c) for c in partitions.COLUMNS}
+
+
+def count_diagnoses(db: Session, since: Optional[datetime] = None, labels: Optional[Sequence[str]] = None) -> int:
+    if partitions.enabled():
+        return partitions.count(db.connection(), since, labels)
+    stmt = select(func.count()).select_from(Diagnosis)
+    if since is not None:
+        stmt = stmt.where(Diagnosis.created_at >= since)
+    if labels is not None:
+        stmt = stmt.where(Diagnosis.label.in_(list(labels)))
+    return db.execute(stmt).scalar()
+
+
+def recent_diagnoses(db: Session, limit: int) -> List[Dict[str, Any]]:
+    if partitions.enabled():
+        return partitions.recent(db.connection(), limit)
+    rows = db.query(Diagnosis).order_by(Diagnosis.created_at.desc()).limit(limit).all()
+    return [_as_dict(d) for d in rows]
+
+
+def get_diagnosis(db: Session, diagnosis_id: int) -> Optional[Dict[str, Any]]:
+    if partitions.enabled():
+        return partitions.fetch(db.connection(), [diagnosis_id]).get(diagnosis_id)
+    d = db.get(Diagnosis, diagnosis_id)
+    return _as_dict(d) if d is not None else None
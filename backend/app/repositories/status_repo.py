@@ -0,0 +1,136 @@
+from datetime import datetime
+from typing import Any, Dict, List
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from app.models.diagnosis import Diagnosis
+from app.models.patient_disease_status import PatientDiseaseStatus
+
+# Labels worth acting on per disease; risk is the total probability of these
+# (a confident benign skin finding must not outrank a likely melanoma)
+POSITIVE_LABELS = {
+    "skin_cancer": {"Melanoma", "Basal Cell Carcinoma", "Squamous Cell Carcinoma", "Actinic Keratosis"},
+    "brain_tumor": {"glioma", "meningioma", "pituitary", "Glioma Tumor", "Meningioma Tumor", "Pituitary Tumor"},
+    "tb": {"positive", "suspected", "Tuberculosis"},
+    "malaria": {"positive", "suspected", "Parasitized"},
+}
+# Other diseases: labels meaning "nothing found"; risk is then the probability of anything else.
+NEGATIVE_LABELS = {"No Tumor", "notumor", "negative", "normal", "Uninfected"}
+# Bump when risk_score() changes: init_db then recomputes the stored risks once
+# (tracked in SQLite's PRAGMA user_version).
+RISK_SCORE_VERSION = 1
+# Ordinal malnutrition risk levels
+RISK_LEVELS = {"Low": 0.1, "Moderate": 0.5, "High": 0.8, "Very High": 1.0}
+
+
+def risk_score(disease_key: str, label: str, probs: Dict[str, float]) -> float:
+    """Single 0..1 number the worklist sorts by (higher = look at it first)."""
+    if label in RISK_LEVELS:
+        return RISK_LEVELS[label]
+    if not probs:
+        return 0.0
+    positive = POSITIVE_LABELS.get(disease_key)
+    if positive is not None and any(k in positive for k in probs):
+        return round(min(1.0, sum(float(p) for k, p in probs.items() if k in positive)), 6)
+    negative = sum(float(p) for k, p in probs.items() if k in NEGATIVE_LABELS)
+    if any(k in NEGATIVE_LABELS for k in probs):
+        return round(1.0 - negative, 6)
+    return float(probs.get(label, max(probs.values())))
+
+
+def status_row(diagnosis_id: int, patient_id: int, disease_key: str, label: str, probs: Dict[str, float],
+               version: str, diagnosed_at: datetime) -> Dict[str, Any]:
+    """Values for one patient_disease_status row."""
+    return {
+        "patient_id": patient_id,
+        "disease_key": disease_key,
+        "diagnosis_id": diagnosis_id,
+        "label": label,
+        "confidence": float(probs[label]) if label in probs else (max(map(float, probs.values())) if probs else None),
+        "risk": risk_score(disease_key, label, probs),
+        "model_version": version,
+        "diagnosed_at": diagnosed_at,
+    }
+
+
+def upsert_statuses(bind: Any, rows: List[Dict[str, Any]]) -> None:
+    """
+    Insert or replace (patient, disease) rows in one statement; an older
+    diagnosis never overwrites a newer one (safe for backfills and bulk loads).
+    """
+    if not rows:
+        return
+    table = PatientDiseaseStatus.__table__
+    dialect = bind.get_bind().dialect.name if isinstance(bind, Session) else bind.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(table)
+    excluded = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.patient_id, table.c.disease_key],
+        set_={c: excluded[c] for c in ("diagnosis_id", "label", "confidence", "risk", "model_version", "diagnosed_at")},
+        where=excluded.diagnosed_at >= table.c.diagnosed_at,
+    )
+    # One row per key per statement: ON CONFLICT cannot touch the same row twice.
+    latest: Dict[Any, Dict[str, Any]] = {}
+    for row in rows:
+        key = (row["patient_id"], row["disease_key"])
+        if key not in latest or row["diagnosed_at"] >= latest[key]["diagnosed_at"]:
+            latest[key] = row
+    bind.execute(stmt, list(latest.values()))
+
+
+def risk_scores_current(engine: Any) -> bool:
+    if engine.dialect.name != "sqlite":
+        return True
+    with engine.connect() as conn:
+        return conn.execute(text("PRAGMA user_version")).scalar() >= RISK_SCORE_VERSION
+
+
+def mark_risk_scores(engine: Any) -> None:
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            conn.execute(text(f"PRAGMA user_version = {RISK_SCORE_VERSION}"))
+
+
+def _history(db: Session, batch_size: int):
+    """Every diagnosis as a dict, oldest first; partitioned months included when enabled."""
+    from app.db import partitions
+
+    if partitions.enabled():
+        yield from partitions.scan(db.connection(), partitions.COLUMNS)
+        return
+    last_id = 0
+    while True:
+        batch = db.execute(
+            select(Diagnosis).where(Diagnosis.id > last_id).order_by(Diagnosis.id).limit(batch_size)
+        ).scalars().all()
+        if not batch:
+            return
+        for d in batch:
+            yield {c: getattr(d, c) for c in ("id", "patient_id", "disease_key", "label", "probs_json",
+                                              "model_version", "created_at")}
+        last_id = batch[-1].id
+
+
+def rebuild_statuses(db: Session, batch_size: int = 5000) -> int:
+    """Recompute the table from the full diagnoses history (one pass, oldest first)."""
+    import json
+
+    db.query(PatientDiseaseStatus).delete()
+    total = 0
+    rows: List[Dict[str, Any]] = []
+    for d in _history(db, batch_size):
+        rows.append(status_row(d["id"], d["patient_id"], d["disease_key"], d["label"],
+                               json.loads(d["probs_json"] or "{}"), d["model_version"], d["created_at"]))
+        if len(rows) >= batch_size:
+            upsert_statuses(db, rows)
+            total += len(rows)
+            rows = []
+    upsert_statuses(db, rows)
+    total += len(rows)
+    db.commit()
+    return total
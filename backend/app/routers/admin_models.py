@@ -0,0 +1,79 @@
+# ================================================================
+# File: app/routers/admin_models.py
+# Description: Admin API for hot-swapping served models
+# ================================================================
+
+from os.path import exists
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import BaseModel, Field
+
+from app.dependencies.auth import require_admin
+
+router = APIRouter(
+    prefix="/api/admin/models",
+    tags=["Admin - Models"],
+    dependencies=[Depends(require_admin)],
+)
+
+
+class StageRequest(BaseModel):
+    path: str
+    version: str
+    shadow_rate: float = Field(0.0, ge=0.0, le=1.0)
+
+
+class ShadowRequest(BaseModel):
+    rate: float = Field(..., ge=0.0, le=1.0)
+
+
+@router.get("")
+def models_status(request: Request):
+    """Serving and candidate versions plus shadow comparison stats."""
+    return request.app.state.models.status()
+
+
+@router.post("/{name}/stage", status_code=202)
+def stage_model(name: str, body: StageRequest, request: Request):
+    """Load a candidate version in the background and warm it up."""
+    if not exists(body.path):
+        raise HTTPException(status_code=404, detail=f"Model file not found: {body.path}")
+    try:
+        slot = request.app.state.models.stage(name, body.path, body.version, body.shadow_rate)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"name": name, "candidate": slot.describe()}
+
+
+@router.put("/{name}/shadow")
+def set_shadow(name: str, body: ShadowRequest, request: Request):
+    """Change the fraction of live traffic mirrored to the candidate."""
+    try:
+        request.app.state.models.set_shadow_rate(name, body.rate)
+    except RuntimeError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return request.app.state.models.status().get(name)
+
+
+@router.post("/{name}/promote")
+def promote_model(name: str, request: Request):
+    """Atomically swap the ready candidate in as the serving model."""
+    from app.ml.cascade import cascade, disease_key
+
+    models = request.app.state.models
+    try:
+        slot = models.promote(name)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    out = {"name": name, "serving": slot.describe()}
+    key = disease_key(name)
+    if key in cascade.specs:
+        out["cascade_error"] = cascade.check(models, key)  # the new full/first-stage pair
+    return out
+
+
+@router.delete("/{name}/candidate")
+def discard_candidate(name: str, request: Request):
+    """Drop the candidate and stop shadowing."""
+    request.app.state.models.discard(name)
+    return {"name": name, "candidate": None}
@@ -0,0 +1,154 @@
+# ================================================================
+# File: app/routers/admin_ops.py
+# Description: Admin API for runtime/operational state
+# ================================================================
+
+import json
+import re
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response
+from pydantic import BaseModel, Field
+
+from app.core.admission import admission
+from app.core.config import settings
+from app.core.memory import monitor
+from app.core.profiling import MODES, profiler
+from app.dependencies.auth import require_admin
+
+router = APIRouter(
+    prefix="/api/admin",
+    tags=["Admin - Operations"],
+    dependencies=[Depends(require_admin)],
+)
+
+
+@router.get("/admission")
+def admission_status():
+    """Lane occupancy, queue waits and quota rejections of the inference admission controller."""
+    return admission.describe()
+
+
+@router.get("/dedup")
+def dedup_status():
+    """Near-duplicate index size and per-disease hit rates (app/ml/dedup.py)."""
+    from app.ml.dedup import dedup  # numpy/PIL stay out of non-ML processes
+
+    return dedup.describe()
+
+
+@router.get("/blobs")
+def blob_status():
+    """Stored uploads, their size and how many nobody references (app/db/blobstore.py)."""
+    from app.db.blobstore import blobs
+
+    return blobs.describe()
+
+
+@router.get("/cascade")
+def cascade_status(request: Request):
+    """First-stage cascade settings and escalation rates per disease (app/ml/cascade.py)."""
+    from app.ml.cascade import cascade
+
+    return cascade.describe(getattr(request.app.state, "models", None))
+
+
+# ================================================================
+# 🔬 Request Profiling
+# ================================================================
+class ProfileRequest(BaseModel):
+    route: str = Field(..., description="Regex searched in the request path, e.g. ^/api/predict/brain-tumor$")
+    requests: int = Field(10, ge=1)
+    mode: str = Field("sampling", description="cprofile | sampling")
+    method: Optional[str] = Field(None, description="Only this HTTP method")
+    interval_ms: float = Field(2.0, ge=0.5, le=100.0, description="Sampling interval")
+    expires_s: float = Field(600.0, gt=0, le=86400, description="Disarm if not filled by then")
+
+
+def _session(session_id: str):
+    session = profiler.sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"No profiling session {session_id}")
+    return session
+
+
+@router.post("/profile", status_code=201)
+def arm_profiler(body: ProfileRequest):
+    """Profile the next N requests whose path matches `route`."""
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(status_code=409, detail="Profiling is disabled (PROFILING_ENABLED=false)")
+    if body.mode not in MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {list(MODES)}")
+    if body.requests > settings.PROFILING_MAX_REQUESTS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.PROFILING_MAX_REQUESTS} requests")
+    try:
+        re.compile(body.route)
+    except re.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid route pattern: {e}")
+    try:
+        session = profiler.arm(body.route, body.requests, body.mode, body.method, body.interval_ms, body.expires_s)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return session.describe()
+
+
+@router.get("/profile")
+def list_profiles():
+    return {"armed": profiler.armed.id if profiler.armed else None,
+            "sessions": [s.describe() for s in profiler.sessions.values()]}
+
+
+@router.get("/profile/{session_id}")
+def profile_summary(session_id: str, limit: int = Query(30, ge=1, le=500)):
+    """Session state plus the hottest functions so far."""
+    session = _session(session_id)
+    return {**session.describe(), "top": session.top(limit)}
+
+
+@router.get("/profile/{session_id}/speedscope")
+def profile_speedscope(session_id: str):
+    """Flame graph data; open the file at https://www.speedscope.app."""
+    session = _session(session_id)
+    return Response(
+        content=json.dumps(session.speedscope()),
+        media_type="application/json",
+        headers={"Content-Disposition": f'attachment; filename="profile-{session.id}.speedscope.json"'},
+    )
+
+
+@router.get("/profile/{session_id}/pstats")
+def profile_pstats(session_id: str):
+    """cProfile stats in pstats.dump_stats() format (python -m pstats, snakeviz)."""
+    session = _session(session_id)
+    if session.mode != "cprofile":
+        raise HTTPException(status_code=409, detail="pstats output needs a cprofile session")
+    return Response(
+        content=session.pstats_bytes(),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="profile-{session.id}.pstats"'},
+    )
+
+
+@router.delete("/profile/{session_id}")
+def cancel_profile(session_id: str):
+    _session(session_id)
+    return profiler.cancel(session_id).describe()
+
+
+# ================================================================
+# 🧮 Memory
+# ================================================================
+@router.get("/memory")
+def memory_status():
+    """RSS vs. baseline, per-route RSS deltas / traced peaks, and allocation-site growth."""
+    return monitor.describe()
+
+
+@router.post("/memory/snapshot")
+def memory_snapshot():
+    """Take a tracemalloc snapshot now and return the growth since the previous one."""
+    try:
+        return {"growth_since_last_snapshot": monitor.take_snapshot()}
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
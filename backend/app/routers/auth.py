@@ -6,16 +6,18 @@ from passlib.context import CryptContext
 from datetime import datetime, timedelta
 import jwt
 
+from app.core.config import settings
 from app.db.session import get_db
+from app.dependencies.auth import get_current_user
 from app.models.user import User
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 # ---------------- Security Setup ----------------
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-SECRET_KEY = "your-secret-key"   # TODO: move to .env
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60
+SECRET_KEY = settings.JWT_SECRET   # also verified by app/dependencies/auth.py
+ALGORITHM = settings.JWT_ALG
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
 
 # ---------------- Pydantic Schemas ----------------
@@ -34,6 +36,11 @@ class TokenResponse(BaseModel):
 
 
 # ---------------- Utils ----------------
+def get_user_by_email(db: Session, email: str):
+    """The lookup behind register and login (unique index on users.email)."""
+    return db.query(User).filter(User.email == email).first()
+
+
 def create_access_token(data: dict, expires_delta: timedelta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)):
     to_encode = data.copy()
     expire = datetime.utcnow() + expires_delta
@@ -44,7 +51,7 @@ def create_access_token(data: dict, expires_delta: timedelta = timedelta(minutes
 # ---------------- Endpoints ----------------
 @router.post("/register")
 def register(req: RegisterRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == req.email).first()
+    user = get_user_by_email(db, req.email)
     if user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
@@ -53,6 +60,7 @@ def register(req: RegisterRequest, db: Session = Depends(get_db)):
         full_name=req.full_name,
         email=req.email,
         hashed_password=hashed_pw,
+        role="clinician",  # admin is granted only by init_db (ADMIN_EMAILS), never by self-registration
     )
     db.add(new_user)
     db.commit()
@@ -63,7 +71,7 @@ def register(req: RegisterRequest, db: Session = Depends(get_db)):
 
 @router.post("/login", response_model=TokenResponse)
 def login(req: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == req.email).first()
+    user = get_user_by_email(db, req.email)
     if not user or not pwd_context.verify(req.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
@@ -72,6 +80,5 @@ def login(req: LoginRequest, db: Session = Depends(get_db)):
 
 
 @router.get("/me")
-def me():
-    # 🔜 Later: decode JWT & fetch real user from DB
-    return {"id": 1, "email": "demo@user.com", "role": "clinician"}
+def me(user=Depends(get_current_user)):
+    return user
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, UploadFile, File
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, UploadFile, File, Query, Request
 from sqlalchemy.orm import Session
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 # adjust if your session dependency lives elsewhere
+from app.core.health import prober
 from app.db.session import get_db
-from app.models.diagnosis import Diagnosis
+from app.ml import registry
+from app.repositories.diagnosis_repo import count_diagnoses, recent_diagnoses
 
 router = APIRouter(prefix="/api", tags=["dashboard"])
 
@@ -16,23 +19,58 @@ SUPPORTED_DISEASES: List[Dict] = [
     {"key": "malaria",      "name": "Malaria",        "model_version": "v1", "loaded": False},
 ]
 
+# Disease key -> model name in app.state.models (ModelManager)
+SERVING_MODELS: Dict[str, str] = {
+    "skin_cancer": "skin_cancer",
+    "brain_tumor": "brain_tumor",
+    "malnutrition": "malnutrition_model",
+}
+
+
+def serving_diseases(request: Request) -> List[Dict]:
+    """SUPPORTED_DISEASES with versions/loaded flags from what is actually serving."""
+    models = getattr(request.app.state, "models", None)
+    pipelines = registry.loaded_pipelines()
+    items = []
+    for d in SUPPORTED_DISEASES:
+        item = dict(d)
+        name = SERVING_MODELS.get(d["key"])
+        if models is not None and name is not None and name in models:
+            item["model_version"] = models.version(name)
+            item["loaded"] = True
+        elif d["key"] in pipelines:
+            item["model_version"] = pipelines[d["key"]].version
+            item["loaded"] = True
+        items.append(item)
+    return items
+
+
+def window_start(window: str) -> Optional[datetime]:
+    """Start of a dashboard window (UTC); None for all time."""
+    now = datetime.utcnow()
+    if window == "today":
+        return now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if window == "all":
+        return None
+    return now - timedelta(days=int(window.rstrip("d")))
+
 
 @router.get("/stats/summary")
-def stats_summary(window: str = "today", db: Session = Depends(get_db)):
+def stats_summary(window: str = Query("today", pattern="^(today|7d|30d|all)$"), db: Session = Depends(get_db)):
     total = 0
     positive_flags = 0
+    since = window_start(window)
     try:
-        total = db.query(Diagnosis).count()
-        if hasattr(Diagnosis, "label"):
-            positive_flags = db.query(Diagnosis).filter(
-                getattr(Diagnosis, "label").in_(["positive", "suspected"])
-            ).count()
+        # with partitioning on, "today" reads only the current month's partition
+        total = count_diagnoses(db, since)
+        positive_flags = count_diagnoses(db, since, labels=["positive", "suspected"])
     except Exception:
         # DB not ready or table missing — return safe defaults
         pass
 
     return {
-        "new_diagnoses": total,          # refine by window later
+        "window": window,
+        "new_diagnoses": total,
         "positive_flags": positive_flags,
         "avg_inference_ms": 0,
         "jobs_in_progress": 0,
@@ -40,27 +78,25 @@ def stats_summary(window: str = "today", db: Session = Depends(get_db)):
 
 
 @router.get("/diseases")
-def list_diseases():
-    return {"items": SUPPORTED_DISEASES}
+def list_diseases(request: Request):
+    return {"items": serving_diseases(request)}
 
 
 @router.get("/diagnoses/recent")
 def diagnoses_recent(limit: int = 20, db: Session = Depends(get_db)):
     items = []
     try:
-        # order by created_at if exists, else by id
-        order_col = getattr(Diagnosis, "created_at", Diagnosis.id)
-        rows = db.query(Diagnosis).order_by(order_col.desc()).limit(limit).all()
+        rows = recent_diagnoses(db, limit)
 
         def row_to_item(d):
             return {
-                "id": d.id,
-                "created_at": getattr(d, "created_at", None),
-                "patient": {"id": d.id, "name": getattr(d, "patient_name", "—")},
-                "disease_key": getattr(d, "disease_key", None),
-                "label": getattr(d, "label", None),
-                "confidence": getattr(d, "confidence", None),
-                "model_version": getattr(d, "model_version", None),
+                "id": d["id"],
+                "created_at": d["created_at"],
+                "patient": {"id": d["patient_id"], "name": "—"},
+                "disease_key": d["disease_key"],
+                "label": d["label"],
+                "confidence": None,
+                "model_version": d["model_version"],
             }
 
         items = [row_to_item(d) for d in rows]
@@ -83,14 +119,46 @@ def alerts():
 
 
 @router.get("/status/health")
-def status_health():
+def status_health(request: Request):
+    """
+    Latest canary results from the background prober (app/core/health.py);
+    no probing happens on this request. `ok` is null until the first round.
+    """
+    snap = prober.current()
+    if snap is None:
+        unknown = {"ok": None, "latency_ms": None}
+        return {
+            "ok": None,
+            "api": unknown,
+            "db": unknown,
+            "pipelines": [
+                {"key": d["key"], "loaded": d["loaded"], "model_version": d["model_version"], "probe": None}
+                for d in serving_diseases(request)
+            ],
+        }
+
+    pipelines = []
+    for d in serving_diseases(request):
+        name = SERVING_MODELS.get(d["key"])
+        probe = (snap["models"].get(name) or snap["pipelines"].get(d["key"])) if d["loaded"] else None
+        pipelines.append({
+            "key": d["key"],
+            "loaded": d["loaded"],
+            "model_version": d["model_version"],
+            "ok": probe["ok"] if probe else None,
+            "latency_ms": probe["latency_ms"] if probe else None,
+            "probe": probe,
+        })
+    api = snap.get("api")
+    components = [c for c in (api, snap["db"], *snap["models"].values(), *snap["pipelines"].values()) if c]
     return {
-        "api": {"ok": True, "latency_ms": 0},
-        "db": {"ok": True},
-        "pipelines": [
-            {"key": d["key"], "loaded": d["loaded"], "model_version": d["model_version"]}
-            for d in SUPPORTED_DISEASES
-        ],
+        "ok": all(c["ok"] for c in components) and not snap.get("stale", False),
+        "checked_at": snap["checked_at"],
+        "stale": snap.get("stale", False),
+        "api": api or {"ok": None, "latency_ms": None},
+        "db": snap["db"],
+        "models": snap["models"],
+        "pipelines": pipelines,
     }
 
 
@@ -1,4 +1,11 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+from app.db.blobstore import blobs
+from app.db.session import get_db
+from app.dependencies.auth import get_current_user
+from app.repositories.diagnosis_repo import get_diagnosis
 
 router = APIRouter(prefix="/diagnoses")
 
@@ -9,3 +16,22 @@ def recent(limit: int = Query(20, ge=1, le=100)):
         {"id": 1, "patient_id": 101, "disease": "tb", "created_at": "2025-01-01T00:00:00Z"},
     ]
     return data[:limit]
+
+
+MEDIA_TYPES = {"png": "image/png", "jpeg": "image/jpeg", "jpg": "image/jpeg"}
+
+
+@router.get("/{diagnosis_id}/image")
+def diagnosis_image(diagnosis_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    """The uploaded image a diagnosis was made from, out of the blob store."""
+    from app.models.blob import Blob
+
+    d = get_diagnosis(db, diagnosis_id)
+    if d is None:
+        raise HTTPException(status_code=404, detail="Diagnosis not found")
+    sha256 = d["image_sha256"]
+    if not sha256 or not blobs.exists(sha256):
+        raise HTTPException(status_code=404, detail="No stored image for this diagnosis")
+    blob = db.get(Blob, sha256)
+    media_type = MEDIA_TYPES.get(blob.format if blob is not None else None, "application/octet-stream")
+    return FileResponse(blobs.path(sha256), media_type=media_type)
@@ -1,5 +1,8 @@
 # routers/diseases/__init__.py
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+
+from app.core.admission import admit_after
+from app.core.uploads import image_upload
 
 from .tb import router as tb_router
 from .malaria import router as malaria_router
@@ -9,6 +12,9 @@ from .malnutrition import router as malnutrition_router
 
 router = APIRouter(prefix="/diseases", tags=["diseases"])
 
+# every /infer takes an image upload; the slot is taken once it is parsed
+ADMIT = Depends(admit_after(image_upload))
+
 # This is the endpoint your UI wants: GET /api/diseases
 @router.get("")  # NOTE: empty path so it matches /api/diseases (no trailing slash)
 async def list_diseases():
@@ -20,9 +26,10 @@ async def list_diseases():
         {"id": "malnutrition",  "name": "Malnutrition",  "path": "/api/diseases/malnutrition"},
     ]
 
-# Mount each disease-specific router under the collection
-router.include_router(tb_router,           prefix="/tb")
-router.include_router(malaria_router,      prefix="/malaria")
-router.include_router(skin_cancer_router,  prefix="/skin_cancer")
-router.include_router(brain_tumor_router,  prefix="/brain_tumor")
-router.include_router(malnutrition_router, prefix="/malnutrition")
+# Mount each disease-specific router under the collection; inference goes
+# through the same admission lanes/quotas as /api/predict
+router.include_router(tb_router,           prefix="/tb", dependencies=[ADMIT])
+router.include_router(malaria_router,      prefix="/malaria", dependencies=[ADMIT])
+router.include_router(skin_cancer_router,  prefix="/skin_cancer", dependencies=[ADMIT])
+router.include_router(brain_tumor_router,  prefix="/brain_tumor", dependencies=[ADMIT])
+router.include_router(malnutrition_router, prefix="/malnutrition", dependencies=[ADMIT])
@@ -1,25 +1,18 @@
-from fastapi import APIRouter, File, UploadFile, Depends, HTTPException
+from fastapi import APIRouter, Depends
+from fastapi.concurrency import run_in_threadpool
 from typing import Dict
+from app.core.uploads import UPLOAD_FORM, BufferedUpload, image_upload
 from app.dependencies.auth import get_current_user
-from app.ml.registry import REGISTRY
+from app.ml import registry
 
 router = APIRouter(prefix="/diseases/malnutrition", tags=["malnutrition"])
 
-_pipeline = None
-
 def get_pipeline():
-    global _pipeline
-    if _pipeline is None:
-        cls = REGISTRY["malnutrition"]
-        pipeline = cls()
-        pipeline.load()
-        _pipeline = pipeline
-    return _pipeline
+    # Shared with the /api/predict/screen fan-out
+    return registry.get_pipeline("malnutrition")
 
-@router.post("/infer")
-async def infer_image(file: UploadFile = File(...), user=Depends(get_current_user)) -> Dict:
-    if file.content_type not in {"image/jpeg", "image/png"}:
-        raise HTTPException(status_code=400, detail="Only JPEG/PNG supported")
-    data = await file.read()
-    out = get_pipeline().infer({"file": data})
+@router.post("/infer", openapi_extra=UPLOAD_FORM)
+async def infer_image(file: BufferedUpload = Depends(image_upload), user=Depends(get_current_user)) -> Dict:
+    # JPEG/PNG is enforced by sniffing magic bytes in image_upload
+    out = await run_in_threadpool(get_pipeline().infer, {"file": file.data})
     return out
@@ -3,18 +3,46 @@
 # Description: Unified prediction router for HealthLens API
 # ================================================================
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, Request, Query
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
-from tensorflow.keras.preprocessing.image import img_to_array
-from PIL import Image
-import pandas as pd
 import numpy as np
-import tempfile
-import os
+import asyncio
+import hashlib
+import threading
 import time
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+from app.core.admission import admit, admit_after
+from app.core.config import settings
+from app.core.responses import (
+    NUMERIC_SCHEMA,
+    Representation,
+    numeric_envelope,
+    numeric_probs,
+    response_representation,
+)
+from app.core.uploads import UPLOAD_FORM, BufferedUpload, SpooledUpload, image_upload, study_upload
+from app.db.blobstore import blobs
+from app.db.session import SessionLocal
+from app.ml import registry
+from app.ml.cascade import cascade
+from app.ml.common.preproc import DecodedImage
+from app.ml.common.tiling import plan_tiles, predict_tiled
+from app.ml.dedup import dedup
+from app.ml.explain import ExplanationQueueFull, explainer
+from app.models.patient import Patient
+from app.repositories.diagnosis_repo import save_diagnosis
 
 router = APIRouter(prefix="/api/predict", tags=["Multi-Disease Predictor"])
+logger = logging.getLogger(__name__)
+
+# admission slots are taken only once the upload has been parsed
+ADMIT_IMAGE = Depends(admit_after(image_upload))
+ADMIT_STUDY = Depends(admit_after(study_upload))
 
 # ================================================================
 # 🧩 Label Definitions
@@ -58,97 +86,454 @@ class MalnutritionInput(BaseModel):
     U5_Pop_Thousands: float
 
 
+MALNUTRITION_FEATURES = list(MalnutritionInput.model_fields)
+
+
 # ================================================================
 # 🧠 Image Preprocessing Helper
 # ================================================================
-def preprocess_image(upload_file: UploadFile, size: tuple[int, int] = (256, 256), grayscale=False):
-    """Load and preprocess image for prediction."""
+def decode_upload(upload: BufferedUpload) -> DecodedImage:
+    """Decode an uploaded image once so several inputs can be derived from it."""
     try:
-        with tempfile.NamedTemporaryFile(delete=False) as tmp:
-            tmp.write(upload_file.file.read())
-            tmp_path = tmp.name
+        return DecodedImage.from_bytes(upload.data)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Image preprocessing failed: {str(e)}")
 
-        img = Image.open(tmp_path)
-        if grayscale:
-            img = img.convert("L")
-        else:
-            img = img.convert("RGB")
 
-        img = img.resize(size)
-        img_array = img_to_array(img) / 255.0
-        img_array = np.expand_dims(img_array, axis=0)
-        os.remove(tmp_path)
-        return img_array
+
+def preprocess_image(upload: BufferedUpload, size: tuple[int, int] = (256, 256), grayscale=False):
+    """Load and preprocess image for prediction."""
+    image = decode_upload(upload)
+    try:
+        return image.batch("L" if grayscale else "RGB", size)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Image preprocessing failed: {str(e)}")
 
 
+# ================================================================
+# 🏷️ Result Formatting
+# ================================================================
+def format_brain_tumor(preds) -> dict:
+    idx = int(np.argmax(preds))
+    raw_label = BRAIN_CLASS_LABELS[idx]
+    return {
+        "diagnosis": FRIENDLY_BRAIN_LABELS[raw_label],
+        "confidence": f"{float(preds[idx]) * 100:.2f}%",
+        "class_probabilities": {
+            FRIENDLY_BRAIN_LABELS[label]: f"{p * 100:.2f}%" for label, p in zip(BRAIN_CLASS_LABELS, preds)
+        }
+    }
+
+
+def format_skin_cancer(preds) -> dict:
+    idx = int(np.argmax(preds))
+    return {
+        "diagnosis": SKIN_CLASS_NAMES[idx],
+        "confidence": f"{float(preds[idx]) * 100:.2f}%",
+        "class_probabilities": {
+            SKIN_CLASS_NAMES[i]: f"{p * 100:.2f}%" for i, p in enumerate(preds)
+        }
+    }
+
+
+def numeric_result(request: Request, key: str, preds, top_k=None) -> dict:
+    """Versioned numeric form: label indices into GET /api/predict/labels, raw floats."""
+    return numeric_envelope(key, request.app.state.models.version(key), **numeric_probs(preds, top_k))
+
+
+# ================================================================
+# 🗂️ Patient Diagnoses & Near-Duplicate Reuse
+# ================================================================
+PATIENT_QUERY = Query(None, description="Save fresh predictions as diagnoses of this patient")
+REUSE_QUERY = Query(
+    False, description="Return this patient's earlier result for a near-duplicate image (skips inference; needs patient_id)"
+)
+
+
+@dataclass
+class PatientUpload:
+    """An upload scored for a known patient: fresh predictions become that patient's diagnoses."""
+    patient_id: int
+    upload: BufferedUpload
+    diagnosis_ids: Dict[str, int] = field(default_factory=dict)
+    image_sha256: Optional[str] = None
+    _store_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+def store_upload(patient: PatientUpload, digest: Optional[str] = None) -> Optional[str]:
+    """
+    Keep the upload in the content-addressed blob store (written once, in
+    the background), the first time one of its diagnoses is saved. The
+    digest is that diagnosis's image_sha256, so the image can be re-scored
+    later without a re-upload; uploads nothing references are never stored.
+    """
+    if not settings.BLOB_STORE_ENABLED:
+        return None
+    with patient._store_lock:  # /screen saves several diagnoses of one upload concurrently
+        if patient.image_sha256 is None:
+            upload = patient.upload
+            digest = digest or hashlib.sha256(upload.data).hexdigest()
+            patient.image_sha256 = blobs.put_async(upload.data, digest, upload.format)
+        return patient.image_sha256
+
+
+def stored_digest(patient: Optional[PatientUpload]) -> Optional[str]:
+    return patient.image_sha256 if patient is not None else None
+
+
+def patient_upload(
+    patient_id: Optional[int] = PATIENT_QUERY,
+    reuse: bool = REUSE_QUERY,
+    file: BufferedUpload = Depends(image_upload),
+) -> Optional[PatientUpload]:
+    """FastAPI dependency: the patient an image endpoint records its diagnoses for, if any."""
+    if patient_id is None:
+        if reuse:
+            raise HTTPException(status_code=400, detail="reuse=true needs patient_id: results are only reused per patient")
+        return None
+    with SessionLocal() as db:
+        if db.get(Patient, patient_id) is None:
+            raise HTTPException(status_code=404, detail=f"Patient {patient_id} not found")
+    return PatientUpload(patient_id, file)
+
+
+def record_diagnosis(
+    key: str, version: str, image: Optional[DecodedImage], preds, labels: Sequence[str], patient: PatientUpload
+) -> int:
+    """Save a fresh prediction as a diagnosis; with the decoded image, fingerprint it for near-duplicate reuse."""
+    probs: List[float] = [float(p) for p in preds]
+    with SessionLocal() as db:
+        diagnosis = save_diagnosis(
+            db,
+            patient_id=patient.patient_id,
+            disease_key=key,
+            label=labels[int(np.argmax(probs))],
+            probs=dict(zip(labels, probs)),
+            version=version,
+            image_sha256=store_upload(patient, image.digest if image is not None else None),
+        )
+    patient.diagnosis_ids[key] = diagnosis.id
+    if image is not None and settings.DEDUP_ENABLED:
+        dedup.register(key, version, image, probs, patient.patient_id, diagnosis.id)
+    return diagnosis.id
+
+
+def predict_or_reuse(
+    key: str, version: str, image: DecodedImage, run, labels: Sequence[str], reuse: bool,
+    patient: Optional[PatientUpload],
+):
+    """
+    (probabilities, near_duplicate): the patient's earlier prediction of this
+    model version for a near-identical image (app/ml/dedup.py), or a fresh
+    one from run(), which is saved as the patient's diagnosis.
+    """
+    if reuse and patient is not None and settings.DEDUP_ENABLED:
+        match = dedup.lookup(key, version, image, patient.patient_id)
+        if match is not None:
+            return np.asarray(match.probs, dtype="float32"), match.describe()
+    preds = run()
+    if patient is not None:
+        record_diagnosis(key, version, image, preds, labels, patient)
+    return preds, None
+
+
+# ================================================================
+# 🪜 First-Stage Cascade
+# ================================================================
+ESCALATE_QUERY = Query(False, description="Skip the first-stage model and always run the full model")
+
+
+def predict_staged(
+    request: Request, key: str, image: DecodedImage, reuse: bool, escalate: bool, patient: Optional[PatientUpload]
+):
+    """
+    (probabilities, near_duplicate, cascade info) for a SCREEN_MODELS key:
+    the first-stage model answers when it is confident (app/ml/cascade.py),
+    otherwise the full model runs.
+    """
+    models, spec, trace = request.app.state.models, SCREEN_MODELS[key], {}
+
+    def run():
+        preds, info = cascade.predict(models, key, image, spec["mode"], spec["size"], escalate)
+        trace.update(info or {})
+        return preds
+
+    preds, duplicate = predict_or_reuse(
+        key, cascade.version(models, key, escalate), image, run, spec["labels"], reuse, patient
+    )
+    return preds, duplicate, trace or None
+
+
 # ================================================================
 # 🧠 Brain Tumor Prediction
 # ================================================================
-@router.post("/brain-tumor")
-async def predict_brain_tumor(request: Request, file: UploadFile = File(...)):
+@router.post("/brain-tumor", dependencies=[ADMIT_IMAGE], openapi_extra=UPLOAD_FORM)
+async def predict_brain_tumor(
+    request: Request,
+    file: BufferedUpload = Depends(image_upload),
+    explain: bool = Query(False, description="Queue a Grad-CAM explanation in the background"),
+    reuse: bool = REUSE_QUERY,
+    escalate: bool = ESCALATE_QUERY,
+    patient: Optional[PatientUpload] = Depends(patient_upload),
+    rep: Representation = Depends(response_representation),
+):
     """Predict brain tumor class from MRI image."""
     model = request.app.state.models.get("brain_tumor")
     if model is None:
         raise HTTPException(status_code=500, detail="Brain tumor model not loaded in app")
 
-    img_array = preprocess_image(file, grayscale=True)
+    image = await run_in_threadpool(decode_upload, file)
     try:
         start = time.time()
-        preds = model.predict(img_array, verbose=0)[0]
-        idx = np.argmax(preds)
-        raw_label = BRAIN_CLASS_LABELS[idx]
-        confidence = float(preds[idx])
+        preds, duplicate, staged = await run_in_threadpool(
+            predict_staged, request, "brain_tumor", image, reuse, escalate, patient
+        )
         elapsed = time.time() - start
 
-        return {
-            "diagnosis": FRIENDLY_BRAIN_LABELS[raw_label],
-            "confidence": f"{confidence * 100:.2f}%",
-            "processing_time": f"{elapsed:.2f}s",
-            "class_probabilities": {
-                FRIENDLY_BRAIN_LABELS[label]: f"{p * 100:.2f}%" for label, p in zip(BRAIN_CLASS_LABELS, preds)
-            }
-        }
+        if rep.numeric:
+            result = numeric_result(request, "brain_tumor", preds, rep.top_k)
+            result["elapsed_ms"] = round(elapsed * 1000, 2)
+        else:
+            result = format_brain_tumor(preds)
+            result["processing_time"] = f"{elapsed:.2f}s"
+        if duplicate:
+            result["near_duplicate"] = duplicate
+        if staged:
+            result["cascade"] = staged
+        if patient is not None:
+            result["diagnosis_id"] = patient.diagnosis_ids.get("brain_tumor")
+        result["image_sha256"] = stored_digest(patient)
+        if explain:
+            result["explanation"] = submit_explanation(request, "brain_tumor", image)
+        return rep.render(result)
     except Exception as e:
         logger.error(f"Brain tumor prediction failed: {e}")
         raise HTTPException(status_code=500, detail="Prediction error")
 
 
+# ================================================================
+# 🧠 Brain MRI Study (DICOM file or ZIP series)
+# ================================================================
+STUDY_INPUT_SIZE = (256, 256)
+STUDY_TOP_K = 5        # slices averaged for the study-level class distribution
+STUDY_TUMOR_THRESHOLD = 0.5
+
+
+def summarize_study(probs: np.ndarray) -> dict:
+    """Study-level numbers from per-slice probabilities (n_slices, n_classes)."""
+    notumor = BRAIN_CLASS_LABELS.index("notumor")
+    tumor_prob = 1.0 - probs[:, notumor]
+    top = np.argsort(-tumor_prob)[:STUDY_TOP_K]
+    top_mean = probs[top].mean(axis=0)
+    peak = float(tumor_prob[top[0]])
+
+    if peak < STUDY_TUMOR_THRESHOLD:
+        idx, confidence = notumor, 1.0 - peak
+    else:
+        tumor_classes = [i for i in range(len(BRAIN_CLASS_LABELS)) if i != notumor]
+        idx = max(tumor_classes, key=lambda i: top_mean[i])
+        confidence = peak
+    return {"label": idx, "confidence": confidence, "peak": peak, "top_mean": top_mean,
+            "top": top, "tumor_prob": tumor_prob}
+
+
+def aggregate_study(probs: np.ndarray) -> dict:
+    """Display form of summarize_study()."""
+    s = summarize_study(probs)
+    return {
+        "diagnosis": FRIENDLY_BRAIN_LABELS[BRAIN_CLASS_LABELS[s["label"]]],
+        "confidence": f"{s['confidence'] * 100:.2f}%",
+        "tumor_probability": f"{s['peak'] * 100:.2f}%",
+        "class_probabilities": {
+            FRIENDLY_BRAIN_LABELS[label]: f"{p * 100:.2f}%" for label, p in zip(BRAIN_CLASS_LABELS, s["top_mean"])
+        },
+        "suspicious_slices": [
+            {
+                "index": int(i),
+                "diagnosis": FRIENDLY_BRAIN_LABELS[BRAIN_CLASS_LABELS[int(np.argmax(probs[i]))]],
+                "tumor_probability": f"{s['tumor_prob'][i] * 100:.2f}%",
+            }
+            for i in s["top"]
+        ],
+    }
+
+
+def numeric_study(probs: np.ndarray) -> dict:
+    """Numeric form of summarize_study(); suspicious slices as parallel arrays."""
+    s = summarize_study(probs)
+    top = s["top"]
+    return {
+        "label": int(s["label"]),
+        "score": s["confidence"],
+        "tumor_probability": s["peak"],
+        "probs": s["top_mean"].astype("float32"),
+        "suspicious_slices": {
+            "index": top.astype("int32"),
+            "label": np.argmax(probs[top], axis=1).astype("int32"),
+            "tumor_probability": s["tumor_prob"][top].astype("float32"),
+        },
+    }
+
+
+def score_study(
+    request: Request, study: SpooledUpload, batch_size: int, include_slices: bool, numeric: bool = False
+) -> dict:
+    from app.ml.common.dicom import open_volume, resize_batch
+
+    volume = open_volume(
+        study.path, study.format, settings.MAX_STUDY_SLICES, settings.MAX_STUDY_UNPACKED_BYTES
+    )
+    try:
+        probs = []
+        for _, batch in volume.batches(batch_size):
+            x = resize_batch(batch, STUDY_INPUT_SIZE)
+            probs.append(np.asarray(request.app.state.models.predict("brain_tumor", x)))
+        probs = np.concatenate(probs)
+        if numeric:
+            result = numeric_envelope(
+                "brain_tumor", request.app.state.models.version("brain_tumor"), **numeric_study(probs)
+            )
+        else:
+            result = aggregate_study(probs)
+        result["slices_scored"] = int(len(probs))
+        result["series_count"] = volume.series_count
+        if include_slices:
+            result["slices"] = probs.astype("float32") if numeric else [[round(float(p), 4) for p in row] for row in probs]
+        return result
+    finally:
+        volume.close()
+
+
+@router.post("/brain-tumor/study", dependencies=[ADMIT_STUDY], openapi_extra=UPLOAD_FORM)
+async def predict_brain_tumor_study(
+    request: Request,
+    file: SpooledUpload = Depends(study_upload),
+    batch_size: int = Query(16, ge=1, le=128),
+    include_slices: bool = Query(False, description="Return per-slice probabilities"),
+    rep: Representation = Depends(response_representation),
+):
+    """Score a whole MRI study (DICOM file or ZIP of a DICOM series) slice batch by slice batch."""
+    if request.app.state.models.get("brain_tumor") is None:
+        raise HTTPException(status_code=500, detail="Brain tumor model not loaded in app")
+
+    start = time.time()
+    try:
+        result = await run_in_threadpool(score_study, request, file, batch_size, include_slices, rep.numeric)
+    except (ValueError, RuntimeError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not read study: {e}")
+    except Exception as e:
+        logger.error(f"Brain tumor study prediction failed: {e}")
+        raise HTTPException(status_code=500, detail="Prediction error")
+    if rep.numeric:
+        result["elapsed_ms"] = round((time.time() - start) * 1000, 2)
+    else:
+        result["processing_time"] = f"{time.time() - start:.2f}s"
+    return rep.render(result)
+
+
 # ================================================================
 # 🩺 Skin Cancer Prediction
 # ================================================================
-@router.post("/skin-cancer")
-async def predict_skin_cancer(request: Request, file: UploadFile = File(...)):
+@router.post("/skin-cancer", dependencies=[ADMIT_IMAGE], openapi_extra=UPLOAD_FORM)
+async def predict_skin_cancer(
+    request: Request,
+    file: BufferedUpload = Depends(image_upload),
+    explain: bool = Query(False, description="Queue a Grad-CAM explanation in the background"),
+    reuse: bool = REUSE_QUERY,
+    escalate: bool = ESCALATE_QUERY,
+    tiled: bool = Query(False, description="Score the lesion region as overlapping full-detail tiles"),
+    overlap: Optional[float] = Query(None, ge=0.0, lt=0.9, description="Tile overlap (default: TILE_OVERLAP)"),
+    patient: Optional[PatientUpload] = Depends(patient_upload),
+    rep: Representation = Depends(response_representation),
+):
     """Predict skin cancer type from lesion image."""
     model = request.app.state.models.get("skin_cancer")
     if model is None:
         raise HTTPException(status_code=500, detail="Skin cancer model not loaded in app")
 
-    img_array = preprocess_image(file, grayscale=False)
+    if tiled:
+        result = await run_in_threadpool(predict_skin_tiled, request, file, overlap, rep, patient)
+        if explain:
+            image = await run_in_threadpool(decode_upload, file)
+            result["explanation"] = submit_explanation(request, "skin_cancer", image)
+        return rep.render(result)
+
+    image = await run_in_threadpool(decode_upload, file)
     try:
-        preds = model.predict(img_array, verbose=0)[0]
-        idx = np.argmax(preds)
-        diagnosis = SKIN_CLASS_NAMES[idx]
-        confidence = float(preds[idx])
-
-        return {
-            "diagnosis": diagnosis,
-            "confidence": f"{confidence * 100:.2f}%",
-            "class_probabilities": {
-                SKIN_CLASS_NAMES[i]: f"{p * 100:.2f}%" for i, p in enumerate(preds)
-            }
-        }
+        preds, duplicate, staged = await run_in_threadpool(
+            predict_staged, request, "skin_cancer", image, reuse, escalate, patient
+        )
+        if rep.numeric:
+            result = numeric_result(request, "skin_cancer", preds, rep.top_k)
+        else:
+            result = format_skin_cancer(preds)
+        if duplicate:
+            result["near_duplicate"] = duplicate
+        if staged:
+            result["cascade"] = staged
+        if patient is not None:
+            result["diagnosis_id"] = patient.diagnosis_ids.get("skin_cancer")
+        result["image_sha256"] = stored_digest(patient)
+        if explain:
+            result["explanation"] = submit_explanation(request, "skin_cancer", image)
+        return rep.render(result)
     except Exception as e:
         logger.error(f"Skin cancer prediction failed: {e}")
         raise HTTPException(status_code=500, detail="Prediction error")
 
 
+def predict_skin_tiled(
+    request: Request, file: BufferedUpload, overlap: Optional[float], rep: Representation,
+    patient: Optional[PatientUpload] = None,
+) -> dict:
+    """
+    Tiled mode for large dermoscopy images (app/ml/common/tiling.py): the
+    lesion region is read at up to native resolution and scored as
+    overlapping 256x256 tiles instead of one squashed image. Bypasses the
+    cascade and near-duplicate reuse, which describe the squashed input.
+    """
+    tile = SCREEN_MODELS["skin_cancer"]["size"][0]
+    try:
+        plan = plan_tiles(
+            bytes(file.data), tile, "RGB",
+            overlap=settings.TILE_OVERLAP if overlap is None else overlap,
+            max_tiles=settings.TILE_MAX_TILES,
+            roi=settings.TILE_ROI,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Image preprocessing failed: {str(e)}")
+    try:
+        start = time.perf_counter()
+        preds, report = predict_tiled(
+            plan,
+            lambda batch: request.app.state.models.predict("skin_cancer", batch),
+            tile,
+            batch_size=settings.TILE_BATCH_SIZE,
+            early_exit=settings.TILE_EARLY_EXIT,
+            aggregate=settings.TILE_AGGREGATE,
+        )
+        report["inference_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    except Exception as e:
+        logger.error(f"Tiled skin cancer prediction failed: {e}")
+        raise HTTPException(status_code=500, detail="Prediction error")
+    result = numeric_result(request, "skin_cancer", preds, rep.top_k) if rep.numeric else format_skin_cancer(preds)
+    result["tiling"] = report
+    if patient is not None:  # not fingerprinted: reuse would hand tiled results to whole-image requests
+        version = request.app.state.models.version("skin_cancer")
+        result["diagnosis_id"] = record_diagnosis("skin_cancer", version, None, preds, SKIN_CLASS_NAMES, patient)
+    result["image_sha256"] = stored_digest(patient)
+    return result
+
+
 # ================================================================
 # 🧮 Malnutrition Risk Prediction
 # ================================================================
-@router.post("/malnutrition")
-def predict_malnutrition(request: Request, data: MalnutritionInput):
+@router.post("/malnutrition", dependencies=[Depends(admit)])
+def predict_malnutrition(
+    request: Request,
+    data: MalnutritionInput,
+    rep: Representation = Depends(response_representation),
+):
     """Predict malnutrition risk level based on anthropometric data."""
     model = request.app.state.models.get("malnutrition_model")
     scaler = request.app.state.models.get("malnutrition_scaler")
@@ -157,20 +542,201 @@ def predict_malnutrition(request: Request, data: MalnutritionInput):
         raise HTTPException(status_code=500, detail="Malnutrition model or scaler not loaded in app")
 
     try:
-        df = pd.DataFrame([data.dict()])
-        X_scaled = scaler.transform(df)
-        prediction = model.predict(X_scaled)[0]
+        # Plain float row in the scaler's fitted column order; the serving
+        # slots evaluate it with parity-checked NumPy evaluators (app/ml/tabular.py).
+        values = data.dict()
+        columns = getattr(scaler, "feature_names_in_", MALNUTRITION_FEATURES)
+        X = np.array([[values[name] for name in columns]], dtype="float64")
+        X_scaled = request.app.state.models.predict("malnutrition_scaler", X)
+        prediction = request.app.state.models.predict("malnutrition_model", X_scaled)[0]
 
-        return {
-            "input": data.dict(),
+        if rep.numeric:
+            return rep.render(numeric_envelope(
+                "malnutrition_model",
+                request.app.state.models.version("malnutrition_model"),
+                label=list(model.classes_).index(prediction),
+            ))
+        return rep.render({
+            "input": values,
             "predicted_risk_level": prediction,
             "description": MALNUTRITION_DESCRIPTIONS.get(prediction, "No description available.")
-        }
+        })
     except Exception as e:
         logger.error(f"Malnutrition prediction failed: {e}")
         raise HTTPException(status_code=500, detail="Prediction error")
 
 
+# ================================================================
+# 🔬 Multi-Disease Screening (fan-out)
+# ================================================================
+# Keras models read their input from the shared decode at their own
+# color mode / size; REGISTRY pipelines derive theirs from the same decode.
+SCREEN_MODELS = {
+    "brain_tumor": {
+        "mode": "L", "size": (256, 256), "format": format_brain_tumor,
+        "labels": [FRIENDLY_BRAIN_LABELS[label] for label in BRAIN_CLASS_LABELS],
+    },
+    "skin_cancer": {
+        "mode": "RGB", "size": (256, 256), "format": format_skin_cancer,
+        "labels": SKIN_CLASS_NAMES,
+    },
+}
+SCREEN_PIPELINES = ("tb", "malaria")
+SCREEN_TARGETS = tuple(SCREEN_MODELS) + SCREEN_PIPELINES
+
+
+def _screen_one(
+    request: Request, key: str, image: DecodedImage, rep: Representation, reuse: bool, escalate: bool,
+    patient: Optional[PatientUpload],
+) -> dict:
+    start = time.perf_counter()
+    staged = None
+    try:
+        if key in SCREEN_MODELS:
+            spec = SCREEN_MODELS[key]
+            if request.app.state.models.get(key) is None:
+                return {"error": f"{key} model not loaded in app"}
+            preds, duplicate, staged = predict_staged(request, key, image, reuse, escalate, patient)
+            result = numeric_result(request, key, preds, rep.top_k) if rep.numeric else spec["format"](preds)
+        else:
+            pipeline = registry.get_pipeline(key)
+            # pipelines report probs as {label: p} in pipeline.labels order
+            probs, duplicate = predict_or_reuse(
+                key, pipeline.version, image,
+                lambda: list(pipeline.infer({"image": image})["probs"].values()), pipeline.labels, reuse, patient,
+            )
+            if rep.numeric:
+                result = numeric_envelope(key, pipeline.version, **numeric_probs(probs, rep.top_k))
+            else:
+                probs = [float(p) for p in probs]
+                result = {
+                    "label": pipeline.labels[int(np.argmax(probs))],
+                    "probs": dict(zip(pipeline.labels, probs)),
+                    "meta": {"version": pipeline.version},
+                }
+        if duplicate:
+            result["near_duplicate"] = duplicate
+        if staged:
+            result["cascade"] = staged
+        if patient is not None:
+            result["diagnosis_id"] = patient.diagnosis_ids.get(key)
+    except Exception as e:
+        logger.error(f"Screening with {key} failed: {e}")
+        return {"error": "Prediction error"}
+    result["inference_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+@router.post("/screen", dependencies=[ADMIT_IMAGE], openapi_extra=UPLOAD_FORM)
+async def screen_image(
+    request: Request,
+    file: BufferedUpload = Depends(image_upload),
+    models: str = Query(",".join(SCREEN_TARGETS), description="Comma-separated model keys"),
+    reuse: bool = REUSE_QUERY,
+    escalate: bool = ESCALATE_QUERY,
+    patient: Optional[PatientUpload] = Depends(patient_upload),
+    rep: Representation = Depends(response_representation),
+):
+    """Check one image with several models: one shared decode, concurrent inference."""
+    keys = list(dict.fromkeys(k.strip() for k in models.split(",") if k.strip()))
+    unknown = [k for k in keys if k not in SCREEN_TARGETS]
+    if not keys or unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown or empty model selection {unknown}; choose from {list(SCREEN_TARGETS)}",
+        )
+
+    start = time.perf_counter()
+    image = await run_in_threadpool(decode_upload, file)
+    decode_ms = (time.perf_counter() - start) * 1000
+
+    outputs = await asyncio.gather(
+        *(run_in_threadpool(_screen_one, request, key, image, rep, reuse, escalate, patient) for key in keys)
+    )
+    return rep.render({
+        "models": keys,
+        "image_sha256": stored_digest(patient),
+        "results": dict(zip(keys, outputs)),
+        "timing": {
+            "decode_ms": round(decode_ms, 1),
+            "total_ms": round((time.perf_counter() - start) * 1000, 1),
+        },
+    })
+
+
+# ================================================================
+# 🔥 Saliency Explanations (Grad-CAM)
+# ================================================================
+def submit_explanation(request: Request, key: str, image: DecodedImage) -> dict:
+    """Queue a Grad-CAM job for a Keras model; returns immediately (status 'rejected' when the queue is full)."""
+    spec = SCREEN_MODELS[key]
+    model = request.app.state.models.get(key)
+    if model is None:
+        return {"explainable": False}
+    try:
+        job = explainer.submit(
+            digest=image.digest,
+            model_name=key,
+            version=request.app.state.models.version(key),
+            model=model,
+            input_batch=image.batch(spec["mode"], spec["size"]),
+            base_rgb=image.array("RGB", spec["size"]),
+            labels=spec["labels"],
+        )
+    except ExplanationQueueFull as e:
+        return {"explainable": True, "status": "rejected", "error": str(e)}
+    return job.describe(include_png=False)
+
+
+@router.post("/explain/{model_key}", status_code=202, dependencies=[ADMIT_IMAGE], openapi_extra=UPLOAD_FORM)
+async def request_explanation(request: Request, model_key: str, file: BufferedUpload = Depends(image_upload)):
+    """Queue a Grad-CAM heatmap for an image; poll /explanations/{id} for the result."""
+    if model_key not in SCREEN_MODELS:
+        raise HTTPException(status_code=404, detail=f"No explainable model '{model_key}'")
+    image = await run_in_threadpool(decode_upload, file)
+    out = submit_explanation(request, model_key, image)
+    if out.get("status") == "rejected":
+        raise HTTPException(status_code=503, detail=out["error"], headers={"Retry-After": "5"})
+    return out
+
+
+@router.get("/explanations/{explanation_id}")
+def get_explanation(explanation_id: str, format: str = Query("json", pattern="^(json|png)$")):
+    """Explanation status/result; format=png returns the overlay image itself."""
+    job = explainer.get(explanation_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired explanation")
+    if format == "png":
+        if job.status != "done":
+            raise HTTPException(status_code=409, detail=f"Explanation is {job.status}")
+        import base64
+        return Response(content=base64.b64decode(job.result["overlay_png"]), media_type="image/png")
+    return job.describe()
+
+
+# ================================================================
+# 🏷️ Label Catalogue (numeric responses)
+# ================================================================
+@router.get("/labels")
+def label_catalogue(request: Request):
+    """Index -> label names for every model, as used by format=numeric responses."""
+    models_state = request.app.state.models
+    catalogue = {
+        key: {"model_version": models_state.version(key), "labels": spec["labels"]}
+        for key, spec in SCREEN_MODELS.items()
+    }
+    model = models_state.get("malnutrition_model")
+    if model is not None:
+        catalogue["malnutrition_model"] = {
+            "model_version": models_state.version("malnutrition_model"),
+            "labels": [str(c) for c in model.classes_],
+        }
+    for key in SCREEN_PIPELINES:
+        pipeline = registry.get_pipeline(key)
+        catalogue[key] = {"model_version": pipeline.version, "labels": list(pipeline.labels)}
+    return {"schema": NUMERIC_SCHEMA, "models": catalogue}
+
+
 # ================================================================
 # 🔍 Health Check Endpoint
 # ================================================================
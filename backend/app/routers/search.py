@@ -0,0 +1,44 @@
+# ================================================================
+# File: app/routers/search.py
+# Description: Ranked, paginated search over patients and diagnoses
+#              (SQLite FTS5 trigram index, see app/db/search.py)
+# ================================================================
+
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.db import search
+from app.db.session import get_db
+
+router = APIRouter(prefix="/api/search", tags=["search"])
+
+
+@router.get("")
+def search_records(
+    q: str = Query(..., min_length=1, max_length=100, description="Name, label or disease text (substring match)"),
+    scope: str = Query("all", pattern="^(all|patients|diagnoses)$"),
+    disease: str = Query(None, description="Only diagnoses for this disease key"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10_000),
+    db: Session = Depends(get_db),
+):
+    """
+    Best matches first (bm25). Terms of 3+ characters match anywhere in
+    the text; shorter queries match patient name prefixes.
+    """
+    if not search.is_sqlite(db.get_bind()):
+        raise HTTPException(status_code=501, detail="Search requires the SQLite FTS5 index")
+
+    start = time.perf_counter()
+    conn = db.connection()
+    result = {"query": q, "scope": scope, "limit": limit, "offset": offset}
+    if scope in ("all", "patients"):
+        items, has_more = search.search_patients(conn, q, limit, offset)
+        result["patients"] = {"items": items, "has_more": has_more}
+    if scope in ("all", "diagnoses"):
+        items, has_more = search.search_diagnoses(conn, q, limit, offset, disease)
+        result["diagnoses"] = {"items": items, "has_more": has_more}
+    result["took_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return result
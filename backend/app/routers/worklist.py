@@ -0,0 +1,92 @@
+# ================================================================
+# File: app/routers/worklist.py
+# Description: Clinician worklist - latest status per patient and disease,
+#              highest risk or most recent first (patient_disease_status)
+# ================================================================
+
+import base64
+import json
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+
+from app.db.session import get_db
+from app.models.patient import Patient
+from app.models.patient_disease_status import PatientDiseaseStatus as S
+
+router = APIRouter(prefix="/api/worklist", tags=["worklist"])
+
+# Sort key columns, most significant first; each ordering ends in the primary
+# key so the keyset is unique and maps onto one of the table's indexes.
+ORDERINGS = {
+    "risk": (S.risk, S.diagnosed_at, S.patient_id, S.disease_key),
+    "recent": (S.diagnosed_at, S.patient_id, S.disease_key),
+}
+
+
+def encode_cursor(values) -> str:
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str, columns) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(values) != len(columns):
+            raise ValueError
+        return [datetime.fromisoformat(v) if c is S.diagnosed_at else v for c, v in zip(columns, values)]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("")
+def worklist(
+    disease: str = Query(None, description="Only this disease key"),
+    sort: str = Query("risk", pattern="^(risk|recent)$"),
+    min_risk: float = Query(None, ge=0.0, le=1.0),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str = Query(None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_db),
+):
+    """
+    One row per (patient, disease) with the latest label, confidence,
+    risk and model version. Keyset-paged: pass `next_cursor` back as
+    `cursor` for the next page.
+    """
+    columns = ORDERINGS[sort]
+    stmt = (
+        select(S, Patient.name)
+        .outerjoin(Patient, Patient.id == S.patient_id)
+        .order_by(*(c.desc() for c in columns))
+        .limit(limit + 1)
+    )
+    if disease:
+        stmt = stmt.where(S.disease_key == disease)
+    if min_risk is not None:
+        stmt = stmt.where(S.risk >= min_risk)
+    if cursor:
+        stmt = stmt.where(tuple_(*columns) < tuple_(*decode_cursor(cursor, columns)))
+
+    rows = db.execute(stmt).all()
+    page = rows[:limit]
+    items = [
+        {
+            "patient_id": s.patient_id,
+            "patient_name": name,
+            "disease_key": s.disease_key,
+            "label": s.label,
+            "confidence": s.confidence,
+            "risk": s.risk,
+            "model_version": s.model_version,
+            "diagnosis_id": s.diagnosis_id,
+            "diagnosed_at": s.diagnosed_at,
+        }
+        for s, name in page
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1][0]
+        next_cursor = encode_cursor([getattr(last, c.key) for c in columns])
+    return {"items": items, "next_cursor": next_cursor}
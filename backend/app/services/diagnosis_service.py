@@ -1,13 +1,15 @@
 from sqlalchemy.orm import Session
-from typing import Dict
+from typing import Dict, Optional
 from app.repositories.diagnosis_repo import save_diagnosis
 
-def persist_diagnosis(db: Session, patient_id: int, disease_key: str, result: Dict, version: str):
+def persist_diagnosis(db: Session, patient_id: int, disease_key: str, result: Dict, version: str,
+                      image_sha256: Optional[str] = None):
     return save_diagnosis(
         db,
         patient_id=patient_id,
         disease_key=disease_key,
         label=result.get("label"),
         probs=result.get("probs", {}),
-        version=version
+        version=version,
+        image_sha256=image_sha256,
     )
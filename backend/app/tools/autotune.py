@@ -0,0 +1,269 @@
+# ================================================================
+# File: app/tools/autotune.py
+# Description: Sweep threads / batch size / worker layout per model and
+#              write this host's tuning profile (app/core/tuning.py)
+#
+# TensorFlow's thread pools are fixed once it initializes, so every
+# layout is measured in fresh processes: P processes (uvicorn workers),
+# each with W threads calling the model concurrently (in-process model
+# executors, ADMISSION_CONCURRENCY) and TF intra/inter-op pools of T/I
+# threads. Every process of a trial reports ready after loading, then all
+# start measuring at the same instant and run each batch size for the
+# same time on synthetic inputs.
+#
+# Usage:
+#   python -m app.tools.autotune                       # MODEL_PATHS models, write profile
+#   python -m app.tools.autotune --model brain_tumor --seconds 3 --p99-budget-ms 300
+#   python -m app.tools.autotune --path "ml models/brain tumor/model.h5" --dry-run
+#   python -m app.tools.autotune --show                # print the profile for this host
+# ================================================================
+
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_BATCHES = "1,4,8,16,32"
+START_DELAY_S = 0.2   # lead time between the start signal and measuring
+
+
+# ================================================================
+# 🧪 Trial (runs in a child process)
+# ================================================================
+def run_trial(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    """Load the model with the given thread settings and measure each batch size."""
+    import warnings
+    warnings.filterwarnings("ignore")
+    from app.ml.serving import load_artifact, synthetic_input
+
+    path = cfg["path"]
+    if path.endswith(".h5"):
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(cfg["intra"])
+        tf.config.threading.set_inter_op_parallelism_threads(cfg["inter"])
+        from app.ml.compiled import CompiledKerasModel
+
+        model = load_artifact(path)
+        runner = CompiledKerasModel(model, buckets=cfg["batches"])
+    else:
+        from app.ml.serving import build_runner, run_model
+
+        model = load_artifact(path)
+        runner = build_runner(model) or (lambda x: run_model(model, x))
+    sample = synthetic_input(model)
+
+    # Report ready, then wait for the common start time from the parent so
+    # all processes of the trial overlap.
+    print("READY", flush=True)
+    start_at = float(sys.stdin.readline())
+    time.sleep(max(0.0, start_at - time.time()))
+    results = {}
+    for batch in cfg["batches"]:
+        x = np.repeat(sample, batch, axis=0)
+        latencies: List[List[float]] = [[] for _ in range(cfg["threads"])]
+        deadline = time.perf_counter() + cfg["seconds"]
+
+        def loop(out: List[float]) -> None:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                runner(x)
+                out.append((time.perf_counter() - start) * 1000)
+
+        threads = [threading.Thread(target=loop, args=(out,)) for out in latencies]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        flat = np.asarray([v for out in latencies for v in out] or [np.nan])
+        results[str(batch)] = {
+            "calls": int(np.isfinite(flat).sum()),
+            "items": int(np.isfinite(flat).sum()) * batch,
+            "p50_ms": round(float(np.nanpercentile(flat, 50)), 3),
+            "p99_ms": round(float(np.nanpercentile(flat, 99)), 3),
+        }
+    return results
+
+
+# ================================================================
+# 🔀 Sweep (parent)
+# ================================================================
+def layouts(cores: int, max_processes: int) -> List[Dict[str, int]]:
+    """(processes, threads per process, intra-op, inter-op) combinations that fit the cores."""
+    out = []
+    for procs in (p for p in (1, 2, 4, 8) if p <= max_processes and p <= cores):
+        per_proc = max(1, cores // procs)
+        for threads in (t for t in (1, 2, 4) if t <= per_proc):
+            intra_options = sorted({max(1, per_proc // threads), per_proc})
+            for intra, inter in itertools.product(intra_options, (1, 2)):
+                out.append({"processes": procs, "threads": threads, "intra": intra, "inter": inter})
+    return out
+
+
+def measure_layout(path: str, layout: Dict[str, int], batches: Sequence[int], seconds: float) -> Dict[str, Any]:
+    cfg = {**layout, "path": path, "batches": list(batches), "seconds": seconds}
+    procs = [
+        subprocess.Popen([sys.executable, "-m", "app.tools.autotune", "--trial", json.dumps(cfg)],
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        for _ in range(layout["processes"])
+    ]
+    for p in procs:  # wait until every process has loaded + traced its model
+        while True:
+            line = p.stdout.readline()
+            if not line or line.strip() == "READY":
+                break
+    start_at = time.time() + START_DELAY_S
+    outputs = []
+    for p in procs:
+        try:
+            p.stdin.write(f"{start_at}\n")
+            p.stdin.flush()
+        except BrokenPipeError:  # died while loading; reported below
+            pass
+    for p in procs:
+        out, _ = p.communicate()
+        lines = [line for line in out.splitlines() if line.startswith("{")]
+        if p.returncode != 0 or not lines:
+            raise RuntimeError(f"trial process failed (exit {p.returncode})")
+        outputs.append(json.loads(lines[-1]))
+
+    per_batch = {}
+    for batch in map(str, batches):
+        rows = [o[batch] for o in outputs]
+        per_batch[batch] = {
+            "items_per_s": round(sum(r["items"] for r in rows) / seconds, 1),
+            "p50_ms": max(r["p50_ms"] for r in rows),
+            "p99_ms": max(r["p99_ms"] for r in rows),  # worst process: conservative
+        }
+    return {"layout": layout, "batches": per_batch}
+
+
+def pick_best(trials: List[Dict[str, Any]], p99_budget_ms: float) -> Optional[Dict[str, Any]]:
+    """Highest throughput whose p99 fits the budget (lowest p99 if nothing fits)."""
+    candidates = [
+        {**t["layout"], "batch_size": int(b), **m}
+        for t in trials for b, m in t["batches"].items()
+    ]
+    if not candidates:
+        return None
+    fitting = [c for c in candidates if c["p99_ms"] <= p99_budget_ms]
+    if fitting:
+        return max(fitting, key=lambda c: (c["items_per_s"], -c["p99_ms"]))
+    return min(candidates, key=lambda c: c["p99_ms"])
+
+
+def server_profile(best: Dict[str, Dict[str, Any]], batches: Sequence[int]) -> Dict[str, Any]:
+    """
+    One process serves every model, so thread pools and layout follow the
+    most expensive model (lowest throughput); buckets cover every model's best batch.
+    """
+    heaviest = min(best.values(), key=lambda b: b["items_per_s"])
+    max_batch = max(b["batch_size"] for b in best.values())
+    return {
+        "intra_op_threads": heaviest["intra"],
+        "inter_op_threads": heaviest["inter"],
+        "admission_concurrency": heaviest["threads"],
+        "uvicorn_workers": heaviest["processes"],
+        "inference_batch_buckets": ",".join(str(b) for b in sorted(set(batches) | {1}) if b <= max_batch),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Autotune inference threads, batch size and workers for this host.")
+    parser.add_argument("--trial", help=argparse.SUPPRESS)
+    parser.add_argument("--model", action="append", help="MODEL_PATHS key (repeatable; default: all)")
+    parser.add_argument("--path", help="Tune a single model file instead of MODEL_PATHS")
+    parser.add_argument("--batches", default=DEFAULT_BATCHES)
+    parser.add_argument("--seconds", type=float, default=2.0, help="Measurement time per batch size")
+    parser.add_argument("--p99-budget-ms", type=float, default=250.0)
+    parser.add_argument("--max-processes", type=int, default=4)
+    parser.add_argument("--out", help="Profile path (default: tuning/<host>.json or TUNING_PROFILE)")
+    parser.add_argument("--dry-run", action="store_true", help="Print the profile without writing it")
+    parser.add_argument("--show", action="store_true", help="Print the current profile and exit")
+    args = parser.parse_args(argv)
+
+    if args.trial:
+        print(json.dumps(run_trial(json.loads(args.trial))))
+        return 0
+
+    from pathlib import Path
+    from app.core import tuning
+
+    out = Path(args.out) if args.out else tuning.profile_path()
+    if args.show:
+        profile = tuning.load_profile(out)
+        print(json.dumps(profile, indent=2) if profile else f"No tuning profile at {out}")
+        return 0
+
+    if args.path:
+        targets = {Path(args.path).stem: args.path}
+    else:
+        from app.main import MODEL_PATHS
+        keys = args.model or list(MODEL_PATHS)
+        # Scalers have nothing to tune; classifiers and Keras models do.
+        targets = {k: MODEL_PATHS[k] for k in keys if "scaler" not in k}
+    missing = [k for k, p in targets.items() if not os.path.exists(p)]
+    for k in missing:
+        print(f"⚠️ Skipping {k}: file not found at {targets.pop(k)}")
+    if not targets:
+        print("❌ Nothing to tune")
+        return 1
+
+    cores = os.cpu_count() or 1
+    batches = sorted({int(b) for b in args.batches.split(",") if b.strip()})
+    grid = layouts(cores, args.max_processes)
+    print(f"🎛️ Autotuning {list(targets)} on {cores} cores: {len(grid)} layouts x {len(batches)} batch sizes")
+
+    results, best = {}, {}
+    for name, path in targets.items():
+        trials = []
+        if path.endswith(".h5"):
+            sweep = grid
+        else:  # no TF thread pools: only the worker layout matters
+            sweep = list({(l["processes"], l["threads"]): l for l in grid if l["inter"] == 1}.values())
+        for layout in sweep:
+            try:
+                trial = measure_layout(path, layout, batches, args.seconds)
+            except RuntimeError as e:
+                print(f"   ❌ {name} {layout}: {e}")
+                continue
+            trials.append(trial)
+            top = max(trial["batches"].items(), key=lambda kv: kv[1]["items_per_s"])
+            print(f"   {name:<20} P={layout['processes']} W={layout['threads']} intra={layout['intra']} "
+                  f"inter={layout['inter']}  best batch {top[0]:>3}: {top[1]['items_per_s']:>9.1f}/s "
+                  f"p99 {top[1]['p99_ms']:.1f}ms")
+        results[name] = trials
+        choice = pick_best(trials, args.p99_budget_ms)
+        if choice:
+            best[name] = choice
+            print(f"✅ {name}: {choice}")
+
+    if not best:
+        print("❌ No trial succeeded")
+        return 1
+
+    profile = {
+        "host": tuning.host_key(),
+        "cpu_count": cores,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "p99_budget_ms": args.p99_budget_ms,
+        "server": server_profile(best, batches),
+        "models": best,
+        "trials": results,
+    }
+    if args.dry_run:
+        print(json.dumps({k: profile[k] for k in ("host", "server", "models")}, indent=2))
+        return 0
+    print(f"💾 Wrote {tuning.save_profile(profile, out)}")
+    print(f"   server: {profile['server']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
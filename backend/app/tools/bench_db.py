@@ -0,0 +1,536 @@
+# ================================================================
+# File: app/tools/bench_db.py
+# Description: Database-layer benchmark at production data volumes
+#
+#   generate  builds a scratch SQLite database (never local.db) with
+#             users, patients and 10^5..10^7 diagnoses: visits grow over
+#             --months and cluster in working hours on weekdays, a
+#             long tail of frequent patients, per-disease label mixes,
+#             model upgrades and shared images. The status, search and
+#             blob tables are derived from it, as the app would have
+#             them. --partitioned writes monthly partitions instead.
+#   run       times the real code paths against such a database: the
+#             dashboard readers, the login user lookup and
+#             save_diagnosis. Each path prints the EXPLAIN QUERY PLAN of
+#             every statement it executed, with full scans flagged.
+#   suite     generate (if missing) + run at each --scales size
+#   compare   p50 of two JSON results, non-zero exit on regressions
+#
+# Usage:
+#   python -m app.tools.bench_db generate --db bench/bench_1000000.db --diagnoses 1000000
+#   python -m app.tools.bench_db run --db bench/bench_1000000.db --json > run.json
+#   python -m app.tools.bench_db suite --scales 100000,1000000,10000000 --out bench/results.json
+#   python -m app.tools.bench_db compare baseline.json bench/results.json --tolerance 1.25
+# ================================================================
+
+import argparse
+import hashlib
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+from itertools import cycle
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# disease key: (share of diagnoses, {label: share})
+DISEASES: Dict[str, Tuple[float, Dict[str, float]]] = {
+    "skin_cancer": (0.35, {
+        "Nevus": 0.33, "Pigmented Benign Keratosis": 0.15, "Basal Cell Carcinoma": 0.11,
+        "Seborrheic Keratosis": 0.10, "Melanoma": 0.08, "Actinic Keratosis": 0.08,
+        "Squamous Cell Carcinoma": 0.06, "Dermatofibroma": 0.05, "Vascular Lesion": 0.04,
+    }),
+    "brain_tumor": (0.20, {"notumor": 0.55, "meningioma": 0.17, "glioma": 0.15, "pituitary": 0.13}),
+    "malnutrition": (0.20, {"Low": 0.50, "Moderate": 0.30, "High": 0.15, "Very High": 0.05}),
+    "tb": (0.15, {"negative": 0.80, "suspected": 0.12, "positive": 0.08}),
+    "malaria": (0.10, {"negative": 0.75, "suspected": 0.10, "positive": 0.15}),
+}
+IMAGE_DISEASES = {"skin_cancer", "brain_tumor", "tb", "malaria"}
+FIRST_NAMES = ["Amina", "John", "Grace", "Peter", "Mary", "David", "Fatima", "Samuel", "Ruth", "Joseph", "Esther",
+               "Daniel", "Sarah", "Michael", "Lucy", "Brian", "Faith", "Kevin", "Mercy", "James", "Aisha", "Paul",
+               "Janet", "George", "Naomi", "Victor", "Irene", "Moses", "Linda", "Isaac"]
+LAST_NAMES = ["Otieno", "Mwangi", "Wanjiru", "Kamau", "Achieng", "Mohamed", "Kiprop", "Njoroge", "Omondi", "Mutua",
+              "Chebet", "Wafula", "Kariuki", "Akinyi", "Hassan", "Smith", "Okafor", "Mensah", "Banda", "Phiri",
+              "Moyo", "Nkosi", "Abebe", "Tesfaye", "Kone", "Diallo", "Sow", "Ndlovu", "Okello", "Mugisha"]
+BENCH_PASSWORD = "bench-password"
+GROWTH = 2.0            # the last month has ~(1 + GROWTH) times the first month's visits
+UPGRADE_AT = 0.6        # share of the history after which diagnoses come from model v2
+IMAGE_SHARE = 0.9       # image diagnoses that kept their upload
+REUSED_IMAGE = 0.05     # ... of which re-submit an earlier image
+CHUNK = 200_000
+
+
+def bench_engine(path: Path) -> Any:
+    from sqlalchemy import create_engine
+
+    return create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+
+
+def partition_dir(path: Path) -> Path:
+    return path.with_name(path.stem + "_partitions")
+
+
+def use_partitions(path: Path, on: bool) -> None:
+    """Point the (mutable) settings at a benchmark database's partitions, or turn them off."""
+    from app.core.config import settings
+
+    settings.DIAGNOSIS_PARTITIONS = on
+    if on:
+        settings.DIAGNOSIS_PARTITION_DIR = str(partition_dir(path))
+
+
+# ================================================================
+# 🏭 Generate
+# ================================================================
+def visit_times(rng: np.random.Generator, n: int, months: int, now: datetime) -> np.ndarray:
+    """Sorted datetime64[us]: linear growth over the span, weekday working hours."""
+    span_days = int(months * 30.44)
+    u = rng.random(n)
+    x = (np.sqrt(1 + 2 * GROWTH * u * (1 + GROWTH / 2)) - 1) / GROWTH   # inverse CDF of 1 + GROWTH * x
+    days = np.datetime64((now - timedelta(days=span_days)).date(), "D") + (x * span_days).astype("timedelta64[D]")
+    dow = (days.astype("int64") + 3) % 7                                 # Monday = 0
+    weekend = (dow >= 5) & (rng.random(n) < 0.7)                         # most move to the Friday before
+    days = np.where(weekend, days - (dow - 4).astype("timedelta64[D]"), days)
+    seconds = np.clip(rng.normal(13 * 3600, 3 * 3600, n), 0, 86399.999)
+    stamps = days.astype("datetime64[us]") + (seconds * 1e6).astype("timedelta64[us]")
+    return np.sort(np.minimum(stamps, np.datetime64(now, "us")))
+
+
+def image_digest(seed: int, row: int) -> str:
+    return hashlib.sha256(f"bench:{seed}:{row}".encode()).hexdigest()
+
+
+def generate(path: Path, n_users: int, n_patients: int, n_diagnoses: int, months: int, seed: int,
+             partitioned: bool, search_index: bool) -> Dict[str, Any]:
+    import bcrypt
+    from sqlalchemy import text
+    from app.db import partitions
+    from app.db.blobstore import ensure_blob_schema, recount
+    from app.db.search import ensure_search_index
+    from app.db.session import Base
+    from app.models import user, patient, diagnosis, patient_disease_status, image_fingerprint, blob, diagnosis_partition  # noqa: F401
+    from app.repositories.status_repo import status_row
+
+    start = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    now = datetime.utcnow()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    use_partitions(path, partitioned)
+    engine = bench_engine(path)
+    Base.metadata.create_all(engine)
+    diagnoses_table = diagnosis.Diagnosis.__table__
+
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA synchronous=OFF")
+        conn.exec_driver_sql("PRAGMA journal_mode=MEMORY")
+
+        # ---- users: one shared hash (cheap rounds), so every account can log in ----
+        hashed = bcrypt.hashpw(BENCH_PASSWORD.encode(), bcrypt.gensalt(rounds=4)).decode()
+        for lo in range(0, n_users, CHUNK):
+            conn.exec_driver_sql(
+                "INSERT INTO users (full_name, email, hashed_password, created_at) VALUES (?, ?, ?, ?)",
+                [(f"{FIRST_NAMES[i % 30]} {LAST_NAMES[(i // 30) % 30]}",
+                  f"{FIRST_NAMES[i % 30].lower()}.{LAST_NAMES[(i // 30) % 30].lower()}{i}@clinic{i % 40}.example",
+                  hashed, now.strftime("%Y-%m-%d %H:%M:%S")) for i in range(lo, min(lo + CHUNK, n_users))],
+            )
+        # ---- patients: repeated names, as in any real register ----
+        first = rng.integers(0, len(FIRST_NAMES), n_patients)
+        last = rng.integers(0, len(LAST_NAMES), n_patients)
+        ages = np.clip(rng.normal(42, 20, n_patients), 0, 99).astype(int)
+        sexes = rng.choice(["F", "M"], n_patients)
+        for lo in range(0, n_patients, CHUNK):
+            conn.exec_driver_sql(
+                "INSERT INTO patients (name, demographics) VALUES (?, ?)",
+                [(f"{FIRST_NAMES[first[i]]} {LAST_NAMES[last[i]]}", json.dumps({"age": int(ages[i]), "sex": sexes[i]}))
+                 for i in range(lo, min(lo + CHUNK, n_patients))],
+            )
+        conn.commit()
+
+        # ---- diagnoses: whole columns up front, written in chunks ----
+        keys = list(DISEASES)
+        stamps = visit_times(rng, n_diagnoses, months, now)
+        weights = rng.lognormal(0.0, 1.0, n_patients)   # a long tail of frequently seen patients
+        patient_ids = rng.choice(n_patients, n_diagnoses, p=weights / weights.sum()) + 1
+        disease = rng.choice(len(keys), n_diagnoses, p=[DISEASES[k][0] for k in keys])
+        label = np.zeros(n_diagnoses, dtype=np.int16)
+        for d, key in enumerate(keys):
+            mask = disease == d
+            shares = list(DISEASES[key][1].values())
+            label[mask] = rng.choice(len(shares), int(mask.sum()), p=shares)
+        confidence = np.clip(rng.beta(8, 2, n_diagnoses), 0.34, 0.999).round(4)
+        upgraded = stamps >= stamps[int(n_diagnoses * UPGRADE_AT)] if n_diagnoses else stamps
+        has_image = np.isin(disease, [keys.index(k) for k in IMAGE_DISEASES]) & (rng.random(n_diagnoses) < IMAGE_SHARE)
+        reused = has_image & (rng.random(n_diagnoses) < REUSED_IMAGE)
+        image_source = np.where(reused, (rng.random(n_diagnoses) * np.arange(n_diagnoses)).astype(np.int64),
+                                np.arange(n_diagnoses))
+        names = [list(DISEASES[k][1]) for k in keys]
+
+        def row_values(i: int) -> Tuple[str, str, str, dict]:
+            labels = names[disease[i]]
+            own = labels[label[i]]
+            other = labels[1] if label[i] == 0 else labels[0]
+            probs = {own: float(confidence[i]), other: round(1.0 - float(confidence[i]), 4)}
+            return keys[disease[i]], own, ("v2" if upgraded[i] else "v1"), probs
+
+        if not partitioned:
+            # secondary indexes are rebuilt once after the load instead of per row
+            for index in diagnoses_table.indexes:
+                conn.exec_driver_sql(f"DROP INDEX IF EXISTS {index.name}")
+        ids = np.zeros(n_diagnoses, dtype=np.int64)
+        month_next: Dict[str, int] = {}
+        month_engines: Dict[str, Any] = {}
+        insert_sql = ("INSERT INTO diagnoses (id, patient_id, disease_key, label, probs_json, model_version, "
+                      "created_at, image_sha256) VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+        for lo in range(0, n_diagnoses, CHUNK):
+            hi = min(lo + CHUNK, n_diagnoses)
+            texts = np.char.replace(np.datetime_as_string(stamps[lo:hi], unit="us"), "T", " ")
+            batches: Dict[Optional[str], List[tuple]] = {}
+            for i in range(lo, hi):
+                key, own, version, probs = row_values(i)
+                created = str(texts[i - lo])
+                month = created[:7].replace("-", "_") if partitioned else None
+                if partitioned:
+                    month_next[month] = month_next.get(month, partitions.id_base(month)) + 1
+                    ids[i] = month_next[month]
+                else:
+                    ids[i] = i + 1
+                digest = image_digest(seed, int(image_source[i])) if has_image[i] else None
+                batches.setdefault(month, []).append(
+                    (int(ids[i]), int(patient_ids[i]), key, own, json.dumps(probs), version, created, digest)
+                )
+            for month, rows in batches.items():
+                if month is None:
+                    conn.exec_driver_sql(insert_sql, rows)
+                    continue
+                if month not in month_engines:
+                    month_engines[month] = bench_engine(partitions.partition_path(month))
+                    partitions.partition_path(month).parent.mkdir(parents=True, exist_ok=True)
+                    partitions.table(None).create(month_engines[month], checkfirst=True)
+                with month_engines[month].begin() as mc:
+                    mc.exec_driver_sql(insert_sql, rows)
+            conn.commit()
+            print(f"   {hi}/{n_diagnoses} diagnoses")
+        if not partitioned:
+            for index in diagnoses_table.indexes:
+                index.create(conn)
+        for month, month_engine in month_engines.items():
+            month_engine.dispose()
+            conn.execute(text("INSERT OR IGNORE INTO diagnosis_partitions (key, state, path) VALUES (:k, 'live', :p)"),
+                         {"k": month, "p": str(partitions.partition_path(month))})
+
+        # ---- latest status per (patient, disease): the last occurrence in time order ----
+        pair = patient_ids.astype(np.int64) * len(keys) + disease
+        _, last_rev = np.unique(pair[::-1], return_index=True)
+        latest = n_diagnoses - 1 - last_rev
+        for lo in range(0, len(latest), CHUNK):
+            rows = []
+            for i in latest[lo:lo + CHUNK]:
+                key, own, version, probs = row_values(i)
+                rows.append(status_row(int(ids[i]), int(patient_ids[i]), key, own, probs, version,
+                                       stamps[i].astype(datetime)))
+            conn.execute(text(
+                """
+                INSERT INTO patient_disease_status
+                    (patient_id, disease_key, diagnosis_id, label, confidence, risk, model_version, diagnosed_at)
+                VALUES (:patient_id, :disease_key, :diagnosis_id, :label, :confidence, :risk, :model_version,
+                        :diagnosed_at)
+                """
+            ), rows)
+        conn.commit()
+
+    # ---- derived tables, as init_db and the partition tools would leave them ----
+    ensure_blob_schema(engine)
+    if search_index:
+        ensure_search_index(engine)
+        if partitioned:
+            with engine.connect() as conn:
+                for month in month_engines:
+                    conn.exec_driver_sql("ATTACH DATABASE ? AS bench_month", (str(partitions.partition_path(month)),))
+                    conn.exec_driver_sql(
+                        """
+                        INSERT INTO diagnoses_fts(rowid, patient_name, label, disease_key)
+                        SELECT d.id, COALESCE(p.name, ''), d.label, d.disease_key
+                        FROM bench_month.diagnoses d LEFT JOIN patients p ON p.id = d.patient_id
+                        """
+                    )
+                    conn.exec_driver_sql(
+                        "INSERT INTO diagnoses_fts_patients(id, patient_id) SELECT id, patient_id FROM bench_month.diagnoses"
+                    )
+                    conn.commit()
+                    conn.exec_driver_sql("DETACH DATABASE bench_month")
+    with engine.begin() as conn:
+        recount(conn)
+    if partitioned:
+        from app.tools.partitions import seal
+        seal(engine, dry_run=False)
+    engine.dispose()
+    return {
+        "db": str(path),
+        "users": n_users,
+        "patients": n_patients,
+        "diagnoses": n_diagnoses,
+        "statuses": int(len(latest)),
+        "months": months,
+        "partitioned": partitioned,
+        "elapsed_s": round(time.perf_counter() - start, 1),
+        "size_mb": round(sum(p.stat().st_size for p in [path, *partition_dir(path).glob("*.db")]) / (1024 * 1024), 1),
+    }
+
+
+# ================================================================
+# ⏱️ Run
+# ================================================================
+def capture(engine: Any, fn: Callable[[], Any]) -> List[Tuple[str, Any]]:
+    """Statements (with parameters) `fn` executes on `engine`."""
+    from sqlalchemy import event
+
+    seen: List[Tuple[str, Any]] = []
+
+    def hook(conn, cursor, statement, parameters, context, executemany):
+        seen.append((statement, parameters[0] if executemany else parameters))
+
+    event.listen(engine, "before_cursor_execute", hook)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", hook)
+    return seen
+
+
+def query_plans(engine: Any, statements: List[Tuple[str, Any]]) -> List[Dict[str, Any]]:
+    """EXPLAIN QUERY PLAN per distinct statement; SCAN lines over real tables are full scans."""
+    plans, done = [], set()
+    with engine.connect() as conn:
+        for sql, params in statements:
+            verb = sql.lstrip().split(None, 1)[0].upper()
+            if sql in done or verb not in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+                continue
+            done.add(sql)
+            detail = [row[3] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, params)]
+            plans.append({
+                "sql": " ".join(sql.split()),
+                "plan": detail,
+                "full_scans": [d for d in detail if d.startswith("SCAN ") and "VIRTUAL TABLE" not in d
+                               and "CONSTANT ROW" not in d],
+            })
+        conn.rollback()
+    return plans
+
+
+def run(path: Path, runs: int, warmup: int, partitioned: bool, seed: int = 0) -> Dict[str, Any]:
+    from sqlalchemy import func, select
+    from sqlalchemy.orm import sessionmaker
+    from app.db import partitions
+    from app.models.patient import Patient
+    from app.models.user import User
+    from app.repositories.diagnosis_repo import count_diagnoses, save_diagnosis
+    from app.routers.auth import get_user_by_email
+    from app.routers.dashboard import diagnoses_recent, stats_summary
+    from app.tools.bench_inference import measure
+
+    if not path.is_file():
+        raise SystemExit(f"❌ {path} not found; create it with: python -m app.tools.bench_db generate --db {path}")
+    use_partitions(path, partitioned)
+    engine = bench_engine(path)
+    if partitioned:
+        partitions.install(engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    rng = np.random.default_rng(seed)
+
+    with Session() as db:
+        scale = {
+            "users": db.execute(select(func.count()).select_from(User)).scalar(),
+            "patients": db.execute(select(func.count()).select_from(Patient)).scalar(),
+            "diagnoses": count_diagnoses(db),
+        }
+        emails = cycle(db.execute(select(User.email).order_by(func.random()).limit(256)).scalars().all()
+                       or ["nobody@example.invalid"])
+
+    def write(db):
+        return save_diagnosis(db, patient_id=int(rng.integers(1, scale["patients"] + 1)), disease_key="tb",
+                              label="negative", probs={"negative": 0.93, "positive": 0.07}, version="bench").id
+
+    cases: Dict[str, Callable[[Any], Any]] = {
+        "dashboard.stats_summary[today]": lambda db: stats_summary(window="today", db=db),
+        "dashboard.stats_summary[7d]": lambda db: stats_summary(window="7d", db=db),
+        "dashboard.stats_summary[all]": lambda db: stats_summary(window="all", db=db),
+        "dashboard.diagnoses_recent": lambda db: len(diagnoses_recent(limit=20, db=db)["items"]),
+        "auth.user_lookup": lambda db: get_user_by_email(db, next(emails)) is not None,
+        "auth.user_lookup[miss]": lambda db: get_user_by_email(db, "nobody@example.invalid") is not None,
+        "write.save_diagnosis": write,
+    }
+    results: Dict[str, Any] = {}
+    for name, case in cases.items():
+        def call(_=None, case=case):
+            with Session() as db:
+                return case(db)
+
+        timing = measure(call, None, runs, warmup)
+        holder: Dict[str, Any] = {}
+        statements = capture(engine, lambda: holder.setdefault("result", call()))
+        results[name] = {**timing, "result": holder["result"], "plans": query_plans(engine, statements)}
+        print(f"   {name}: p50 {timing['p50_ms']} ms", file=sys.stderr)
+
+    import sqlite3
+    engine.dispose()
+    return {
+        "label": path.stem + ("_partitioned" if partitioned else ""),
+        "db": str(path),
+        "partitioned": partitioned,
+        "sqlite": sqlite3.sqlite_version,
+        "runs": runs,
+        "scale": scale,
+        "paths": results,
+    }
+
+
+# ================================================================
+# 📊 Report & Compare
+# ================================================================
+def print_run(result: Dict[str, Any], plans: bool = True) -> None:
+    scale = result["scale"]
+    print(f"DB benchmark {result['db']}: {scale['diagnoses']:,} diagnoses, {scale['patients']:,} patients, "
+          f"{scale['users']:,} users (partitioned: {'yes' if result['partitioned'] else 'no'})")
+    print(f"{'path':<34} {'mean':>10} {'p50':>10} {'p99':>10}  result")
+    for name, r in result["paths"].items():
+        print(f"{name:<34} {r['mean_ms']:>10.3f} {r['p50_ms']:>10.3f} {r['p99_ms']:>10.3f}  {r['result']}")
+    if not plans:
+        return
+    print()
+    for name, r in result["paths"].items():
+        print(f"📋 {name}")
+        for plan in r["plans"]:
+            print(f"   {plan['sql'][:160]}")
+            for line in plan["plan"]:
+                print(f"      {'⚠️ ' if line in plan['full_scans'] else ''}{line}")
+
+
+def flatten(doc: Dict[str, Any]) -> Dict[Tuple[str, str], float]:
+    """(run label, path) -> p50 for a single run or a suite."""
+    runs = doc.get("runs_by_scale") or [doc]
+    return {(r["label"], name): p["p50_ms"] for r in runs for name, p in r["paths"].items()}
+
+
+def compare(base: Dict[str, Any], new: Dict[str, Any], tolerance: float, min_ms: float) -> List[Dict[str, Any]]:
+    old, cur = flatten(base), flatten(new)
+    rows = []
+    for key in sorted(old.keys() & cur.keys()):
+        ratio = cur[key] / old[key] if old[key] else float("inf")
+        rows.append({
+            "label": key[0], "path": key[1], "base_p50_ms": old[key], "p50_ms": cur[key], "ratio": round(ratio, 2),
+            "regressed": ratio > tolerance and cur[key] - old[key] > min_ms,
+        })
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the database layer at production data volumes.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def data_args(p, db_required: bool) -> None:
+        if db_required:
+            p.add_argument("--db", required=True, help="Benchmark SQLite file (created; never local.db)")
+        p.add_argument("--patients", type=int, help="Default: diagnoses / 8")
+        p.add_argument("--users", type=int, help="Default: max(100, diagnoses / 100)")
+        p.add_argument("--months", type=int, default=36, help="History span")
+        p.add_argument("--seed", type=int, default=0)
+        p.add_argument("--partitioned", action="store_true", help="Monthly partitions (app/db/partitions.py)")
+        p.add_argument("--no-search-index", action="store_true", help="Skip the FTS tables (faster to build)")
+
+    gen = sub.add_parser("generate", help="Build a synthetic database")
+    data_args(gen, db_required=True)
+    gen.add_argument("--diagnoses", type=int, default=100_000)
+    gen.add_argument("--force", action="store_true", help="Replace an existing file")
+
+    for name, help_text in (("run", "Time the DB paths against one database"),
+                            ("suite", "Generate (if missing) and run at several scales")):
+        p = sub.add_parser(name, help=help_text)
+        if name == "run":
+            p.add_argument("--db", required=True)
+            p.add_argument("--partitioned", action="store_true", help="The database was generated --partitioned")
+        else:
+            data_args(p, db_required=False)
+            p.add_argument("--scales", default="100000,1000000", help="Comma-separated diagnosis counts")
+            p.add_argument("--dir", default="bench", help="Where the databases live")
+            p.add_argument("--out", help="Write the JSON results here")
+        p.add_argument("--runs", type=int, default=50)
+        p.add_argument("--warmup", type=int, default=5)
+        p.add_argument("--no-plans", action="store_true", help="Omit query plans from the text report")
+        p.add_argument("--json", action="store_true", help="Print results as JSON only")
+
+    cmp_ = sub.add_parser("compare", help="Compare two JSON results (exit 1 on regressions)")
+    cmp_.add_argument("baseline")
+    cmp_.add_argument("current")
+    cmp_.add_argument("--tolerance", type=float, default=1.25, help="Allowed p50 ratio current / baseline")
+    cmp_.add_argument("--min-ms", type=float, default=0.5, help="Ignore slowdowns smaller than this")
+    cmp_.add_argument("--json", action="store_true", help="Print results as JSON only")
+    args = parser.parse_args(argv)
+
+    def sizes(n: int) -> Dict[str, int]:
+        return {"n_diagnoses": n, "n_patients": args.patients or max(1, n // 8),
+                "n_users": args.users or max(100, n // 100)}
+
+    def build(path: Path, n: int) -> Dict[str, Any]:
+        if path.resolve() == Path("local.db").resolve():
+            raise SystemExit("❌ Refusing to overwrite the application database")
+        if path.exists():
+            if args.command == "generate" and not args.force:
+                raise SystemExit(f"❌ {path} exists; pass --force to replace it")
+            path.unlink()
+            for month in partition_dir(path).glob("diagnoses_*.db"):
+                month.unlink()
+        print(f"🏭 Generating {n:,} diagnoses into {path}", file=sys.stderr)
+        return generate(path, months=args.months, seed=args.seed, partitioned=args.partitioned,
+                        search_index=not args.no_search_index, **sizes(n))
+
+    if args.command == "generate":
+        summary = build(Path(args.db), args.diagnoses)
+        print(json.dumps(summary, indent=2))
+        return 0
+
+    if args.command == "compare":
+        rows = compare(json.loads(Path(args.baseline).read_text()), json.loads(Path(args.current).read_text()),
+                       args.tolerance, args.min_ms)
+        regressed = [r for r in rows if r["regressed"]]
+        if args.json:
+            print(json.dumps({"paths": rows, "regressions": len(regressed)}, indent=2))
+        else:
+            print(f"{'run':<28} {'path':<34} {'base':>9} {'now':>9} {'ratio':>6}")
+            for r in rows:
+                print(f"{r['label']:<28} {r['path']:<34} {r['base_p50_ms']:>9.3f} {r['p50_ms']:>9.3f} "
+                      f"{r['ratio']:>5.2f}x{'  ❌' if r['regressed'] else ''}")
+            print(f"{'❌' if regressed else '✅'} {len(regressed)} regressions beyond {args.tolerance}x")
+        return 1 if regressed else 0
+
+    if args.command == "run":
+        result = run(Path(args.db), args.runs, args.warmup, args.partitioned)
+        if args.json:
+            print(json.dumps(result, indent=2, default=str))
+        else:
+            print_run(result, plans=not args.no_plans)
+        return 0
+
+    suite: Dict[str, Any] = {"generated_at": datetime.utcnow().isoformat(), "runs_by_scale": []}
+    for n in [int(float(s)) for s in args.scales.split(",")]:
+        path = Path(args.dir) / f"bench_{n}{'_partitioned' if args.partitioned else ''}.db"
+        if not path.exists():
+            suite.setdefault("generated", []).append(build(path, n))
+        suite["runs_by_scale"].append(run(path, args.runs, args.warmup, args.partitioned, args.seed))
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(json.dumps(suite, indent=2, default=str))
+    if args.json:
+        print(json.dumps(suite, indent=2, default=str))
+        return 0
+    for result in suite["runs_by_scale"]:
+        print_run(result, plans=not args.no_plans)
+        print()
+    if args.out:
+        print(f"✅ Results written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+# ================================================================
+# File: app/tools/bench_inference.py
+# Description: Per-request latency of model.predict vs the compiled path
+#
+# Usage:
+#   python -m app.tools.bench_inference --model brain_tumor
+#   python -m app.tools.bench_inference --path "ml models/brain tumor/model.h5" --runs 500 --batch 1
+# ================================================================
+
+import argparse
+import json
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+def measure(fn: Callable[[np.ndarray], object], x: np.ndarray, runs: int, warmup: int = 5) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn(x)
+    timings: List[float] = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(x)
+        timings.append((time.perf_counter() - start) * 1000)
+    arr = np.asarray(timings)
+    return {
+        "mean_ms": round(float(arr.mean()), 3),
+        "p50_ms": round(float(np.percentile(arr, 50)), 3),
+        "p99_ms": round(float(np.percentile(arr, 99)), 3),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark Keras model.predict vs compiled inference.")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--model", help="Key in app.main.MODEL_PATHS (e.g. brain_tumor)")
+    group.add_argument("--path", help="Path to a Keras .h5 model")
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=1, help="Samples per request")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON only")
+    args = parser.parse_args(argv)
+
+    if args.model:
+        from app.main import MODEL_PATHS
+        path = MODEL_PATHS[args.model]
+    else:
+        path = args.path
+
+    from app.core.config import settings
+    from app.ml.compiled import CompiledKerasModel, parse_buckets
+    from app.ml.serving import load_artifact
+
+    model = load_artifact(path)
+    runner = CompiledKerasModel(
+        model, parse_buckets(settings.INFERENCE_BATCH_BUCKETS), jit_compile=settings.XLA_JIT_COMPILE
+    )
+    x = np.random.rand(args.batch, *runner.sample_shape).astype("float32")
+
+    max_diff = float(np.max(np.abs(model.predict(x, verbose=0) - runner(x))))
+    results = {
+        "path": path,
+        "batch": args.batch,
+        "runs": args.runs,
+        "trace_ms": runner.trace_ms,
+        "predict": measure(lambda v: model.predict(v, verbose=0), x, args.runs),
+        "compiled": measure(runner, x, args.runs),
+        "max_abs_diff": max_diff,
+    }
+    results["speedup_p50"] = round(results["predict"]["p50_ms"] / max(results["compiled"]["p50_ms"], 1e-9), 2)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print(f"Model: {path}  (batch={args.batch}, runs={args.runs})")
+    print(f"{'path':<12} {'mean':>10} {'p50':>10} {'p99':>10}")
+    for name in ("predict", "compiled"):
+        r = results[name]
+        print(f"{name:<12} {r['mean_ms']:>8.2f}ms {r['p50_ms']:>8.2f}ms {r['p99_ms']:>8.2f}ms")
+    print(f"Speedup (p50): {results['speedup_p50']}x   max |Δ| vs predict: {max_diff:.2e}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
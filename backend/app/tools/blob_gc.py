@@ -0,0 +1,192 @@
+# ================================================================
+# File: app/tools/blob_gc.py
+# Description: Garbage collection and compaction of the blob store
+#
+# 1. Re-derives every blobs.refcount from diagnoses, including monthly
+#    partitions and their archives (repairs drift from bulk edits or
+#    databases without the refcount triggers).
+# 2. Deletes blobs no diagnosis references once they are older than
+#    BLOB_GC_GRACE_HOURS. The grace period is the window in which a
+#    client can still save a diagnosis for a recent upload.
+# 3. Compacts the tree: stale temp files, orphan files with no row and
+#    empty shard directories are removed; rows whose file is missing are
+#    reported. With --verify, every file is re-hashed against its name.
+#
+# Usage:
+#   python -m app.tools.blob_gc --dry-run
+#   python -m app.tools.blob_gc --grace-hours 72 --verify --json
+# ================================================================
+
+import argparse
+import contextlib
+import hashlib
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+TMP_MAX_AGE_S = 3600
+
+
+def collect(conn: Any, cutoff: datetime, dry_run: bool) -> List[str]:
+    """
+    Delete unreferenced rows older than cutoff; returns the digests whose
+    files may go. blob_refs (reference_counts) covers partitioned months.
+    """
+    from sqlalchemy import text
+
+    candidates = [row[0] for row in conn.execute(text(
+        """
+        SELECT sha256 FROM blobs b
+        WHERE refcount <= 0 AND created_at < :cutoff
+          AND NOT EXISTS (SELECT 1 FROM blob_refs r WHERE r.sha256 = b.sha256)
+        """
+    ), {"cutoff": cutoff.strftime("%Y-%m-%d %H:%M:%S.%f")})]
+    if dry_run:
+        return candidates
+    deleted = []
+    for sha in candidates:
+        # re-checked at delete time: a diagnosis may have referenced it since
+        result = conn.execute(text(
+            """
+            DELETE FROM blobs WHERE sha256 = :sha AND refcount <= 0 AND created_at < :cutoff
+              AND NOT EXISTS (SELECT 1 FROM diagnoses d WHERE d.image_sha256 = :sha)
+            """
+        ), {"sha": sha, "cutoff": cutoff.strftime("%Y-%m-%d %H:%M:%S.%f")})
+        if result.rowcount:
+            deleted.append(sha)
+    return deleted
+
+
+def compact(store: Any, conn: Any, grace_s: float, dry_run: bool, verify: bool) -> Dict[str, Any]:
+    """Walk the shard tree once, one directory (and one indexed range query) at a time."""
+    from sqlalchemy import text
+
+    now = time.time()
+    report: Dict[str, Any] = {"tmp_removed": 0, "orphans_removed": 0, "dirs_removed": 0,
+                              "missing": [], "corrupt": [], "files": 0, "bytes": 0}
+    tmp_dir = store.root / "tmp"
+    if tmp_dir.is_dir():
+        for tmp in tmp_dir.iterdir():
+            if now - tmp.stat().st_mtime > TMP_MAX_AGE_S:
+                report["tmp_removed"] += 1
+                if not dry_run:
+                    tmp.unlink(missing_ok=True)
+
+    for outer in sorted(p for p in store.root.glob("[0-9a-f][0-9a-f]") if p.is_dir()):
+        for leaf in sorted(p for p in outer.iterdir() if p.is_dir()):
+            prefix = outer.name + leaf.name
+            known = {row[0] for row in conn.execute(text(
+                "SELECT sha256 FROM blobs WHERE sha256 >= :lo AND sha256 < :hi"
+            ), {"lo": prefix, "hi": prefix + "g"})}
+            on_disk = set()
+            for f in leaf.iterdir():
+                on_disk.add(f.name)
+                stat = f.stat()
+                if f.name not in known:
+                    # no row: a write whose row has not landed yet, or left behind by GC/crash
+                    if now - stat.st_mtime > grace_s:
+                        report["orphans_removed"] += 1
+                        if not dry_run:
+                            f.unlink(missing_ok=True)
+                    continue
+                report["files"] += 1
+                report["bytes"] += stat.st_size
+                if verify and stat.st_size:
+                    with store.open(f.name) as mm:
+                        if hashlib.sha256(mm).hexdigest() != f.name:
+                            report["corrupt"].append(f.name)
+            report["missing"].extend(sorted(
+                sha for sha in known - on_disk
+                if conn.execute(text("SELECT size FROM blobs WHERE sha256 = :s"), {"s": sha}).scalar() is not None
+            ))
+            if not dry_run and not any(leaf.iterdir()):
+                leaf.rmdir()
+                report["dirs_removed"] += 1
+        if not dry_run and not any(outer.iterdir()):
+            outer.rmdir()
+            report["dirs_removed"] += 1
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from app.core.config import settings
+
+    parser = argparse.ArgumentParser(description="Delete unreferenced blobs and compact the blob store.")
+    parser.add_argument("--grace-hours", type=float, default=settings.BLOB_GC_GRACE_HOURS)
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be removed")
+    parser.add_argument("--verify", action="store_true", help="Re-hash every stored file")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON only")
+    args = parser.parse_args(argv)
+
+    from sqlalchemy import text
+
+    from app.db.blobstore import blobs, recount, reference_counts
+    from app.db.init_db import init_db
+    from app.db.session import engine
+
+    with contextlib.redirect_stdout(sys.stderr if args.json else sys.stdout):
+        init_db()  # blobs table, diagnoses.image_sha256 and triggers on older databases
+    start = time.perf_counter()
+    cutoff = datetime.utcnow() - timedelta(hours=args.grace_hours)
+
+    with engine.begin() as conn:
+        if args.dry_run:
+            reference_counts(conn)
+            fixed = 0
+        else:
+            fixed = recount(conn)
+        deleted = collect(conn, cutoff, args.dry_run)
+    # rows are gone (committed) before files: a crash here leaves orphans, never dangling rows
+    freed = revived = 0
+    with engine.connect() as conn:
+        for sha in deleted:
+            path = blobs.path(sha)
+            if not path.is_file():
+                continue
+            # a server may have re-recorded the digest since the delete (put_async of a
+            # re-upload, then a diagnosis): its row now owns the file
+            if not args.dry_run and conn.execute(
+                text("SELECT 1 FROM blobs WHERE sha256 = :s"), {"s": sha}
+            ).first() is not None:
+                revived += 1
+                continue
+            freed += path.stat().st_size
+            if not args.dry_run:
+                path.unlink()
+    with engine.connect() as conn:
+        tree = compact(blobs, conn, args.grace_hours * 3600, args.dry_run, args.verify)
+
+    results = {
+        "dry_run": args.dry_run,
+        "root": str(blobs.root),
+        "grace_hours": args.grace_hours,
+        "refcounts_fixed": fixed,
+        "unreferenced_deleted": len(deleted) - revived,
+        "revived": revived,
+        "freed_mb": round(freed / (1024 * 1024), 2),
+        **tree,
+        "elapsed_s": round(time.perf_counter() - start, 2),
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    verb = "would delete" if args.dry_run else "deleted"
+    print(f"🗃️ Blob store {blobs.root}: {tree['files']} files, {tree['bytes'] / (1024 * 1024):.1f} MB")
+    print(f"   refcounts fixed: {fixed}")
+    print(f"   unreferenced > {args.grace_hours:g} h: {verb} {results['unreferenced_deleted']} ({results['freed_mb']} MB)"
+          + (f", {revived} kept: re-recorded meanwhile" if revived else ""))
+    print(f"   temp files: {tree['tmp_removed']}, orphan files: {tree['orphans_removed']}, "
+          f"empty dirs: {tree['dirs_removed']}")
+    if tree["missing"]:
+        print(f"⚠️ {len(tree['missing'])} blobs recorded but missing on disk, e.g. {tree['missing'][0]}")
+    if tree["corrupt"]:
+        print(f"❌ {len(tree['corrupt'])} blobs fail verification, e.g. {tree['corrupt'][0]}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,542 @@
+# ================================================================
+# File: app/tools/bulk_score.py
+# Description: Offline bulk scoring without the HTTP layer
+#
+# Scores a directory tree of images with a MODEL_PATHS Keras model or a
+# REGISTRY pipeline, or a CSV of malnutrition rows, on a process pool
+# with one model copy per worker. Inside each worker the next batch is
+# decoded on a thread while the current one runs through the model.
+# Results are appended to CSV or a Parquet dataset directory as they
+# finish, so an interrupted run continues with --resume; --to-db also
+# bulk-inserts each flush into the diagnoses table.
+#
+# Usage:
+#   python -m app.tools.bulk_score images "scans/" --model brain_tumor --out brain.csv
+#   python -m app.tools.bulk_score images "scans/" --model tb --out tb.parquet --workers 4 --resume
+#   python -m app.tools.bulk_score images "scans/" --model skin_cancer --out skin.csv \
+#       --to-db --patient-id-pattern "^(\d+)/"
+#   python -m app.tools.bulk_score malnutrition rows.csv --out risk.csv
+# ================================================================
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set
+
+import numpy as np
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg"}
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+
+# MODEL_PATHS Keras models: input layout + class names (same as /api/predict)
+KERAS_TARGETS = {
+    "brain_tumor": {"mode": "L", "size": (256, 256)},
+    "skin_cancer": {"mode": "RGB", "size": (256, 256)},
+}
+
+
+# ================================================================
+# 👷 Worker Process
+# ================================================================
+# One model (or pipeline) per worker process, loaded by the initializer.
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(kind: str, target: str, spec: Dict[str, Any], threads: int) -> None:
+    import warnings
+    warnings.filterwarnings("ignore")
+    _worker.update(kind=kind, target=target, spec=spec)
+
+    if kind == "keras":
+        import tensorflow as tf
+        from app.ml.serving import build_runner, load_artifact, run_model
+
+        if threads:  # split the cores between workers instead of oversubscribing
+            tf.config.threading.set_intra_op_parallelism_threads(threads)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+        model = load_artifact(spec["path"])
+        _worker["run"] = build_runner(model) or (lambda x: run_model(model, x))
+    elif kind == "pipeline":
+        from app.ml import registry
+        _worker["pipeline"] = registry.get_pipeline(target)
+    elif kind == "tabular":
+        from app.ml.serving import load_artifact
+        from app.ml.tabular import FusedTabularModel, UnsupportedEstimator
+
+        scaler, model = load_artifact(spec["scaler"]), load_artifact(spec["model"])
+        try:
+            _worker["run"] = FusedTabularModel.compile(scaler, model)
+        except UnsupportedEstimator:
+            _worker["run"] = lambda X: model.predict(scaler.transform(X))
+
+
+def _decode(paths: Sequence[str]) -> List[Any]:
+    from app.db.blobstore import map_image
+
+    # blob store files are named by their digest; no need to hash them again
+    named = _worker.get("spec", {}).get("source") == "blobs"
+    out = []
+    for path in paths:
+        try:
+            out.append(map_image(path, Path(path).name if named else None))
+        except Exception as e:
+            out.append(e)
+    return out
+
+
+def _image_row(path: str, probs: Sequence[float], labels: Sequence[str], image: Any) -> Dict[str, Any]:
+    from app.ml.common.phash import fingerprint
+
+    probs = [float(p) for p in probs]
+    idx = int(np.argmax(probs))
+    ph, dh = fingerprint(image)  # feeds the near-duplicate index with --to-db
+    return {
+        "path": path,
+        "label": labels[idx],
+        "label_index": idx,
+        "score": probs[idx],
+        "probs": json.dumps(dict(zip(labels, probs))),
+        "phash": f"{ph:016x}",
+        "dhash": f"{dh:016x}",
+        "sha256": image.digest,
+        "error": None,
+    }
+
+
+def _error_row(path: str, error: BaseException) -> Dict[str, Any]:
+    return {"path": path, "label": None, "label_index": None, "score": None, "probs": None,
+            "phash": None, "dhash": None, "sha256": None, "error": str(error)}
+
+
+def _score_images(paths: List[str]) -> List[Dict[str, Any]]:
+    spec = _worker["spec"]
+    batch_size = spec["batch_size"]
+    batches = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+    rows: List[Dict[str, Any]] = []
+    # Prefetch: decode batch i + 1 on a thread while batch i is scored.
+    with ThreadPoolExecutor(max_workers=1) as decoder:
+        pending = decoder.submit(_decode, batches[0])
+        for i, batch in enumerate(batches):
+            images = pending.result()
+            if i + 1 < len(batches):
+                pending = decoder.submit(_decode, batches[i + 1])
+            ok = [(p, img) for p, img in zip(batch, images) if not isinstance(img, Exception)]
+            rows.extend(_error_row(p, img) for p, img in zip(batch, images) if isinstance(img, Exception))
+            if ok:
+                rows.extend(_infer_images(ok))
+    return rows
+
+
+def _infer_images(items: List[Any]) -> List[Dict[str, Any]]:
+    spec = _worker["spec"]
+    if _worker["kind"] == "keras":
+        try:
+            x = np.stack([img.array(spec["mode"], tuple(spec["size"])) for _, img in items])
+            preds = np.asarray(_worker["run"](x))
+        except Exception as e:
+            return [_error_row(p, e) for p, _ in items]
+        return [_image_row(p, row, spec["labels"], img) for (p, img), row in zip(items, preds)]
+
+    pipeline = _worker["pipeline"]
+    rows = []
+    for path, img in items:
+        try:
+            result = pipeline.infer({"image": img})
+            labels = list(result["probs"])
+            rows.append(_image_row(path, list(result["probs"].values()), labels, img))
+        except Exception as e:
+            rows.append(_error_row(path, e))
+    return rows
+
+
+def _score_rows(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    spec = _worker["spec"]
+    X = np.array([[r[name] for name in spec["features"]] for r in records], dtype="float64")
+    labels = _worker["run"](X)
+    return [{**r, "label": str(label), "error": None} for r, label in zip(records, labels)]
+
+
+def score_chunk(chunk: List[Any]) -> List[Dict[str, Any]]:
+    """Task entry point: a list of image paths or malnutrition records."""
+    if _worker["kind"] == "tabular":
+        return _score_rows(chunk)
+    return _score_images(chunk)
+
+
+# ================================================================
+# 💾 Output (append-only, resumable)
+# ================================================================
+class ResultWriter:
+    """Appends result rows to a CSV file or to part files of a Parquet dataset directory."""
+
+    def __init__(self, out: str):
+        self.out = Path(out)
+        self.parquet = self.out.suffix == ".parquet"
+        self._part = 0
+        if self.parquet:
+            self.out.mkdir(parents=True, exist_ok=True)
+            self._part = len(list(self.out.glob("part-*.parquet")))
+
+    def done_keys(self, key: str) -> Set[Any]:
+        import pandas as pd
+
+        if self.parquet:
+            parts = sorted(self.out.glob("part-*.parquet"))
+            if not parts:
+                return set()
+            return set(pd.concat([pd.read_parquet(p, columns=[key]) for p in parts])[key])
+        if not self.out.exists() or self.out.stat().st_size == 0:
+            return set()
+        return set(pd.read_csv(self.out, usecols=[key])[key])
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        import pandas as pd
+
+        frame = pd.DataFrame(rows)
+        if self.parquet:
+            # Write then rename, so a killed run never leaves a half-written part.
+            path = self.out / f"part-{self._part:05d}.parquet"
+            tmp = path.with_suffix(".tmp")
+            frame.to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+            self._part += 1
+        else:
+            new = not self.out.exists() or self.out.stat().st_size == 0
+            frame.to_csv(self.out, mode="a", header=new, index=False)
+
+
+# ================================================================
+# 🗄️ Diagnoses Bulk Insert
+# ================================================================
+class DiagnosisSink:
+    """
+    Inserts scored rows into `diagnoses` with one executemany per flush,
+    upserting the matching patient_disease_status rows and (for images)
+    adding their fingerprints to the near-duplicate index in the same
+    transaction. With store_blobs the source images are copied into the
+    blob store and referenced from their diagnoses; `patients` maps image
+    digests to patient ids when re-scoring stored images.
+    """
+
+    def __init__(
+        self,
+        disease_key: str,
+        version: str,
+        patient_id: Optional[int] = None,
+        pattern: Optional[str] = None,
+        column: Optional[str] = None,
+        store_blobs: bool = False,
+        patients: Optional[Dict[str, int]] = None,
+    ):
+        from app.db import partitions
+        from app.db.blobstore import ensure_blob_schema
+        from app.db.session import engine
+        from app.db.fingerprints import ensure_fingerprint_schema
+        from app.models.blob import Blob
+        from app.models.diagnosis import Diagnosis
+        from app.models.image_fingerprint import ImageFingerprint
+        from app.models.patient_disease_status import PatientDiseaseStatus
+
+        Diagnosis.__table__.create(bind=engine, checkfirst=True)
+        PatientDiseaseStatus.__table__.create(bind=engine, checkfirst=True)
+        ImageFingerprint.__table__.create(bind=engine, checkfirst=True)
+        Blob.__table__.create(bind=engine, checkfirst=True)
+        ensure_blob_schema(engine)
+        ensure_fingerprint_schema(engine)
+        if partitions.enabled():
+            from app.models.diagnosis_partition import DiagnosisPartition
+
+            DiagnosisPartition.__table__.create(bind=engine, checkfirst=True)
+            partitions.install(engine)
+        self.engine = engine
+        self.table = Diagnosis.__table__
+        self.disease_key = disease_key
+        self.version = version
+        self.patient_id = patient_id
+        self.pattern = re.compile(pattern) if pattern else None
+        self.column = column
+        self.store_blobs = store_blobs
+        self.patients = patients
+        self.inserted = 0
+        self.skipped = 0
+
+    def _patient(self, row: Dict[str, Any]) -> Optional[int]:
+        if self.patients is not None:
+            return self.patients.get(row.get("sha256"))
+        if self.column is not None:
+            value = row.get(self.column)
+            return None if value is None or value != value else int(value)  # NaN check
+        if self.pattern is not None:
+            match = self.pattern.search(str(row.get("relpath", row.get("path"))))
+            if match:
+                return int(match.group(1))
+        return self.patient_id
+
+    def insert(self, rows: List[Dict[str, Any]]) -> None:
+        from datetime import datetime
+
+        now = datetime.utcnow()
+        values, hashes, sources = [], [], []
+        for row in rows:
+            patient = self._patient(row)
+            if row.get("error") or patient is None:
+                self.skipped += 1
+                continue
+            hashes.append((row.get("phash"), row.get("dhash")))
+            sources.append(row.get("path"))
+            values.append({
+                "patient_id": patient,
+                "disease_key": self.disease_key,
+                "label": row["label"],
+                "probs_json": row.get("probs") or "{}",
+                "model_version": self.version,
+                "created_at": now,
+                "image_sha256": row.get("sha256") if (self.store_blobs or self.patients is not None) else None,
+            })
+        if values:
+            from app.db import partitions
+            from app.ml.common.phash import to_signed
+            from app.db.fingerprints import insert_fingerprints
+            from app.repositories.status_repo import status_row, upsert_statuses
+
+            with self.engine.begin() as conn:
+                if self.store_blobs:
+                    from app.db.blobstore import blobs
+
+                    for v, source in zip(values, sources):
+                        if v["image_sha256"]:
+                            blobs.put_file(conn, source, v["image_sha256"])
+                if partitions.enabled():
+                    ids = partitions.insert_diagnoses(conn, values)
+                else:
+                    stmt = self.table.insert().returning(self.table.c.id, sort_by_parameter_order=True)
+                    ids = conn.execute(stmt, values).scalars().all()
+                upsert_statuses(conn, [
+                    status_row(i, v["patient_id"], v["disease_key"], v["label"], json.loads(v["probs_json"]),
+                               v["model_version"], v["created_at"])
+                    for i, v in zip(ids, values)
+                ])
+                insert_fingerprints(conn, [
+                    {
+                        "disease_key": v["disease_key"],
+                        "model_version": v["model_version"],
+                        "phash": to_signed(int(ph, 16)),
+                        "dhash": to_signed(int(dh, 16)),
+                        "probs_json": json.dumps(list(json.loads(v["probs_json"]).values())),
+                        "diagnosis_id": i,
+                        "patient_id": v["patient_id"],
+                        "created_at": v["created_at"],
+                    }
+                    for i, v, (ph, dh) in zip(ids, values, hashes) if ph
+                ])
+            self.inserted += len(values)
+
+
+# ================================================================
+# 🚀 Driver
+# ================================================================
+def iter_images(root: Path) -> List[str]:
+    return sorted(str(p) for p in root.rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES and p.is_file())
+
+
+def stored_images(disease_key: str, since: Optional[str] = None) -> Dict[str, int]:
+    """Blob digest -> patient id (of its latest diagnosis) for a disease's stored images."""
+    from datetime import datetime
+    from sqlalchemy import text
+    from app.db import partitions
+    from app.db.session import engine
+
+    with engine.connect() as conn:
+        if partitions.enabled():
+            since_at = datetime.fromisoformat(since) if since else None
+            found = partitions.scan(conn, ["image_sha256", "patient_id"], since=since_at, disease_key=disease_key)
+            return {r["image_sha256"]: r["patient_id"] for r in found if r["image_sha256"]}
+        rows = conn.execute(text(
+            """
+            SELECT image_sha256, patient_id FROM diagnoses
+            WHERE disease_key = :disease AND image_sha256 IS NOT NULL AND (:since IS NULL OR created_at >= :since)
+            ORDER BY created_at, id
+            """
+        ), {"disease": disease_key, "since": since})
+        return {sha: patient for sha, patient in rows}
+
+
+def iter_records(path: str, features: Sequence[str], extra: Sequence[str] = ()) -> Iterator[Dict[str, Any]]:
+    """CSV rows as dicts with their 0-based row number (the resume key)."""
+    import pandas as pd
+
+    columns = list(dict.fromkeys(list(features) + list(extra)))
+    for frame in pd.read_csv(path, chunksize=50_000):
+        missing = [c for c in columns if c not in frame.columns]
+        if missing:
+            raise SystemExit(f"❌ CSV is missing columns: {missing}")
+        for row, values in zip(frame.index, frame[columns].to_dict("records")):
+            yield {"row": int(row), **values}
+
+
+def chunked(items: Iterator[Any], size: int) -> Iterator[List[Any]]:
+    chunk: List[Any] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_pool(chunks, init_args, workers: int, prefetch: int, on_rows) -> int:
+    """Keep at most workers * prefetch chunks in flight; call on_rows as each finishes."""
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+        inflight = set()
+        for chunk in chunks:
+            inflight.add(pool.submit(score_chunk, chunk))
+            if len(inflight) >= workers * prefetch:
+                finished, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    done += on_rows(fut.result())
+        for fut in inflight:
+            done += on_rows(fut.result())
+    return done
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Score images or malnutrition rows offline on all cores.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    img = sub.add_parser("images", help="Score a directory tree of PNG/JPEG images")
+    img.add_argument("root")
+    img.add_argument("--model", required=True, help="MODEL_PATHS key (brain_tumor, skin_cancer) or REGISTRY key (tb, ...)")
+    img.add_argument("--model-path", help="Keras model file (default: MODEL_PATHS[--model])")
+    img.add_argument("--batch-size", type=int, default=32)
+    img.add_argument("--patient-id", type=int, help="--to-db: patient id for every image")
+    img.add_argument("--patient-id-pattern", help=r"--to-db: regex on the relative path whose group 1 is the patient id")
+
+    img.add_argument("--store-blobs", action="store_true", help="--to-db: keep the images in the blob store")
+
+    blob = sub.add_parser("blobs", help="Re-score images kept in the blob store (e.g. with a new model version)")
+    blob.add_argument("--model", required=True, help="MODEL_PATHS key (brain_tumor, skin_cancer) or REGISTRY key (tb, ...)")
+    blob.add_argument("--model-path", help="Keras model file (default: MODEL_PATHS[--model])")
+    blob.add_argument("--disease", help="Images of diagnoses with this disease key (default: --model)")
+    blob.add_argument("--since", help="Only diagnoses created on or after this date (YYYY-MM-DD)")
+    blob.add_argument("--batch-size", type=int, default=32)
+
+    tab = sub.add_parser("malnutrition", help="Score a CSV of malnutrition feature rows")
+    tab.add_argument("csv")
+    tab.add_argument("--scaler", help="Scaler .pkl (default: MODEL_PATHS['malnutrition_scaler'])")
+    tab.add_argument("--classifier", help="Classifier .pkl (default: MODEL_PATHS['malnutrition_model'])")
+    tab.add_argument("--id-column", help="Column copied to the output to identify rows")
+    tab.add_argument("--patient-id-column", help="--to-db: column holding the patient id")
+
+    for p in (img, blob, tab):
+        p.add_argument("--out", required=True, help="Output .csv file or .parquet dataset directory")
+        p.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+        p.add_argument("--chunk-size", type=int, default=128, help="Items per worker task")
+        p.add_argument("--prefetch", type=int, default=2, help="Tasks queued per worker")
+        p.add_argument("--resume", action="store_true", help="Skip items already in --out")
+        p.add_argument("--to-db", action="store_true", help="Also bulk-insert into the diagnoses table")
+        p.add_argument("--model-version", default="v1")
+    args = parser.parse_args(argv)
+
+    if args.out.endswith(".parquet"):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("❌ Parquet output needs 'pyarrow'; install it or write to a .csv file")
+            return 2
+    writer = ResultWriter(args.out)
+    if not args.resume and (writer.done_keys("row" if args.command == "malnutrition" else "path")):
+        print(f"❌ {args.out} already has results; pass --resume to continue it or choose another --out")
+        return 2
+
+    from app.main import MODEL_PATHS  # noqa: E402 (also registers app settings)
+
+    threads = 0
+    blob_patients = None
+    if args.command in ("images", "blobs"):
+        if args.command == "images":
+            items: Iterator[Any] = iter(iter_images(Path(args.root)))
+        else:
+            from app.db.blobstore import blobs
+
+            args.root = str(blobs.root)
+            blob_patients = stored_images(args.disease or args.model, args.since)
+            items = iter(sorted(str(blobs.path(sha)) for sha in blob_patients if blobs.exists(sha)))
+            print(f"🗃️ {len(blob_patients)} stored images for {args.disease or args.model}")
+        if args.model in KERAS_TARGETS:
+            from app.routers.multi_disease_predictor import SCREEN_MODELS
+
+            kind = "keras"
+            spec = {**KERAS_TARGETS[args.model], "path": args.model_path or MODEL_PATHS[args.model],
+                    "labels": list(SCREEN_MODELS[args.model]["labels"])}
+            threads = max(1, (os.cpu_count() or 1) // args.workers)
+        else:
+            from app.ml.registry import REGISTRY
+
+            if args.model not in REGISTRY:
+                print(f"❌ Unknown model '{args.model}'; choose from {sorted(set(KERAS_TARGETS) | set(REGISTRY))}")
+                return 2
+            kind, spec = "pipeline", {}
+        spec["batch_size"] = args.batch_size
+        spec["source"] = args.command
+        key, target = "path", args.model
+        patient_id, pattern = getattr(args, "patient_id", None), getattr(args, "patient_id_pattern", None)
+    else:
+        from app.routers.multi_disease_predictor import MALNUTRITION_FEATURES
+
+        kind, key, target = "tabular", "row", "malnutrition"
+        spec = {
+            "scaler": args.scaler or MODEL_PATHS["malnutrition_scaler"],
+            "model": args.classifier or MODEL_PATHS["malnutrition_model"],
+            "features": MALNUTRITION_FEATURES,
+        }
+        extra = [c for c in (args.id_column, args.patient_id_column) if c]
+        items = iter_records(args.csv, MALNUTRITION_FEATURES, extra)
+        patient_id, pattern = None, None
+
+    if args.resume:
+        done = writer.done_keys(key)
+        items = (item for item in items if (item["row"] if kind == "tabular" else item) not in done)
+        print(f"⏩ Resuming: {len(done)} items already scored")
+
+    sink = None
+    if args.to_db:
+        column = getattr(args, "patient_id_column", None)
+        sink = DiagnosisSink(target, args.model_version, patient_id, pattern, column,
+                             store_blobs=getattr(args, "store_blobs", False), patients=blob_patients)
+
+    start = time.perf_counter()
+    total = 0
+
+    def on_rows(rows: List[Dict[str, Any]]) -> int:
+        nonlocal total
+        if kind != "tabular":
+            for row in rows:
+                row["relpath"] = os.path.relpath(row["path"], args.root)
+        if sink is not None:
+            # DB first: a crash between the two re-scores this chunk on --resume
+            # (possibly duplicating its diagnoses) but never drops rows
+            sink.insert(rows)
+        writer.write(rows)
+        total += len(rows)
+        rate = total / max(time.perf_counter() - start, 1e-9)
+        print(f"✅ {total} scored ({rate:.1f}/s)", flush=True)
+        return len(rows)
+
+    run_pool(chunked(items, args.chunk_size), (kind, target, spec, threads), args.workers, args.prefetch, on_rows)
+
+    elapsed = time.perf_counter() - start
+    print(f"🏁 {total} items in {elapsed:.1f}s with {args.workers} workers -> {args.out}")
+    if sink is not None:
+        print(f"🗄️ diagnoses: {sink.inserted} inserted, {sink.skipped} skipped (errors / no patient id)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+# ================================================================
+# File: app/tools/check_tabular_parity.py
+# Description: Parity + latency check of the NumPy malnutrition evaluator
+#              against sklearn. Exits non-zero on any disagreement.
+#
+# Usage:
+#   python -m app.tools.check_tabular_parity
+#   python -m app.tools.check_tabular_parity --rows 100000 --scaler path.pkl --model path.pkl
+# ================================================================
+
+import argparse
+import sys
+import warnings
+from typing import List, Optional
+
+import numpy as np
+
+DEFAULT_DIR = "ml models/malnutrition models"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check NumPy tabular evaluators against sklearn.")
+    parser.add_argument("--scaler", default=f"{DEFAULT_DIR}/feature_scaler.pkl")
+    parser.add_argument("--model", default=f"{DEFAULT_DIR}/malnutrition_risk_model.pkl")
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    import joblib
+    import pandas as pd
+    from app.ml.tabular import FusedTabularModel, check_parity, compile_estimator, synthetic_rows, time_call
+
+    warnings.filterwarnings("ignore")  # sklearn feature-name warnings on bare arrays
+    scaler = joblib.load(args.scaler)
+    model = joblib.load(args.model)
+
+    X = synthetic_rows(scaler, args.rows)
+    X_scaled = scaler.transform(X)
+    ok = True
+    for name, est, rows in (("scaler", scaler, X), ("model", model, X_scaled)):
+        compiled = compile_estimator(est)
+        report = check_parity(est, compiled, rows)
+        ok &= report["ok"]
+        print(f"{'✅' if report['ok'] else '❌'} {name:<7} {type(est).__name__:<24} {compiled.describe()} {report}")
+
+    fused = FusedTabularModel.compile(scaler, model)
+    expected = model.predict(X_scaled)
+    mismatches = int(np.sum(fused(X) != expected))
+    ok &= mismatches == 0
+    print(f"{'✅' if mismatches == 0 else '❌'} fused   {args.rows} rows, {mismatches} mismatches")
+
+    row = X[:1]
+    frame = pd.DataFrame(row, columns=getattr(scaler, "feature_names_in_", None))
+    sk_us = time_call(lambda d: model.predict(scaler.transform(d)), frame, runs=50)
+    fused_us = time_call(fused, row, runs=2000)
+    batch = X[:10000]
+    sk_batch_us = time_call(lambda d: model.predict(scaler.transform(d)), batch, runs=3) / len(batch)
+    fused_batch_us = time_call(fused, batch, runs=3) / len(batch)
+    print("-" * 60)
+    print(f"single row : sklearn {sk_us:9.1f} µs   numpy {fused_us:9.1f} µs   ({sk_us / fused_us:.0f}x)")
+    print(f"batch/row  : sklearn {sk_batch_us:9.2f} µs   numpy {fused_batch_us:9.2f} µs")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
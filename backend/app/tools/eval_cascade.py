@@ -0,0 +1,263 @@
+# ================================================================
+# File: app/tools/eval_cascade.py
+# Description: Pick the first-stage temperature and threshold of a
+#              confidence-gated cascade (app/ml/cascade.py)
+#
+# Runs the full MODEL_PATHS model and the candidate first stage over a
+# directory of images, fits the first stage's temperature to the full
+# model's decisions, and for each threshold reports how many images
+# would escalate, how often the cascade answer differs from the
+# full-model-only answer, and the resulting throughput gain
+# t_full / (t_stage1 + escalation_rate * t_full). The recommended
+# threshold is the lowest one whose disagreement stays within
+# --max-disagreement on the calibration split, re-checked on a held-out
+# split. With --class-names, images under a folder named after a class
+# also report accuracy against that folder label.
+#
+# Usage:
+#   python -m app.tools.eval_cascade --model skin_cancer --stage1 "ml models/skin cancer models/stage1.h5" \
+#       --images val/ --max-disagreement 0.01
+#   python -m app.tools.eval_cascade --model brain_tumor --stage1 s1.h5 --images mri/ \
+#       --class-names glioma,meningioma,notumor,pituitary --json
+# ================================================================
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.ml.cascade import calibrate, input_layout, stage1_name
+
+DEFAULT_THRESHOLDS = [round(t, 3) for t in np.arange(0.50, 0.99, 0.01)] + [0.99, 0.995, 0.999]
+TEMPERATURE_GRID = np.geomspace(0.25, 8.0, 61)
+
+
+# ================================================================
+# 📐 Evaluation (pure NumPy)
+# ================================================================
+def nll(probs: np.ndarray, targets: np.ndarray) -> float:
+    return float(-np.mean(np.log(np.clip(probs[np.arange(len(targets)), targets], 1e-12, 1.0))))
+
+
+def ece(probs: np.ndarray, targets: np.ndarray, bins: int = 15) -> float:
+    """Expected calibration error of the top-1 confidence."""
+    conf, correct = probs.max(axis=1), probs.argmax(axis=1) == targets
+    edges = np.linspace(0.0, 1.0, bins + 1)
+    total = 0.0
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        mask = (conf > lo) & (conf <= hi)
+        if mask.any():
+            total += mask.mean() * abs(correct[mask].mean() - conf[mask].mean())
+    return float(total)
+
+
+def fit_temperature(probs: np.ndarray, targets: np.ndarray) -> float:
+    """Temperature minimising the NLL of `targets` (grid search; one parameter)."""
+    losses = [nll(calibrate(probs, float(t)), targets) for t in TEMPERATURE_GRID]
+    return round(float(TEMPERATURE_GRID[int(np.argmin(losses))]), 3)
+
+
+def evaluate(
+    full: np.ndarray,
+    stage1: np.ndarray,
+    thresholds: Sequence[float],
+    full_ms: float,
+    stage1_ms: float,
+    truth: Optional[np.ndarray] = None,
+) -> List[Dict[str, Any]]:
+    """
+    One row per threshold. `stage1` must already be calibrated; `truth`
+    holds class indices, -1 where unknown.
+    """
+    full_pred, stage1_pred, conf = full.argmax(axis=1), stage1.argmax(axis=1), stage1.max(axis=1)
+    known = truth >= 0 if truth is not None else None
+    rows = []
+    for threshold in thresholds:
+        answered = conf >= threshold
+        cascade_pred = np.where(answered, stage1_pred, full_pred)
+        escalation = 1.0 - float(answered.mean())
+        row = {
+            "threshold": float(threshold),
+            "escalation_rate": round(escalation, 4),
+            "disagreement": round(float((cascade_pred != full_pred).mean()), 4),
+            "disagreement_when_answered": (
+                round(float((stage1_pred[answered] != full_pred[answered]).mean()), 4) if answered.any() else None
+            ),
+            "mean_ms": round(stage1_ms + escalation * full_ms, 3),
+            "throughput_gain": round(full_ms / (stage1_ms + escalation * full_ms), 3),
+        }
+        if known is not None and known.any():
+            row["accuracy"] = round(float((cascade_pred[known] == truth[known]).mean()), 4)
+        rows.append(row)
+    return rows
+
+
+def recommend(rows: List[Dict[str, Any]], max_disagreement: float) -> Optional[Dict[str, Any]]:
+    """Fastest threshold within the disagreement budget."""
+    ok = [r for r in rows if r["disagreement"] <= max_disagreement]
+    return max(ok, key=lambda r: (r["throughput_gain"], -r["threshold"])) if ok else None
+
+
+# ================================================================
+# 🏃 Model Runs
+# ================================================================
+def folder_truth(paths: Sequence[str], root: Path, class_names: Sequence[str]) -> np.ndarray:
+    """Class index from the first path component under `root` (-1 if it names no class)."""
+    def norm(s: str) -> str:
+        return s.lower().replace(" ", "").replace("_", "").replace("-", "")
+
+    index = {norm(name): i for i, name in enumerate(class_names)}
+    return np.asarray([index.get(norm(Path(p).relative_to(root).parts[0]), -1) for p in paths])
+
+
+def score(models: Any, name: str, images: List[Any], mode: str, size) -> tuple:
+    """(probabilities [n, classes], median single-image latency in ms), batch 1 as served."""
+    probs, times = [], []
+    for image in images:
+        x = image.batch(mode, size)
+        start = time.perf_counter()
+        out = models.predict(name, x)
+        times.append((time.perf_counter() - start) * 1000)
+        probs.append(np.asarray(out)[0])
+    return np.asarray(probs, dtype="float64"), float(np.median(times))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Evaluate a confidence-gated first-stage cascade.")
+    parser.add_argument("--model", required=True, help="MODEL_PATHS key (brain_tumor, skin_cancer)")
+    parser.add_argument("--model-path", help="Full model file (default: MODEL_PATHS[--model])")
+    parser.add_argument("--stage1", required=True, help="First-stage Keras model, same classes and order")
+    parser.add_argument("--images", required=True, help="Directory of PNG/JPEG images (searched recursively)")
+    parser.add_argument("--limit", type=int, help="Use at most this many images")
+    parser.add_argument("--class-names", help="Comma-separated class names in output order; folder names are labels")
+    parser.add_argument("--temperature", type=float, help="Skip fitting and use this temperature")
+    parser.add_argument("--max-disagreement", type=float, default=0.01,
+                        help="Allowed share of answers that differ from the full model")
+    parser.add_argument("--holdout", type=float, default=0.3, help="Share of images kept out of fitting")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON only")
+    args = parser.parse_args(argv)
+
+    from app.ml.serving import ModelManager
+    from app.tools.bulk_score import KERAS_TARGETS, _decode, iter_images
+
+    if args.model not in KERAS_TARGETS:
+        parser.error(f"--model must be one of {sorted(KERAS_TARGETS)}")
+    if args.model_path:
+        path = args.model_path
+    else:
+        from app.main import MODEL_PATHS
+        path = MODEL_PATHS[args.model]
+
+    root = Path(args.images)
+    paths = iter_images(root)[: args.limit]
+    decoded = _decode(paths)
+    kept = [(p, d) for p, d in zip(paths, decoded) if not isinstance(d, Exception)]
+    if len(kept) < 10:
+        print(f"❌ Need at least 10 readable images under {root}, found {len(kept)}", file=sys.stderr)
+        return 1
+    paths, images = [p for p, _ in kept], [d for _, d in kept]
+
+    # the serving slots, so timings include compiled inference exactly as served
+    models = ModelManager()
+    name1 = stage1_name(args.model)
+    for name, model_path in ((args.model, path), (name1, args.stage1)):
+        slot = models.load(name, model_path)
+        if slot.status != "ready":
+            print(f"❌ Could not load {model_path}: {slot.error}", file=sys.stderr)
+            return 1
+
+    target = KERAS_TARGETS[args.model]
+    full, full_ms = score(models, args.model, images, target["mode"], target["size"])
+    raw1, stage1_ms = score(models, name1, images, *input_layout(models.get(name1)))
+    if raw1.shape[1] != full.shape[1]:
+        print(f"❌ First stage has {raw1.shape[1]} outputs, full model {full.shape[1]}", file=sys.stderr)
+        return 1
+    truth = folder_truth(paths, root, args.class_names.split(",")) if args.class_names else None
+
+    order = np.random.default_rng(args.seed).permutation(len(images))
+    n_hold = int(round(len(images) * args.holdout)) if len(images) * args.holdout >= 5 else 0
+    hold, fit = order[:n_hold], order[n_hold:]
+    full_pred = full.argmax(axis=1)
+
+    temperature = args.temperature or fit_temperature(raw1[fit], full_pred[fit])
+    stage1 = calibrate(raw1, temperature)
+
+    def part(idx):
+        return evaluate(full[idx], stage1[idx], DEFAULT_THRESHOLDS, full_ms, stage1_ms,
+                        truth[idx] if truth is not None else None)
+
+    rows = part(fit)
+    best = recommend(rows, args.max_disagreement)
+    held = None
+    if best is not None and n_hold:
+        held = evaluate(full[hold], stage1[hold], [best["threshold"]], full_ms, stage1_ms,
+                        truth[hold] if truth is not None else None)[0]
+
+    results = {
+        "model": args.model,
+        "full_path": path,
+        "stage1_path": args.stage1,
+        "images": len(images),
+        "fit_images": len(fit),
+        "holdout_images": n_hold,
+        "full_ms_p50": round(full_ms, 3),
+        "stage1_ms_p50": round(stage1_ms, 3),
+        "temperature": temperature,
+        "calibration": {
+            "nll_before": round(nll(raw1[fit], full_pred[fit]), 4),
+            "nll_after": round(nll(stage1[fit], full_pred[fit]), 4),
+            "ece_before": round(ece(raw1[fit], full_pred[fit]), 4),
+            "ece_after": round(ece(stage1[fit], full_pred[fit]), 4),
+        },
+        "full_only_accuracy": (
+            round(float((full_pred[truth >= 0] == truth[truth >= 0]).mean()), 4)
+            if truth is not None and (truth >= 0).any() else None
+        ),
+        "max_disagreement": args.max_disagreement,
+        "thresholds": rows,
+        "recommended": best,
+        "holdout": held,
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print(f"Cascade {args.model}: {len(images)} images ({len(fit)} fit / {n_hold} held out)")
+    print(f"  full model  {full_ms:8.2f} ms   {path}")
+    print(f"  first stage {stage1_ms:8.2f} ms   {args.stage1}")
+    cal = results["calibration"]
+    print(f"  temperature {temperature}  (NLL {cal['nll_before']} -> {cal['nll_after']}, "
+          f"ECE {cal['ece_before']} -> {cal['ece_after']})")
+    if results["full_only_accuracy"] is not None:
+        print(f"  full-model-only accuracy {results['full_only_accuracy']}")
+    print()
+    print(f"{'threshold':>9} {'escalated':>10} {'disagree':>9} {'gain':>7}" + (f" {'accuracy':>9}" if truth is not None else ""))
+    for r in rows:
+        line = f"{r['threshold']:>9.3f} {r['escalation_rate']:>10.1%} {r['disagreement']:>9.2%} {r['throughput_gain']:>6.2f}x"
+        if "accuracy" in r:
+            line += f" {r['accuracy']:>9.2%}"
+        print(line)
+    print()
+    if best is None:
+        print(f"⚠️ No threshold keeps disagreement within {args.max_disagreement:.2%}; the first stage is not usable as is.")
+        return 2
+    print(f"✅ Recommended threshold {best['threshold']}: {best['escalation_rate']:.1%} escalated, "
+          f"{best['disagreement']:.2%} disagreement, {best['throughput_gain']}x throughput")
+    if held is not None:
+        print(f"   held-out check: {held['escalation_rate']:.1%} escalated, "
+              f"{held['disagreement']:.2%} disagreement, {held['throughput_gain']}x throughput")
+    print()
+    print(f"CASCADE_STAGE1_PATHS={args.model}:{args.stage1}")
+    print(f"CASCADE_THRESHOLDS={args.model}:{best['threshold']}")
+    print(f"CASCADE_TEMPERATURES={args.model}:{temperature}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
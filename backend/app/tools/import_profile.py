@@ -0,0 +1,114 @@
+# ================================================================
+# File: app/tools/import_profile.py
+# Description: Per-module import-time tree for API startup
+#
+# Usage:
+#   python -m app.tools.import_profile                    # import app.main
+#   ENABLED_ROUTERS=dashboard,auth python -m app.tools.import_profile
+#   python -m app.tools.import_profile --module app.routers.multi_disease_predictor --min-ms 5
+# ================================================================
+
+import argparse
+import os
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+# Modules that should never show up in a process that doesn't run inference
+HEAVY_MODULES = ("tensorflow", "keras", "torch", "sklearn", "pandas", "onnxruntime")
+
+
+@dataclass
+class ImportNode:
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+    children: List["ImportNode"] = field(default_factory=list)
+
+
+def run_importtime(module: str) -> str:
+    """Import `module` in a fresh interpreter with -X importtime; return its stderr."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=os.environ.copy(),
+    )
+    if proc.returncode != 0:
+        tail = proc.stderr.strip().splitlines()[-5:]
+        raise RuntimeError(f"Importing {module} failed:\n" + "\n".join(tail))
+    return proc.stderr
+
+
+def parse_importtime(output: str) -> List[ImportNode]:
+    """
+    Build the import tree from -X importtime output.
+
+    Lines are emitted after each module finishes importing, children before
+    their parent, with nesting encoded as two spaces per level.
+    """
+    pending: List[ImportNode] = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        node = ImportNode(name.strip(), int(self_us), int(cumulative_us), depth)
+        while pending and pending[-1].depth > depth:
+            node.children.insert(0, pending.pop())
+        pending.append(node)
+    return pending
+
+
+def render(nodes: List[ImportNode], min_ms: float, out=sys.stdout, indent: int = 0) -> None:
+    for node in sorted(nodes, key=lambda n: n.cumulative_us, reverse=True):
+        if node.cumulative_us / 1000 < min_ms:
+            continue
+        flag = "  ⚠️ heavy" if node.name.split(".")[0] in HEAVY_MODULES else ""
+        print(
+            f"{node.cumulative_us / 1000:9.1f} ms {node.self_us / 1000:8.1f} ms  "
+            f"{'  ' * indent}{node.name}{flag}",
+            file=out,
+        )
+        render(node.children, min_ms, out, indent + 1)
+
+
+def find_heavy(nodes: List[ImportNode]) -> List[str]:
+    found = []
+    for node in nodes:
+        if node.name.split(".")[0] in HEAVY_MODULES and "." not in node.name:
+            found.append(node.name)
+        found.extend(find_heavy(node.children))
+    return found
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Report a per-module import-time tree.")
+    parser.add_argument("--module", default="app.main", help="Module to import (default: app.main)")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="Hide modules cheaper than this (cumulative)")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Exit non-zero if total import time exceeds this")
+    args = parser.parse_args(argv)
+
+    roots = parse_importtime(run_importtime(args.module))
+    total_ms = sum(n.cumulative_us for n in roots) / 1000
+
+    print(f"{'cumulative':>12} {'self':>11}  module")
+    render(roots, args.min_ms)
+    print("-" * 60)
+    print(f"Total import time for {args.module}: {total_ms:.1f} ms")
+    print(f"ENABLED_ROUTERS={os.environ.get('ENABLED_ROUTERS', 'all')}")
+
+    heavy = find_heavy(roots)
+    if heavy:
+        print(f"⚠️ Heavy ML modules imported: {', '.join(sorted(set(heavy)))}")
+
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"❌ Import time {total_ms:.1f} ms exceeds budget of {args.budget_ms:.1f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
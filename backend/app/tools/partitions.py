@@ -0,0 +1,293 @@
+# ================================================================
+# File: app/tools/partitions.py
+# Description: Maintenance of the monthly diagnosis partitions
+#              (app/db/partitions.py)
+#
+#   status   every month: where it lives, rows, size
+#   migrate  move rows of the legacy main `diagnoses` table into their
+#            months. They get month-encoded ids; status and fingerprint
+#            references follow, search index and blob refcounts are
+#            re-derived. Batches commit one by one, so it can resume.
+#   seal     months outside the write window (current + previous) get
+#            catalog stats, ANALYZE and VACUUM; reads of a sealed month
+#            open it read-only and whole-month counts come from stats.
+#   archive  seals, then rewrites sealed months older than
+#            DIAGNOSIS_ARCHIVE_AFTER_MONTHS as read-only Parquet
+#            (zstd, sorted by created_at so row-group statistics prune
+#            time-window reads) and deletes their .db files.
+#
+# Usage:
+#   python -m app.tools.partitions status
+#   python -m app.tools.partitions migrate --batch-size 5000
+#   python -m app.tools.partitions archive --keep-months 6 --dry-run
+# ================================================================
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ARCHIVE_ROW_GROUP = 100_000
+
+
+def _catalog_upsert(conn: Any, key: str, **values: Any) -> None:
+    from sqlalchemy.dialects.sqlite import insert
+    from app.models.diagnosis_partition import DiagnosisPartition
+
+    stmt = insert(DiagnosisPartition.__table__).values(key=key, **values)
+    conn.execute(stmt.on_conflict_do_update(index_elements=["key"], set_=values))
+
+
+def months_before(key: str, months: int) -> str:
+    from app.db.partitions import previous_month
+
+    for _ in range(months):
+        key = previous_month(key)
+    return key
+
+
+# ================================================================
+# 🚚 Migrate
+# ================================================================
+def migrate(engine: Any, batch_size: int) -> Dict[str, int]:
+    """Move legacy main-table rows into their months; returns rows moved per month."""
+    from sqlalchemy import text
+    from app.db import partitions
+    from app.models.diagnosis import Diagnosis
+
+    legacy = Diagnosis.__table__
+    moved: Dict[str, int] = {}
+    with engine.connect() as conn:
+        months = [m for (m,) in conn.execute(text(
+            "SELECT DISTINCT substr(created_at, 1, 7) FROM diagnoses WHERE created_at IS NOT NULL ORDER BY 1"
+        ))]
+        conn.commit()
+        for month in months:
+            key = month.replace("-", "_")
+            attached = key in conn.info.get(partitions.INFO_KEY, ())
+            if not attached:
+                # no transaction is open between batches, so ATTACH/DETACH are allowed
+                partitions.attach(conn.connection.dbapi_connection, key)
+            start, end = partitions.month_start(key), partitions.month_start(partitions.next_month(key))
+            conn.execute(text("CREATE TEMP TABLE IF NOT EXISTS id_map (old INTEGER PRIMARY KEY, new INTEGER NOT NULL)"))
+            while True:
+                rows = [dict(r) for r in conn.execute(
+                    legacy.select().where(legacy.c.created_at >= start, legacy.c.created_at < end)
+                    .order_by(legacy.c.id).limit(batch_size)
+                ).mappings()]
+                if not rows:
+                    break
+                values = [{c: r[c] for c in partitions.COLUMNS if c != "id"} for r in rows]
+                for v in values:
+                    v["model_version"] = v["model_version"] or "v1"
+                    v["probs_json"] = v["probs_json"] or "{}"
+                conn.execute(text("DELETE FROM id_map"))
+                new_ids = partitions.insert_month(conn, key, values)
+                conn.execute(text("INSERT INTO id_map (old, new) VALUES (:old, :new)"),
+                             [{"old": r["id"], "new": i} for r, i in zip(rows, new_ids)])
+                for ref_table in ("patient_disease_status", "image_fingerprints"):
+                    conn.execute(text(
+                        f"""
+                        UPDATE {ref_table} SET diagnosis_id = (SELECT new FROM id_map WHERE old = diagnosis_id)
+                        WHERE diagnosis_id IN (SELECT old FROM id_map)
+                        """
+                    ))
+                # main-table triggers drop the search rows and refcounts; index_rows adds them back
+                conn.execute(text("DELETE FROM diagnoses WHERE id IN (SELECT old FROM id_map)"))
+                partitions.index_rows(conn, [{**v, "id": i} for v, i in zip(values, new_ids)])
+                conn.commit()
+                moved[key] = moved.get(key, 0) + len(rows)
+                print(f"   {key}: {moved[key]} rows moved")
+            if not attached:
+                conn.exec_driver_sql(f"DETACH DATABASE {partitions.schema_name(key)}")
+    return moved
+
+
+# ================================================================
+# 🔒 Seal & Archive
+# ================================================================
+def seal(engine: Any, dry_run: bool) -> List[str]:
+    """Stats + ANALYZE + VACUUM for every unsealed month outside the write window."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import NullPool
+    from app.db import partitions
+
+    live = partitions.live_keys()
+    with engine.connect() as conn:
+        todo = [s for s in partitions.sources(conn) if s.kind == "file" and s.stats is None and s.key not in live]
+    sealed = []
+    for source in sorted(todo, key=lambda s: s.key):
+        sealed.append(source.key)
+        if dry_run:
+            continue
+        month = create_engine(f"sqlite:///{source.path}", poolclass=NullPool)
+        with month.connect() as c:
+            stats = partitions.partition_stats(c, partitions.table(None))
+            c.exec_driver_sql("ANALYZE")
+            c.commit()
+            c.exec_driver_sql("VACUUM")
+        month.dispose()
+        with engine.begin() as conn:
+            _catalog_upsert(conn, source.key, state="sealed", path=source.path, sealed_at=datetime.utcnow(), **stats)
+        print(f"🔒 {source.key}: sealed ({stats['rows']} rows)")
+    return sealed
+
+
+def archive(engine: Any, keep_months: int, dry_run: bool) -> List[str]:
+    """Rewrite sealed months older than `keep_months` as read-only Parquet; returns the months archived."""
+    from app.db import partitions
+
+    oldest_kept = months_before(partitions.live_keys()[0], keep_months)
+    with engine.connect() as conn:
+        todo = [s for s in partitions.sources(conn)
+                if s.kind == "file" and s.stats is not None and s.stats.state == "sealed" and s.key < oldest_kept]
+    done = []
+    for source in sorted(todo, key=lambda s: s.key):
+        done.append(source.key)
+        if dry_run:
+            continue
+        target = partitions.archive_path(source.key)
+        rows = write_archive(source.path, target)
+        if rows != source.stats.rows:
+            target.unlink()
+            raise SystemExit(f"❌ {source.key}: archive has {rows} rows, catalog {source.stats.rows}; kept the .db file")
+        os.chmod(target, 0o444)
+        with engine.begin() as conn:
+            _catalog_upsert(conn, source.key, state="archived", path=str(target), archived_at=datetime.utcnow())
+        Path(source.path).unlink()
+        print(f"📦 {source.key}: {rows} rows -> {target} ({target.stat().st_size / (1024 * 1024):.1f} MB)")
+    return done
+
+
+def write_archive(db_path: str, target: Path) -> int:
+    """Stream a month file into Parquet (one row group per chunk); returns rows written."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from sqlalchemy import create_engine, select
+    from sqlalchemy.pool import NullPool
+    from app.db import partitions
+
+    schema = pa.schema([
+        ("id", pa.int64()), ("patient_id", pa.int64()), ("disease_key", pa.string()), ("label", pa.string()),
+        ("probs_json", pa.string()), ("model_version", pa.string()), ("created_at", pa.timestamp("us")),
+        ("image_sha256", pa.string()),
+    ])
+    t = partitions.table(None)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(".parquet.tmp")
+    written = 0
+    month = create_engine(f"sqlite:///file:{db_path}?mode=ro&uri=true", poolclass=NullPool)
+    try:
+        with month.connect() as c, pq.ParquetWriter(tmp, schema, compression="zstd") as writer:
+            result = c.execution_options(stream_results=True).execute(
+                select(*[t.c[name] for name in partitions.COLUMNS]).order_by(t.c.created_at, t.c.id)
+            ).mappings()
+            while True:
+                chunk = result.fetchmany(ARCHIVE_ROW_GROUP)
+                if not chunk:
+                    break
+                writer.write_table(pa.Table.from_pylist([dict(r) for r in chunk], schema=schema))
+                written += len(chunk)
+        if pq.ParquetFile(tmp).metadata.num_rows != written:
+            raise SystemExit(f"❌ Parquet verification failed for {target}")
+        os.replace(tmp, target)
+    finally:
+        month.dispose()
+        if tmp.exists():
+            tmp.unlink()
+    return written
+
+
+# ================================================================
+# 📋 Status
+# ================================================================
+def status(engine: Any) -> List[Dict[str, Any]]:
+    from app.db import partitions
+
+    report = []
+    with engine.connect() as conn:
+        for source in partitions.sources(conn):
+            path = Path(source.path) if source.path else (
+                partitions.partition_path(source.key) if source.key else None
+            )
+            report.append({
+                "month": source.key or "legacy",
+                "kind": source.kind,
+                "state": source.stats.state if source.stats is not None else ("live" if source.key else "main table"),
+                "rows": partitions.count_rows(conn, source),
+                "size_mb": round(path.stat().st_size / (1024 * 1024), 2) if path and path.is_file() else None,
+                "path": str(path) if path else None,
+            })
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from app.core.config import settings
+
+    parser = argparse.ArgumentParser(description="Maintain the monthly diagnosis partitions.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="List months, rows and sizes")
+    mig = sub.add_parser("migrate", help="Move legacy main-table diagnoses into monthly partitions")
+    mig.add_argument("--batch-size", type=int, default=5000)
+    for name, help_text in (("seal", "Seal months outside the write window"),
+                            ("archive", "Seal, then archive old sealed months to Parquet")):
+        cmd = sub.add_parser(name, help=help_text)
+        cmd.add_argument("--dry-run", action="store_true", help="Report what would change")
+    sub.choices["archive"].add_argument("--keep-months", type=int, default=settings.DIAGNOSIS_ARCHIVE_AFTER_MONTHS,
+                                        help="Months before the current one kept as SQLite")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON only")
+    args = parser.parse_args(argv)
+
+    if not settings.DIAGNOSIS_PARTITIONS and args.command == "migrate":
+        print("❌ Set DIAGNOSIS_PARTITIONS=true first: the app would keep writing to the main table")
+        return 2
+    if args.command == "archive" and not args.dry_run:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("❌ Parquet archives need 'pyarrow'; install it or use 'seal' only")
+            return 2
+
+    from app.db.init_db import init_db
+    from app.db.session import engine
+
+    with contextlib.redirect_stdout(sys.stderr if args.json else sys.stdout):
+        init_db()  # catalog table (and the attach hook when enabled)
+        start = time.perf_counter()
+        if args.command == "status":
+            results: Any = status(engine)
+        elif args.command == "migrate":
+            results = migrate(engine, args.batch_size)
+        elif args.command == "seal":
+            results = seal(engine, args.dry_run)
+        else:
+            results = {"sealed": seal(engine, args.dry_run),
+                       "archived": archive(engine, args.keep_months, args.dry_run)}
+    elapsed = round(time.perf_counter() - start, 2)
+
+    if args.json:
+        print(json.dumps({"command": args.command, "results": results, "elapsed_s": elapsed}, indent=2, default=str))
+        return 0
+    if args.command == "status":
+        print(f"{'month':>8} {'kind':>9} {'state':>10} {'rows':>10} {'MB':>8}  path")
+        for r in results:
+            size = f"{r['size_mb']:.2f}" if r["size_mb"] is not None else "-"
+            print(f"{r['month']:>8} {r['kind']:>9} {r['state']:>10} {r['rows']:>10} {size:>8}  {r['path'] or ''}")
+    elif args.command == "migrate":
+        print(f"✅ Moved {sum(results.values())} diagnoses into {len(results)} months in {elapsed}s")
+    else:
+        verb = "would " if args.dry_run else ""
+        sealed = results if args.command == "seal" else results["sealed"]
+        print(f"✅ {verb}seal: {', '.join(sealed) or 'nothing'}")
+        if args.command == "archive":
+            print(f"✅ {verb}archive: {', '.join(results['archived']) or 'nothing'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from app.repositories.status_repo import risk_score, status_row
+
+SKIN = ["Actinic Keratosis", "Basal Cell Carcinoma", "Dermatofibroma", "Melanoma", "Nevus",
+        "Pigmented Benign Keratosis", "Seborrheic Keratosis", "Squamous Cell Carcinoma", "Vascular Lesion"]
+
+
+def _skin(**probs):
+    out = dict.fromkeys(SKIN, 0.0)
+    out.update({k.replace("_", " "): v for k, v in probs.items()})
+    return out
+
+
+def test_confident_benign_skin_finding_ranks_below_likely_melanoma():
+    benign = [
+        ("Nevus", _skin(Nevus=0.99, Melanoma=0.01)),
+        ("Dermatofibroma", _skin(Dermatofibroma=0.97, Basal_Cell_Carcinoma=0.02, Nevus=0.01)),
+    ]
+    malignant = ("Melanoma", _skin(Melanoma=0.6, Nevus=0.4))
+    rows = [status_row(i, i, "skin_cancer", label, probs, "v1", datetime(2026, 1, 1))
+            for i, (label, probs) in enumerate(benign + [malignant])]
+    worklist = sorted(rows, key=lambda r: r["risk"], reverse=True)
+    assert worklist[0]["label"] == "Melanoma"
+    assert worklist[0]["risk"] == 0.6
+    assert [r["risk"] for r in worklist[1:]] == [0.02, 0.01]
+
+
+def test_skin_risk_sums_every_malignant_class():
+    probs = _skin(Nevus=0.4, Actinic_Keratosis=0.2, Basal_Cell_Carcinoma=0.2, Squamous_Cell_Carcinoma=0.2)
+    assert risk_score("skin_cancer", "Nevus", probs) == 0.6
+
+
+def test_other_diseases():
+    assert risk_score("brain_tumor", "notumor", {"glioma": 0.1, "meningioma": 0.05, "notumor": 0.8,
+                                                 "pituitary": 0.05}) == 0.2
+    assert risk_score("tb", "negative", {"negative": 0.7, "suspected": 0.2, "positive": 0.1}) == 0.3
+    assert risk_score("malnutrition", "High", {"High": 0.6, "Low": 0.4}) == 0.8
+    assert risk_score("other", "normal", {"normal": 0.9, "abnormal": 0.1}) == 0.1
+    assert risk_score("other", "b", {"a": 0.3, "b": 0.7}) == 0.7
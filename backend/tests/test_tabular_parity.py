@@ -0,0 +1,66 @@
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.ml import tabular
+
+MODEL_DIR = Path(__file__).resolve().parents[1] / "ml models" / "malnutrition models"
+
+
+def _fitted(kind):
+    from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.tree import DecisionTreeClassifier
+
+    rng = np.random.default_rng(7)
+    X = rng.normal(size=(600, 5)) * [1.0, 3.0, 10.0, 0.5, 2.0] + [0.0, 5.0, 50.0, 1.0, -2.0]
+    y = (X[:, 0] + X[:, 1] / 3 > 1.5).astype(int) + (X[:, 2] > 55).astype(int)
+    scaler = StandardScaler().fit(X)
+    model = {
+        "forest": RandomForestClassifier(n_estimators=20, random_state=0),
+        "extra": ExtraTreesClassifier(n_estimators=20, max_depth=6, random_state=0),
+        "tree": DecisionTreeClassifier(random_state=0),
+    }[kind].fit(scaler.transform(X), y)
+    return scaler, model
+
+
+@pytest.mark.parametrize("kind", ["forest", "extra", "tree"])
+def test_tree_ensembles_match_sklearn(kind):
+    scaler, model = _fitted(kind)
+    X = scaler.transform(tabular.synthetic_rows(scaler, 3000))  # several blocks
+    X[::97, 1] = np.nan
+    compiled = tabular.compile_classifier(model)
+    report = tabular.check_parity(model, compiled, X)
+    assert report["ok"], report
+    assert report["max_proba_diff"] < 1e-12  # summation order only
+
+
+def test_scaler_and_fused_model_match_sklearn():
+    scaler, model = _fitted("forest")
+    assert tabular.check_parity(scaler, tabular.compile_scaler(scaler))["ok"]
+    fused = tabular.FusedTabularModel.compile(scaler, model)
+    for n in (1, tabular.BLOCK_ROWS + 1, tabular.SKLEARN_BATCH_ROWS):
+        X = tabular.synthetic_rows(scaler, n, seed=n)
+        assert np.array_equal(fused(X), model.predict(scaler.transform(X)))
+
+
+def test_compile_checked_rejects_non_sklearn():
+    class Stub:
+        def predict(self, X):
+            return np.zeros(len(X))
+
+    assert tabular.compile_checked(Stub()) is None
+
+
+@pytest.mark.skipif(not (MODEL_DIR / "malnutrition_risk_model.pkl").exists(), reason="shipped models missing")
+def test_shipped_malnutrition_models():
+    joblib = pytest.importorskip("joblib")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # version/feature-name warnings from the pickles
+        scaler = joblib.load(MODEL_DIR / "feature_scaler.pkl")
+        model = joblib.load(MODEL_DIR / "malnutrition_risk_model.pkl")
+        X = tabular.synthetic_rows(scaler, 2000)
+        assert tabular.check_parity(scaler, tabular.compile_scaler(scaler), X)["ok"]
+        assert tabular.check_parity(model, tabular.compile_classifier(model), scaler.transform(X))["ok"]